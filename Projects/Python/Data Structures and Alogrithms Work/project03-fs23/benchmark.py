@@ -0,0 +1,765 @@
+"""
+Sorting Project - Benchmark and Regression Suite
+CSE 331 Fall 2023
+
+Runs the sorts in solution.py over reproducible workloads and records wall time, comparisons, element writes into
+the sorted list and peak memory as JSON, so a run can be checked against a stored baseline:
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json --tolerance 0.25 --min-seconds 0.001
+
+exits with status 1 if any result got slower or does more work than its baseline. NumPy dispatch is turned off,
+so the Python algorithms themselves are measured.
+
+The benchmarks of single changes each print a table instead, and are run by name:
+
+    python benchmark.py --bench key_sorts
+"""
+
+import argparse
+import gc
+import json
+import operator
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from solution import (bubble_sort, external_sort, hybrid_merge_sort, insertion_sort, introsort, maximize_rewards,
+                      maximize_rewards_linear, merge, np, numpy_min_size, parallel_merge_sort, partial_sort,
+                      pure_python_sorts, quicksort, selection_sort)
+
+try:
+    import resource
+except ImportError:  # not available on Windows, bench_external_sort then skips peak RSS
+    resource = None
+
+ALGORITHMS: Dict[str, Callable[[List[Any]], None]] = {
+    "selection_sort": selection_sort,
+    "bubble_sort": bubble_sort,
+    "insertion_sort": insertion_sort,
+    "hybrid_merge_sort": hybrid_merge_sort,
+    "adaptive_merge_sort": lambda data: hybrid_merge_sort(data, adaptive=True),
+    "quicksort": quicksort,
+    "introsort": introsort,
+}
+QUADRATIC = ("selection_sort", "bubble_sort", "insertion_sort")
+DISTRIBUTIONS = ("random", "sorted", "reversed", "few_unique", "nearly_sorted", "organ_pipe")
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def make_workload(distribution: str, size: int, seed: int) -> List[int]:
+    """
+    Generates the same list for the same distribution, size and seed on every machine
+    :param distribution: one of DISTRIBUTIONS
+    :param size: length of the list
+    :param seed: seed of the random generator
+    :return: the list to sort
+    """
+    rng = random.Random(f"{seed}-{distribution}-{size}")
+    if distribution == "random":
+        return [rng.randrange(size * 10) for _ in range(size)]
+    if distribution == "sorted":
+        return list(range(size))
+    if distribution == "reversed":
+        return list(range(size - 1, -1, -1))
+    if distribution == "few_unique":
+        return [rng.randrange(4) for _ in range(size)]
+    if distribution == "nearly_sorted":
+        data = list(range(size))
+        for _ in range(max(size // 100, 1)):
+            i, j = rng.randrange(size), rng.randrange(size)
+            data[i], data[j] = data[j], data[i]
+        return data
+    if distribution == "organ_pipe":
+        return list(range(size // 2)) + list(range((size + 1) // 2 - 1, -1, -1))
+    raise ValueError(f"unknown distribution {distribution!r}")
+
+
+class Counted:
+    """
+    Wraps a value and counts every comparison made between wrapped values
+    """
+    __slots__ = ["value"]
+    comparisons = 0
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: "Counted") -> bool:
+        Counted.comparisons += 1
+        return self.value < other.value
+
+    def __gt__(self, other: "Counted") -> bool:
+        Counted.comparisons += 1
+        return self.value > other.value
+
+    def __ge__(self, other: "Counted") -> bool:
+        Counted.comparisons += 1
+        return self.value >= other.value
+
+    def __le__(self, other: "Counted") -> bool:
+        Counted.comparisons += 1
+        return self.value <= other.value
+
+
+class CountingList(list):
+    """
+    List counting the elements written into it by index or slice assignment; a swap is two writes
+    Only writes into the list being sorted are counted: scratch lists a sort allocates itself are plain lists, so
+    e.g. hybrid_merge_sort's merge passes into its scratch buffer are missed and only those back into the list count
+    """
+    writes = 0
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            value = list(value)
+            CountingList.writes += len(value)
+        else:
+            CountingList.writes += 1
+        super().__setitem__(index, value)
+
+
+def measure(algorithm: str, workload: List[int], repeat: int, count: bool) -> Dict[str, Any]:
+    """
+    Sorts copies of workload with one algorithm and checks the result
+    :param algorithm: name in ALGORITHMS
+    :param workload: the list to sort
+    :param repeat: timed runs, the median is reported
+    :param count: also count comparisons and writes into the sorted list, in one extra run on wrapped values
+    :return: seconds, peak_kb and, if counted, comparisons and writes
+    """
+    sort = ALGORITHMS[algorithm]
+    expected = sorted(workload)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, len(workload) + 100))
+    try:
+        times = []
+        for _ in range(repeat):
+            data = workload[:]
+            gc.collect()
+            start = default_timer()
+            sort(data)
+            times.append(default_timer() - start)
+            if data != expected:
+                raise AssertionError(f"{algorithm} did not sort its input")
+
+        data = workload[:]
+        gc.collect()
+        tracemalloc.start()
+        sort(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {"seconds": statistics.median(times), "peak_kb": round(peak / 1024, 1)}
+        if count:
+            data = CountingList(Counted(value) for value in workload)
+            Counted.comparisons = CountingList.writes = 0
+            sort(data)
+            result["comparisons"] = Counted.comparisons
+            result["writes"] = CountingList.writes
+        return result
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def run_suite(algorithms: Tuple[str, ...] = tuple(ALGORITHMS), distributions: Tuple[str, ...] = DISTRIBUTIONS,
+              sizes: Tuple[int, ...] = SIZES, repeat: int = 3, quadratic_cutoff: int = 5000,
+              count_cutoff: int = 100000, seed: int = 331) -> List[Dict[str, Any]]:
+    """
+    Measures every algorithm on every distribution and size
+    :param algorithms: names in ALGORITHMS
+    :param distributions: names in DISTRIBUTIONS
+    :param sizes: list lengths
+    :param repeat: timed runs per result
+    :param quadratic_cutoff: largest size the O(n^2) sorts are run on
+    :param count_cutoff: largest size comparisons and writes are counted on, counting is much slower than sorting
+    :param seed: seed of the workloads
+    :return: one record per measured combination
+    """
+    results = []
+    with pure_python_sorts():
+        for size in sizes:
+            for distribution in distributions:
+                workload = make_workload(distribution, size, seed)
+                for algorithm in algorithms:
+                    if algorithm in QUADRATIC and size > quadratic_cutoff:
+                        continue
+                    record = {"algorithm": algorithm, "distribution": distribution, "size": size}
+                    try:
+                        record.update(measure(algorithm, workload, repeat, size <= count_cutoff))
+                    except RecursionError:
+                        record["error"] = "recursion limit"
+                    results.append(record)
+                    print(f"{algorithm:>20} {distribution:>14} {size:>8} "
+                          f"{record.get('seconds', float('nan')):>10.5f} {record.get('comparisons', ''):>11}",
+                          flush=True)
+    return results
+
+
+def tune_threshold(candidates: Tuple[int, ...] = (1, 4, 8, 12, 16, 24, 32, 48, 64), size: int = 20000,
+                   repeat: int = 5, seed: int = 331) -> Dict[str, Any]:
+    """
+    Finds the hybrid_merge_sort threshold that is fastest on this machine, summing median times over all distributions
+    :param candidates: threshold values to try
+    :param size: list length sorted
+    :param repeat: timed runs per candidate and distribution
+    :param seed: seed of the workloads
+    :return: the best threshold and the total seconds of every candidate
+    """
+    workloads = [make_workload(distribution, size, seed) for distribution in DISTRIBUTIONS]
+    totals = {}
+    with pure_python_sorts():
+        for threshold in candidates:
+            total = 0
+            for workload in workloads:
+                times = []
+                for _ in range(repeat):
+                    data = workload[:]
+                    gc.collect()
+                    start = default_timer()
+                    hybrid_merge_sort(data, threshold=threshold)
+                    times.append(default_timer() - start)
+                total += statistics.median(times)
+            totals[threshold] = total
+    best = min(totals, key=totals.get)
+    return {"threshold": best, "size": size, "seconds": {str(threshold): total for threshold, total in totals.items()}}
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float,
+            min_seconds: float = 0.001) -> List[str]:
+    """
+    Lists the results that regressed against a baseline: slower by more than tolerance and by more than min_seconds,
+    or more comparisons or writes
+    Timings of tiny inputs are mostly timer noise, e.g. 0.00002s -> 0.00003s is 50% slower, hence the absolute floor
+    Counts come from seeded workloads and are exact, so any increase is reported
+    :param results: records from run_suite
+    :param baseline: records from an earlier run
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+    :param min_seconds: smallest slowdown in seconds that is reported
+    :return: one message per regression
+    """
+    previous = {(record["algorithm"], record["distribution"], record["size"]): record for record in baseline}
+    regressions = []
+    for record in results:
+        name = (record["algorithm"], record["distribution"], record["size"])
+        old = previous.get(name)
+        if old is None:
+            continue
+        label = " ".join(map(str, name))
+        if "error" in record and "error" not in old:
+            regressions.append(f"{label}: {record['error']}")
+            continue
+        if ("seconds" in old and "seconds" in record and record["seconds"] > old["seconds"] * (1 + tolerance)
+                and record["seconds"] - old["seconds"] > min_seconds):
+            regressions.append(f"{label}: {old['seconds']:.5f}s -> {record['seconds']:.5f}s")
+        for counter in ("comparisons", "writes"):
+            if counter in old and counter in record and record[counter] > old[counter]:
+                regressions.append(f"{label}: {counter} {old[counter]} -> {record[counter]}")
+    return regressions
+
+
+@pure_python_sorts()
+def bench_key_sorts(sizes: Tuple[int, ...] = (100, 500, 2000), trials: int = 3) -> None:
+    """
+    Compares each sort called with a comparator lambda against the same sort called with an equivalent key=
+    Records are (name, price) tuples ordered by price, once ascending and once descending
+    :param sizes: list lengths to sort; the quadratic sorts are skipped above 2000 items
+    :param trials: runs averaged per size
+    """
+    sorts = {"selection": selection_sort, "bubble": bubble_sort, "insertion": insertion_sort,
+             "hybrid_merge": hybrid_merge_sort}
+    by_price = operator.itemgetter(1)
+    print(f"{'sort':>13} {'size':>7} {'descending':>10} {'comparator':>11} {'key':>9} {'speedup':>8}")
+    for name, sort in sorts.items():
+        for size in sizes:
+            if name != "hybrid_merge" and size > 2000:
+                continue
+            records = [(f"item{i}", random.randint(0, size)) for i in range(size)]
+            for descending in (False, True):
+                with_comparator = with_key = 0
+                for trial in range(trials):
+                    compared, keyed = records[:], records[:]
+                    gc.collect()
+                    start = default_timer()
+                    sort(compared, comparator=lambda x, y: x[1] < y[1], descending=descending)
+                    with_comparator += (default_timer() - start) / trials
+
+                    gc.collect()
+                    start = default_timer()
+                    sort(keyed, key=by_price, descending=descending)
+                    with_key += (default_timer() - start) / trials
+                    assert compared == keyed
+                print(f"{name:>13} {size:>7} {str(descending):>10} {with_comparator:>11.4f} {with_key:>9.4f} "
+                      f"{with_comparator / with_key:>7.2f}x")
+
+
+@pure_python_sorts()
+def bench_merge_sort_memory(sizes: Tuple[int, ...] = (1000, 10000, 100000), threshold: int = 12) -> None:
+    """
+    Compares the bottom-up hybrid_merge_sort against the recursive, slicing version it replaced
+    Reports wall time, the peak memory allocated while sorting and the number of blocks allocated at that peak, traced
+    with tracemalloc; the recursive version holds slices and merged lists on every level, the bottom-up one its
+    scratch buffer and the run bounds, one int object per leaf above the small int cache
+    :param sizes: list lengths to sort
+    :param threshold: insertion sort cutoff passed to both versions
+    """
+    def recursive_hybrid_merge_sort(data, comparator):
+        # the previous implementation: two slices per level, merged into a new list and copied back
+        if len(data) <= 1:
+            return
+        if len(data) <= threshold:
+            insertion_sort(data, comparator=comparator)
+            return
+        mid = len(data) // 2
+        left_half, right_half = data[:mid], data[mid:]
+        recursive_hybrid_merge_sort(left_half, comparator)
+        recursive_hybrid_merge_sort(right_half, comparator)
+        for i, value in enumerate(merge(left_half, right_half, comparator=comparator, descending=False)):
+            data[i] = value
+
+    def bottom_up_hybrid_merge_sort(data, comparator):
+        hybrid_merge_sort(data, threshold=threshold, comparator=comparator)
+
+    def measure(sort, data):
+        gc.collect()
+        tracemalloc.start()
+        start = default_timer()
+        sort(data, operator.lt)
+        elapsed = default_timer() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def blocks_at_peak(sort, data):
+        # sorts again, snapshotting from the comparator whenever the traced memory reaches a new high; the input
+        # exists before tracing starts, so only the sort's own blocks are traced and the snapshots stay small
+        high = blocks = 0
+
+        def less(first, second):
+            nonlocal high, blocks
+            current = tracemalloc.get_traced_memory()[0]
+            if current > high:
+                high, blocks = current, len(tracemalloc.take_snapshot().traces)
+            return first < second
+
+        gc.collect()
+        tracemalloc.start()
+        sort(data, less)
+        tracemalloc.stop()
+        return blocks
+
+    print(f"{'size':>8} {'recursive s':>12} {'bottom-up s':>12} {'recursive KB':>13} {'bottom-up KB':>13} "
+          f"{'recursive blocks':>17} {'bottom-up blocks':>17}")
+    for size in sizes:
+        values = [random.random() for _ in range(size)]
+        recursive, bottom_up = values[:], values[:]
+        recursive_time, recursive_peak = measure(recursive_hybrid_merge_sort, recursive)
+        bottom_up_time, bottom_up_peak = measure(bottom_up_hybrid_merge_sort, bottom_up)
+        assert recursive == bottom_up
+        recursive_blocks = blocks_at_peak(recursive_hybrid_merge_sort, values[:])
+        bottom_up_blocks = blocks_at_peak(bottom_up_hybrid_merge_sort, values[:])
+        print(f"{size:>8} {recursive_time:>12.4f} {bottom_up_time:>12.4f} "
+              f"{recursive_peak / 1024:>13.1f} {bottom_up_peak / 1024:>13.1f} "
+              f"{recursive_blocks:>17} {bottom_up_blocks:>17}")
+
+
+@pure_python_sorts()
+def bench_adaptive_merge_sort(size: int = 100000, trials: int = 3) -> None:
+    """
+    Compares hybrid_merge_sort with and without adaptive=True on random, nearly sorted, reversed and sawtooth input
+    Reports average seconds with the default comparator and the comparisons made through a counting comparator
+    :param size: list length to sort
+    :param trials: runs averaged per input
+    """
+    ordered = list(range(size))
+    nearly_sorted = ordered[:]
+    for _ in range(size // 100):
+        i, j = random.randrange(size), random.randrange(size)
+        nearly_sorted[i], nearly_sorted[j] = nearly_sorted[j], nearly_sorted[i]
+    tooth = max(size // 20, 1)
+    inputs = {"random": random.sample(ordered, size), "nearly sorted": nearly_sorted,
+              "reversed": ordered[::-1], "sawtooth": [i % tooth for i in range(size)]}
+
+    def counted(data, adaptive):
+        count = 0
+
+        def less(first, second):
+            nonlocal count
+            count += 1
+            return first < second
+
+        hybrid_merge_sort(data, comparator=less, adaptive=adaptive)
+        return count
+
+    print(f"{'input':>14} {'hybrid s':>9} {'adaptive s':>11} {'hybrid cmp':>11} {'adaptive cmp':>13} {'speedup':>8}")
+    for name, values in inputs.items():
+        times = {}
+        for adaptive in (False, True):
+            times[adaptive] = 0
+            for trial in range(trials):
+                data = values[:]
+                gc.collect()
+                start = default_timer()
+                hybrid_merge_sort(data, adaptive=adaptive)
+                times[adaptive] += (default_timer() - start) / trials
+                assert data == sorted(values)
+        hybrid_cmp, adaptive_cmp = counted(values[:], False), counted(values[:], True)
+        print(f"{name:>14} {times[False]:>9.4f} {times[True]:>11.4f} {hybrid_cmp:>11} {adaptive_cmp:>13} "
+              f"{times[False] / times[True]:>7.2f}x")
+
+
+@pure_python_sorts()
+def bench_parallel_merge_sort(size: int = 2000000, max_workers: Optional[int] = None, trials: int = 1) -> None:
+    """
+    Measures how parallel_merge_sort scales from 1 to max_workers processes on random floats
+    :param size: list length to sort
+    :param max_workers: largest pool size tried, defaults to the number of CPUs
+    :param trials: runs averaged per worker count
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    values = [random.random() for _ in range(size)]
+    expected = sorted(values)
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    serial = None
+    for workers in range(1, max_workers + 1):
+        elapsed = 0
+        for trial in range(trials):
+            data = values[:]
+            gc.collect()
+            start = default_timer()
+            parallel_merge_sort(data, workers=workers, serial_threshold=0)
+            elapsed += (default_timer() - start) / trials
+            assert data == expected
+        serial = serial or elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {serial / elapsed:>7.2f}x")
+
+
+def bench_numpy_dispatch(sizes: Tuple[int, ...] = (8, 16, 32, 64, 128, 1024, 100000), trials: int = 5) -> None:
+    """
+    Times hybrid_merge_sort and insertion_sort on random floats with and without NumPy dispatch, to find the size
+    where NumPy starts to win (NUMPY_MIN_SIZE); dispatch is forced on for every size while measuring
+    :param sizes: list lengths to sort; insertion sort is skipped above 2000 items
+    :param trials: runs averaged per size
+    """
+    if np is None:
+        print("NumPy is not installed")
+        return
+    sorts = {"insertion": insertion_sort, "hybrid_merge": hybrid_merge_sort}
+    print(f"{'sort':>13} {'size':>7} {'python s':>10} {'numpy s':>10} {'speedup':>8}")
+    for name, sort in sorts.items():
+        for size in sizes:
+            if name == "insertion" and size > 2000:
+                continue
+            values = [random.random() for _ in range(size)]
+            times = []
+            for minimum in (sys.maxsize, 0):
+                elapsed = 0
+                for trial in range(trials):
+                    data = values[:]
+                    gc.collect()
+                    with numpy_min_size(minimum):
+                        start = default_timer()
+                        sort(data)
+                        elapsed += (default_timer() - start) / trials
+                    assert data == sorted(values)
+                times.append(elapsed)
+            print(f"{name:>13} {size:>7} {times[0]:>10.6f} {times[1]:>10.6f} {times[0] / times[1]:>7.2f}x")
+
+
+def median_of_three_killer(size: int) -> List[int]:
+    """
+    Builds a permutation of range(size) on which quicksort makes about size ** 2 / 4 comparisons, using
+    McIlroy's adversary: values are decided lazily during the sort, a pivot candidate is kept as large as possible,
+    and the order they were decided in is the killer input
+    :param size: length of the permutation
+    :return: the killer input
+    """
+    gas = size
+    values = [gas] * size
+    solid = 0
+    candidate = None
+
+    class Lazy:
+        __slots__ = ["index"]
+
+        def __init__(self, index):
+            self.index = index
+
+        def _compare(self, other):
+            nonlocal solid, candidate
+            x, y = self.index, other.index
+            if values[x] == gas and values[y] == gas:
+                frozen = x if x == candidate else y
+                values[frozen] = solid
+                solid += 1
+            if values[x] == gas:
+                candidate = x
+            elif values[y] == gas:
+                candidate = y
+            return values[x] - values[y]
+
+        def __lt__(self, other):
+            return self._compare(other) < 0
+
+        def __gt__(self, other):
+            return self._compare(other) > 0
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, size + 100))
+    try:
+        quicksort([Lazy(index) for index in range(size)])
+    finally:
+        sys.setrecursionlimit(limit)
+    for index in range(size):
+        if values[index] == gas:
+            values[index] = solid
+            solid += 1
+    return values
+
+
+def bench_introsort(sizes: Tuple[int, ...] = (1000, 2000, 4000), trials: int = 3) -> None:
+    """
+    Compares quicksort and introsort on random values, the median-of-three killer and a list of few distinct values
+    Reports average seconds and comparisons; quicksort runs with the recursion limit raised to survive the killer
+    :param sizes: list lengths to sort
+    :param trials: runs averaged per input
+    """
+    class Counted:
+        __slots__ = ["value"]
+        count = 0
+
+        def __init__(self, value):
+            self.value = value
+
+        def __lt__(self, other):
+            Counted.count += 1
+            return self.value < other.value
+
+        def __gt__(self, other):
+            Counted.count += 1
+            return self.value > other.value
+
+    with pure_python_sorts():
+        print(f"{'input':>10} {'size':>6} {'quick s':>9} {'intro s':>9} {'quick cmp':>10} {'intro cmp':>10}")
+        for size in sizes:
+            inputs = {"random": random.sample(range(size), size), "killer": median_of_three_killer(size),
+                      "few": [random.randint(0, 3) for _ in range(size)]}
+            for name, values in inputs.items():
+                row = []
+                for sort in (quicksort, introsort):
+                    limit = sys.getrecursionlimit()
+                    sys.setrecursionlimit(max(limit, size + 100))
+                    try:
+                        elapsed = 0
+                        for trial in range(trials):
+                            data = values[:]
+                            gc.collect()
+                            start = default_timer()
+                            sort(data)
+                            elapsed += (default_timer() - start) / trials
+                            assert data == sorted(values)
+                        Counted.count = 0
+                        sort([Counted(value) for value in values])
+                    finally:
+                        sys.setrecursionlimit(limit)
+                    row.append((elapsed, Counted.count))
+                print(f"{name:>10} {size:>6} {row[0][0]:>9.4f} {row[1][0]:>9.4f} {row[0][1]:>10} {row[1][1]:>10}")
+
+
+def bench_maximize_rewards(sizes: Tuple[int, ...] = (1000, 10000, 100000, 1000000), trials: int = 3) -> None:
+    """
+    Compares maximize_rewards with maximize_rewards_linear on carts that pair up and carts that fail at the end
+    The sort-based version is timed as shipped (NumPy dispatch when installed) and with pure Python sorts
+    :param sizes: number of prices in a cart
+    :param trials: runs averaged per cart
+    """
+    print(f"{'cart':>8} {'size':>8} {'sort s':>9} {'python s':>9} {'linear s':>9} {'speedup':>8}")
+    for size in sizes:
+        target_sum = size
+        valid = []
+        for _ in range(size // 2):
+            price = random.randint(1, target_sum - 1)
+            valid += [price, target_sum - price]
+        random.shuffle(valid)
+        invalid = valid[:-1] + [valid[-1] + 1]
+        for name, prices in (("valid", valid), ("invalid", invalid)):
+            times = []
+            for rewards, pure in ((maximize_rewards, False), (maximize_rewards, True),
+                                  (maximize_rewards_linear, False)):
+                elapsed = 0
+                for trial in range(trials):
+                    data = prices[:]
+                    gc.collect()
+                    start = default_timer()
+                    if pure:
+                        with pure_python_sorts():
+                            result = rewards(data)
+                    else:
+                        result = rewards(data)
+                    elapsed += (default_timer() - start) / trials
+                times.append(elapsed)
+                assert result == maximize_rewards(prices[:])
+            print(f"{name:>8} {size:>8} {times[0]:>9.4f} {times[1]:>9.4f} {times[2]:>9.4f} "
+                  f"{min(times[:2]) / times[2]:>7.2f}x")
+
+
+def _external_sort_rss(input_path: str, output_path: str, memory_limit: Optional[int]) -> Tuple[float, Optional[int]]:
+    """
+    Worker for bench_external_sort: sorts a file of floats, externally or entirely in memory if memory_limit is None,
+    and returns the seconds taken and the peak RSS of this fresh process in KB
+    """
+    start = default_timer()
+    if memory_limit is None:
+        with open(input_path) as source:
+            lines = source.read().splitlines()
+        hybrid_merge_sort(lines, key=float, adaptive=True)
+        with open(output_path, "w") as output:
+            output.writelines(line + "\n" for line in lines)
+    else:
+        external_sort(input_path, output_path, memory_limit=memory_limit, key=float)
+    elapsed = default_timer() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+    return elapsed, peak
+
+
+def bench_external_sort(size_mb: int = 2048, memory_limits: Tuple[int, ...] = (16, 64, 256),
+                        in_memory: bool = False, temp_dir: Optional[str] = None) -> None:
+    """
+    Sorts a synthetic file of random floats, one per line, with external_sort under several memory budgets
+    Each sort runs in its own process so its peak RSS is measured alone
+    :param size_mb: size of the generated input in MiB
+    :param memory_limits: memory_limit values to try, in MiB
+    :param in_memory: also sort the whole file in memory for comparison, only sensible for small inputs
+    :param temp_dir: directory for the input, output and run files
+    """
+    with tempfile.TemporaryDirectory(dir=temp_dir) as workspace:
+        input_path = os.path.join(workspace, "input.txt")
+        output_path = os.path.join(workspace, "output.txt")
+        rng = random.Random(331)
+        with open(input_path, "w", buffering=2 ** 20) as target:
+            written = 0
+            while written < size_mb * 2 ** 20:
+                block = "".join(f"{rng.random()!r}\n" for _ in range(100000))
+                target.write(block)
+                written += len(block)
+
+        budgets = [limit * 2 ** 20 for limit in memory_limits] + ([None] if in_memory else [])
+        print(f"input {written / 2 ** 20:.0f} MiB")
+        print(f"{'budget MiB':>11} {'seconds':>9} {'peak RSS MiB':>13}")
+        for budget in budgets:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, peak = pool.submit(_external_sort_rss, input_path, output_path, budget).result()
+            label = "in memory" if budget is None else budget // 2 ** 20
+            peak_mb = f"{peak / 1024:.0f}" if peak is not None else "n/a"
+            print(f"{label:>11} {elapsed:>9.2f} {peak_mb:>13}")
+
+
+def bench_partial_sort(size: int = 200000, ratios: Tuple[float, ...] = (0.0001, 0.001, 0.01, 0.1), trials: int = 3) -> None:
+    """
+    Compares taking the top k of a list by full sort with partial_sort's bounded heap (fed a generator) and quickselect
+    Records are (name, rating) tuples, highest rating first, with pure Python sorts
+    :param size: number of records
+    :param ratios: k / size values to try
+    :param trials: runs averaged per ratio
+    """
+    with pure_python_sorts():
+        records = [(f"movie{i}", random.random()) for i in range(size)]
+        by_rating = operator.itemgetter(1)
+        print(f"{'k':>8} {'full sort s':>12} {'heap s':>9} {'select s':>9} {'heap speedup':>13}")
+        for ratio in ratios:
+            k = max(int(size * ratio), 1)
+            times = [0, 0, 0]
+            for trial in range(trials):
+                gc.collect()
+                start = default_timer()
+                data = records[:]
+                hybrid_merge_sort(data, key=by_rating, descending=True)
+                full = data[:k]
+                times[0] += (default_timer() - start) / trials
+
+                gc.collect()
+                start = default_timer()
+                top = partial_sort((record for record in records), k, key=by_rating, descending=True)
+                times[1] += (default_timer() - start) / trials
+
+                gc.collect()
+                start = default_timer()
+                selected = partial_sort(records, k, key=by_rating, descending=True, ordered=False)
+                times[2] += (default_timer() - start) / trials
+                assert top == full and sorted(selected) == sorted(full)
+            print(f"{k:>8} {times[0]:>12.4f} {times[1]:>9.4f} {times[2]:>9.4f} {times[0] / times[1]:>12.2f}x")
+
+
+BENCHMARKS = {
+    "key_sorts": bench_key_sorts,
+    "merge_sort_memory": bench_merge_sort_memory,
+    "adaptive_merge_sort": bench_adaptive_merge_sort,
+    "parallel_merge_sort": bench_parallel_merge_sort,
+    "numpy_dispatch": bench_numpy_dispatch,
+    "introsort": bench_introsort,
+    "maximize_rewards": bench_maximize_rewards,
+    "external_sort": bench_external_sort,
+    "partial_sort": bench_partial_sort,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point, returns the exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", choices=tuple(ALGORITHMS), default=tuple(ALGORITHMS))
+    parser.add_argument("--distributions", nargs="+", choices=DISTRIBUTIONS, default=DISTRIBUTIONS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quadratic-cutoff", type=int, default=5000)
+    parser.add_argument("--count-cutoff", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=331)
+    parser.add_argument("--tune", action="store_true", help="also tune the hybrid_merge_sort threshold")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.001,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--bench", nargs="+", choices=tuple(BENCHMARKS),
+                        help="print these benchmarks of single changes instead of running the suite")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        for name in args.bench:
+            print(f"== {name}")
+            BENCHMARKS[name]()
+        return 0
+
+    report = {
+        "machine": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                    "platform": platform.platform(), "processor": platform.processor()},
+        "seed": args.seed,
+        "results": run_suite(tuple(args.algorithms), tuple(args.distributions), tuple(args.sizes), args.repeat,
+                             args.quadratic_cutoff, args.count_cutoff, args.seed),
+    }
+    if args.tune:
+        report["tuned_threshold"] = tune_threshold(seed=args.seed)
+        print(f"fastest hybrid_merge_sort threshold: {report['tuned_threshold']['threshold']}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            regressions = compare(report["results"], json.load(source)["results"], args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,12 +4,32 @@ Sorting Project - Starter
 CSE 331 Fall 2023
 """
 
+import functools
+import heapq
+import operator
+import os
+import pickle
 import random
+import sys
+import tempfile
 import time
-from typing import TypeVar, List, Callable, Dict, Tuple
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar, List, Callable, Dict, Tuple, Optional, Any, Iterable
 from dataclasses import dataclass
+from itertools import chain, repeat
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the sorts fall back to pure Python
+    np = None
 
 T = TypeVar("T")  # represents generic type
+NUMPY_MIN_SIZE = 64  # shortest list handed to NumPy, below it conversion costs more than sorting in Python
+# NUMPY_MIN_SIZE as overridden by numpy_min_size; a context variable, so a with block in one thread or task
+# does not change how sorts running concurrently elsewhere dispatch
+_numpy_min_size: ContextVar[int] = ContextVar("numpy_min_size", default=NUMPY_MIN_SIZE)
 
 
 # do_comparison is an optional helper function but HIGHLY recommended!!!
@@ -31,34 +51,237 @@ def do_comparison(first: T, second: T, comparator: Callable[[T, T], bool], desce
     return not result if descending else result
 
 
-def selection_sort(data: List[T], *, comparator: Callable[[T, T], bool] = lambda x, y: x < y,
-                   descending: bool = False) -> None:
+def make_ordering(comparator: Callable[[T, T], bool], descending: bool) -> Callable[[T, T], bool]:
     """
-    Sorts a list of values in-place using the selection sort algorithm and the provided comparator.
+    Builds the function the sorts call on every comparison, equivalent to do_comparison with the
+    descending flag resolved once instead of on every call.
 
     Parameters:
-    - data: List of items to be sorted.
     - comparator: A function which takes two arguments of type T and returns True when the first argument
-                  should be treated as less than the second argument. Defaults to less than comparison.
-    - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+                  should be treated as less than the second argument.
+    - descending: A boolean indicating whether the list should be sorted in descending order.
 
     Returns:
-    None. The list is sorted in-place.
+    - Callable[[T, T], bool]: A function returning True if its first argument should come before its second.
+                              The default comparator maps straight to operator.lt, or when descending to
+                              "not first < second" without the call through comparator. It is not operator.ge,
+                              which differs from "not lt" for NaN and other partial orders.
+    """
+    if comparator is operator.lt:
+        return (lambda first, second: not first < second) if descending else operator.lt
+    if descending:
+        return lambda first, second: not comparator(first, second)
+    return comparator
+
+
+def make_strict_ordering(comparator: Callable[[T, T], bool], descending: bool) -> Callable[[T, T], bool]:
+    """
+    Builds a function returning True only when its first argument must come strictly before its second,
+    unlike make_ordering, whose descending ordering also holds for equal items. Run detection and
+    galloping need the strict form to tell ordered runs apart from equal ones and to keep ties stable.
+
+    Parameters:
+    - comparator: A function which takes two arguments of type T and returns True when the first argument
+                  should be treated as less than the second argument.
+    - descending: A boolean indicating whether the list should be sorted in descending order.
+
+    Returns:
+    - Callable[[T, T], bool]: A function returning True if its first argument should come strictly before its second.
+    """
+    if comparator is operator.lt:
+        return operator.gt if descending else operator.lt
+    if descending:
+        return lambda first, second: comparator(second, first)
+    return comparator
+
+
+def decorate(data: List[T], key: Optional[Callable[[T], Any]]) -> Tuple[List[Any], Optional[List[T]]]:
+    """
+    Splits a list into what the sorts compare and what they carry along (decorate-sort-undecorate).
+
+    Parameters:
+    - data: List of items to be sorted.
+    - key: A function computing the value an item is compared by, or None to compare the items themselves.
+
+    Returns:
+    - Tuple[List[Any], Optional[List[T]]]: Without a key, (data, None). With a key, the key of every item,
+                                           computed once, and data itself, which the sorts permute in step
+                                           with the keys so no undecorate pass is needed.
+    """
+    if key is None:
+        return data, None
+    return [key(item) for item in data], data
+
+
+def _numeric_array(values: List[Any]) -> Optional["np.ndarray"]:
+    """
+    Converts values to an int64 or float64 NumPy array if they are all ints (not bools) or all floats, and sorting
+    the array cannot be told apart from sorting the list: no NaNs, which compare inconsistently, and not both
+    signs of zero, which compare equal but would be ordered differently than by the Python sorts.
+
+    Returns:
+    - Optional[np.ndarray]: The array, or None if values must be sorted in Python.
+    """
+    if all(type(value) is int for value in values):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return None
+    if all(type(value) is float for value in values):
+        array_values = np.array(values, dtype=np.float64)
+        if np.isnan(array_values).any():
+            return None
+        zero_signs = np.signbit(array_values[array_values == 0])
+        if zero_signs.any() and not zero_signs.all():
+            return None
+        return array_values
+    return None
+
+
+def _numpy_sort(data: List[T], comparator: Callable[[T, T], bool], descending: bool,
+                key: Optional[Callable[[T], Any]], stable: bool) -> bool:
+    """
+    Sorts data in place with NumPy when it gives exactly what the calling Python sort would: the default comparator,
+    at least NUMPY_MIN_SIZE items (or the size set by numpy_min_size), and numeric values (or keys). Equal numbers
+    of one type are indistinguishable, so without a key any sort can dispatch. With a key, equal keys can carry
+    different items, so only a caller that is stable for this ordering can use NumPy's stable argsort.
+
+    Parameters:
+    - data: List of items to be sorted.
+    - comparator, descending, key: The arguments the calling sort was given.
+    - stable: Whether the calling sort keeps items with equal keys in their original order.
+
+    Returns:
+    - bool: True if data was sorted, False if the caller should sort it itself.
+    """
+    if np is None or comparator is not operator.lt or len(data) < _numpy_min_size.get():
+        return False
+    if key is None:
+        values = _numeric_array(data)
+        if values is None:
+            return False
+        values.sort(kind='stable')
+        data[:] = (values[::-1] if descending else values).tolist()
+        return True
+    if not stable:
+        return False
+    values = _numeric_array([key(item) for item in data])
+    if values is None:
+        return False
+    if descending:
+        # Ascending stable sort of the reversed keys, read backwards, puts equal keys in their original order
+        order = len(values) - 1 - np.argsort(values[::-1], kind='stable')[::-1]
+    else:
+        order = np.argsort(values, kind='stable')
+    data[:] = [data[index] for index in order.tolist()]
+    return True
+
+
+@contextmanager
+def numpy_min_size(size: int):
+    """
+    Sets the shortest list the sorts hand to NumPy inside a with block, in the current thread or task only.
+    Can also decorate a function, which then runs with that size.
+
+    Parameters:
+    - size: The new minimum, 0 to dispatch every list and sys.maxsize to never dispatch.
     """
-    n = len(data)
+    token = _numpy_min_size.set(size)
+    try:
+        yield
+    finally:
+        _numpy_min_size.reset(token)
+
+
+def pure_python_sorts():
+    """
+    Turns off NumPy dispatch inside a with block or a decorated function, so the sorts run their own algorithms,
+    e.g. to time them.
+    """
+    return numpy_min_size(sys.maxsize)
+
+
+def _selection_sort(keys: List[Any], before: Callable[[Any, Any], bool], items: Optional[List[T]]) -> None:
+    """
+    Selection sort of keys by the before ordering, applying every swap to items as well if given.
+    """
+    n = len(keys)
     for i in range(n):
         # Assume the minimum is the first element
         min_idx = i
         # Test against elements after i to find the smallest
         for j in range(i + 1, n):
-            if do_comparison(data[j], data[min_idx], comparator, descending):
+            if before(keys[j], keys[min_idx]):
                 min_idx = j
         # Swap the found minimum element with the first element
-        data[i], data[min_idx] = data[min_idx], data[i]
+        keys[i], keys[min_idx] = keys[min_idx], keys[i]
+        if items is not None:
+            items[i], items[min_idx] = items[min_idx], items[i]
+
+
+def _bubble_sort(keys: List[Any], before: Callable[[Any, Any], bool], items: Optional[List[T]]) -> None:
+    """
+    Bubble sort of keys by the before ordering, applying every swap to items as well if given.
+    """
+    n = len(keys)
+    for i in range(n):
+        swapped = False
+        for j in range(0, n - i - 1):
+            if before(keys[j + 1], keys[j]):
+                keys[j], keys[j + 1] = keys[j + 1], keys[j]
+                if items is not None:
+                    items[j], items[j + 1] = items[j + 1], items[j]
+                swapped = True
+        # If no two elements were swapped by inner loop, then the list is sorted
+        if not swapped:
+            break
+
+
+def _insertion_sort(keys: List[Any], before: Callable[[Any, Any], bool], items: Optional[List[T]],
+                    lo: int = 0, hi: Optional[int] = None) -> None:
+    """
+    Insertion sort of keys[lo:hi] by the before ordering, applying every move to items as well if given.
+    """
+    if hi is None:
+        hi = len(keys)
+    for i in range(lo + 1, hi):
+        current = keys[i]
+        item = items[i] if items is not None else None
+        j = i - 1
+        while j >= lo and before(current, keys[j]):
+            keys[j + 1] = keys[j]
+            if items is not None:
+                items[j + 1] = items[j]
+            j -= 1
+        keys[j + 1] = current
+        if items is not None:
+            items[j + 1] = item
+
+
+def selection_sort(data: List[T], *, comparator: Callable[[T, T], bool] = operator.lt,
+                   descending: bool = False, key: Optional[Callable[[T], Any]] = None) -> None:
+    """
+    Sorts a list of values in-place using the selection sort algorithm and the provided comparator.
+
+    Parameters:
+    - data: List of items to be sorted.
+    - comparator: A function which takes two arguments of type T and returns True when the first argument
+                  should be treated as less than the second argument. Defaults to less than comparison.
+    - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item. The comparator is
+           then applied to these values. Defaults to comparing the items themselves.
+
+    Returns:
+    None. The list is sorted in-place.
+    """
+    if _numpy_sort(data, comparator, descending, key, False):
+        return
+    keys, items = decorate(data, key)
+    _selection_sort(keys, make_ordering(comparator, descending), items)
 
 
-def bubble_sort(data: List[T], *, comparator: Callable[[T, T], bool] = lambda x, y: x < y,
-                descending: bool = False) -> None:
+def bubble_sort(data: List[T], *, comparator: Callable[[T, T], bool] = operator.lt,
+                descending: bool = False, key: Optional[Callable[[T], Any]] = None) -> None:
     """
     Sorts a list of values in-place using the bubble sort algorithm and the provided comparator.
 
@@ -67,24 +290,20 @@ def bubble_sort(data: List[T], *, comparator: Callable[[T, T], bool] = lambda x,
     - comparator: A function which takes two arguments of type T and returns True when the first argument
                   should be treated as less than the second argument. Defaults to less than comparison.
     - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item. The comparator is
+           then applied to these values. Defaults to comparing the items themselves.
 
     Returns:
     None. The list is sorted in-place.
     """
-    n = len(data)
-    for i in range(n):
-        swapped = False
-        for j in range(0, n - i - 1):
-            if do_comparison(data[j + 1], data[j], comparator, descending):
-                data[j], data[j + 1] = data[j + 1], data[j]
-                swapped = True
-        # If no two elements were swapped by inner loop, then the list is sorted
-        if not swapped:
-            break
+    if _numpy_sort(data, comparator, descending, key, not descending):
+        return
+    keys, items = decorate(data, key)
+    _bubble_sort(keys, make_ordering(comparator, descending), items)
 
 
-def insertion_sort(data: List[T], *, comparator: Callable[[T, T], bool] = lambda x, y: x < y,
-                   descending: bool = False) -> None:
+def insertion_sort(data: List[T], *, comparator: Callable[[T, T], bool] = operator.lt,
+                   descending: bool = False, key: Optional[Callable[[T], Any]] = None) -> None:
     """
     Sorts a list of values in-place using the insertion sort algorithm and the provided comparator.
 
@@ -93,20 +312,375 @@ def insertion_sort(data: List[T], *, comparator: Callable[[T, T], bool] = lambda
     - comparator: A function which takes two arguments of type T and returns True when the first argument
                   should be treated as less than the second argument. Defaults to less than comparison.
     - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item. The comparator is
+           then applied to these values. Defaults to comparing the items themselves.
 
     Returns:
     None. The list is sorted in-place.
     """
-    for i in range(1, len(data)):
-        key = data[i]
-        j = i - 1
-        while j >= 0 and do_comparison(key, data[j], comparator, descending):
-            data[j + 1] = data[j]
-            j -= 1
-        data[j + 1] = key
+    if _numpy_sort(data, comparator, descending, key, not descending):
+        return
+    keys, items = decorate(data, key)
+    _insertion_sort(keys, make_ordering(comparator, descending), items)
+
+
+def _leaf_bounds(n: int, threshold: int) -> List[int]:
+    """
+    Finds the sublists the recursive hybrid merge sort would hand to insertion sort: halving
+    [0, n) until pieces hold at most threshold items. Sorting the same leaves keeps results
+    identical to the recursive version, including the order of equal items.
+
+    Returns:
+    - List[int]: The start of every leaf in order, followed by n.
+    """
+    bounds = []
+    stack = [(0, n)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= max(threshold, 1):
+            bounds.append(lo)
+        else:
+            mid = lo + (hi - lo) // 2
+            stack.append((mid, hi))
+            stack.append((lo, mid))
+    bounds.append(n)
+    return bounds
+
+
+def _merge_runs(source: List[Any], target: List[Any], lo: int, mid: int, hi: int,
+                before: Callable[[Any, Any], bool], source_items: Optional[List[T]],
+                target_items: Optional[List[T]]) -> None:
+    """
+    Merges the sorted runs source[lo:mid] and source[mid:hi] into target[lo:hi], moving items in step if given.
+    Like merge, the left item is taken only when it comes strictly before the right one.
+    """
+    i, j = lo, mid
+    k = lo
+    while i < mid and j < hi:
+        if before(source[i], source[j]):
+            target[k] = source[i]
+            if target_items is not None:
+                target_items[k] = source_items[i]
+            i += 1
+        else:
+            target[k] = source[j]
+            if target_items is not None:
+                target_items[k] = source_items[j]
+            j += 1
+        k += 1
+    # At most one side has items left, already in order
+    if i < mid:
+        target[k:hi] = source[i:mid]
+        if target_items is not None:
+            target_items[k:hi] = source_items[i:mid]
+    elif j < hi:
+        target[k:hi] = source[j:hi]
+        if target_items is not None:
+            target_items[k:hi] = source_items[j:hi]
+
+
+def _hybrid_merge_sort(keys: List[Any], before: Callable[[Any, Any], bool], threshold: int,
+                       items: Optional[List[T]]) -> None:
+    """
+    Bottom-up hybrid merge sort of keys by the before ordering, applying every move to items as well if given.
+    Insertion sorts the leaves in place, then merges neighbouring runs pass by pass, alternating
+    between the list and a single scratch buffer instead of slicing at every level.
+    """
+    n = len(keys)
+    if n <= 1:
+        return
+
+    runs = _leaf_bounds(n, threshold)
+    for lo, hi in zip(runs, runs[1:]):
+        _insertion_sort(keys, before, items, lo, hi)
+
+    source, target = keys, [None] * n
+    source_items, target_items = items, ([None] * n if items is not None else None)
+    while len(runs) > 2:
+        merged = [0]
+        for r in range(0, len(runs) - 1, 2):
+            lo, mid = runs[r], runs[r + 1]
+            hi = runs[r + 2] if r + 2 < len(runs) else mid
+            _merge_runs(source, target, lo, mid, hi, before, source_items, target_items)
+            merged.append(hi)
+        runs = merged
+        source, target = target, source
+        source_items, target_items = target_items, source_items
+
+    # An odd number of passes leaves the result in the scratch buffer
+    if source is not keys:
+        keys[:] = source
+        if items is not None:
+            items[:] = source_items
+
+
+MIN_GALLOP = 7  # consecutive wins by one run before merging switches to galloping
+
+
+def _min_run(n: int) -> int:
+    """
+    Returns the shortest run the adaptive sort builds before merging: n itself below 64, otherwise a value
+    in [32, 64] chosen so n / min_run is close to a power of two, which keeps the merges balanced.
+    """
+    extra = 0
+    while n >= 64:
+        extra |= n & 1
+        n >>= 1
+    return n + extra
+
+
+def _count_run(keys: List[Any], lo: int, n: int, less: Callable[[Any, Any], bool],
+               items: Optional[List[T]]) -> int:
+    """
+    Finds the natural run starting at lo and returns where it ends. A strictly descending run is
+    reversed in place; requiring strictness means reversing it never reorders equal items.
+    """
+    i = lo + 1
+    if i == n:
+        return n
+    if less(keys[i], keys[lo]):
+        i += 1
+        while i < n and less(keys[i], keys[i - 1]):
+            i += 1
+        keys[lo:i] = keys[lo:i][::-1]
+        if items is not None:
+            items[lo:i] = items[lo:i][::-1]
+    else:
+        i += 1
+        while i < n and not less(keys[i], keys[i - 1]):
+            i += 1
+    return i
+
+
+def _binary_insertion_sort(keys: List[Any], less: Callable[[Any, Any], bool], items: Optional[List[T]],
+                           lo: int, start: int, hi: int) -> None:
+    """
+    Extends the sorted run keys[lo:start] to keys[lo:hi], placing each item after the equal items already
+    in the run with a binary search and shifting the tail with one slice move.
+    """
+    for i in range(start, hi):
+        current = keys[i]
+        left, right = lo, i
+        while left < right:
+            middle = (left + right) // 2
+            if less(current, keys[middle]):
+                right = middle
+            else:
+                left = middle + 1
+        keys[left + 1:i + 1] = keys[left:i]
+        keys[left] = current
+        if items is not None:
+            item = items[i]
+            items[left + 1:i + 1] = items[left:i]
+            items[left] = item
+
+
+def _gallop(run: List[Any], lo: int, hi: int, holds: Callable[[Any], bool], from_end: bool) -> int:
+    """
+    Returns the first index in run[lo:hi] where holds turns False, given that it holds for a prefix of the run.
+    Probes 1, 3, 7, ... items in from the chosen end, then binary searches the last gap, so a boundary
+    k items from that end costs O(log k) comparisons.
+    """
+    n = hi - lo
+    if not from_end:
+        if n == 0 or not holds(run[lo]):
+            return lo
+        last, offset = 0, 1
+        while offset < n and holds(run[lo + offset]):
+            last, offset = offset, offset * 2 + 1
+        left, right = lo + last + 1, lo + min(offset, n)
+    else:
+        if n == 0 or holds(run[hi - 1]):
+            return hi
+        last, offset = 0, 1
+        while offset < n and not holds(run[hi - 1 - offset]):
+            last, offset = offset, offset * 2 + 1
+        left, right = hi - min(offset, n), hi - 1 - last
+    while left < right:
+        middle = (left + right) // 2
+        if holds(run[middle]):
+            left = middle + 1
+        else:
+            right = middle
+    return left
+
+
+def _merge_low(keys: List[Any], items: Optional[List[T]], lo: int, mid: int, hi: int,
+               less: Callable[[Any, Any], bool], min_gallop: int) -> int:
+    """
+    Merges keys[lo:mid] and keys[mid:hi] front to back, copying only the shorter left run aside.
+    Returns the updated galloping threshold.
+    """
+    left = keys[lo:mid]
+    left_items = items[lo:mid] if items is not None else None
+    n_left = mid - lo
+    i, j, k = 0, mid, lo
+    while i < n_left and j < hi:
+        left_wins = right_wins = 0
+        # One item at a time until one run keeps winning
+        while i < n_left and j < hi:
+            if less(keys[j], left[i]):
+                keys[k] = keys[j]
+                if items is not None:
+                    items[k] = items[j]
+                j += 1
+                right_wins, left_wins = right_wins + 1, 0
+            else:
+                keys[k] = left[i]
+                if items is not None:
+                    items[k] = left_items[i]
+                i += 1
+                left_wins, right_wins = left_wins + 1, 0
+            k += 1
+            if left_wins >= min_gallop or right_wins >= min_gallop:
+                break
+        # Galloping: move whole blocks while they stay long
+        while i < n_left and j < hi:
+            pivot = keys[j]
+            end = _gallop(left, i, n_left, lambda value: not less(pivot, value), False)
+            count = end - i
+            keys[k:k + count] = left[i:end]
+            if items is not None:
+                items[k:k + count] = left_items[i:end]
+            k, i = k + count, end
+            if i == n_left:
+                break
+            pivot = left[i]
+            end = _gallop(keys, j, hi, lambda value: less(value, pivot), False)
+            moved = end - j
+            keys[k:k + moved] = keys[j:end]
+            if items is not None:
+                items[k:k + moved] = items[j:end]
+            k, j = k + moved, end
+            if count < MIN_GALLOP and moved < MIN_GALLOP:
+                min_gallop += 1
+                break
+            min_gallop = max(1, min_gallop - 1)
+    # Whatever is left of the right run is already in place
+    keys[k:k + n_left - i] = left[i:]
+    if items is not None:
+        items[k:k + n_left - i] = left_items[i:]
+    return min_gallop
+
+
+def _merge_high(keys: List[Any], items: Optional[List[T]], lo: int, mid: int, hi: int,
+                less: Callable[[Any, Any], bool], min_gallop: int) -> int:
+    """
+    Merges keys[lo:mid] and keys[mid:hi] back to front, copying only the shorter right run aside.
+    Returns the updated galloping threshold.
+    """
+    right = keys[mid:hi]
+    right_items = items[mid:hi] if items is not None else None
+    i, j, k = hi - mid - 1, mid - 1, hi - 1
+    while i >= 0 and j >= lo:
+        left_wins = right_wins = 0
+        while i >= 0 and j >= lo:
+            if less(right[i], keys[j]):
+                keys[k] = keys[j]
+                if items is not None:
+                    items[k] = items[j]
+                j -= 1
+                left_wins, right_wins = left_wins + 1, 0
+            else:
+                keys[k] = right[i]
+                if items is not None:
+                    items[k] = right_items[i]
+                i -= 1
+                right_wins, left_wins = right_wins + 1, 0
+            k -= 1
+            if left_wins >= min_gallop or right_wins >= min_gallop:
+                break
+        while i >= 0 and j >= lo:
+            pivot = keys[j]
+            start = _gallop(right, 0, i + 1, lambda value: less(value, pivot), True)
+            count = i + 1 - start
+            keys[k - count + 1:k + 1] = right[start:i + 1]
+            if items is not None:
+                items[k - count + 1:k + 1] = right_items[start:i + 1]
+            k, i = k - count, start - 1
+            if i < 0:
+                break
+            pivot = right[i]
+            start = _gallop(keys, lo, j + 1, lambda value: not less(pivot, value), True)
+            moved = j + 1 - start
+            keys[k - moved + 1:k + 1] = keys[start:j + 1]
+            if items is not None:
+                items[k - moved + 1:k + 1] = items[start:j + 1]
+            k, j = k - moved, start - 1
+            if count < MIN_GALLOP and moved < MIN_GALLOP:
+                min_gallop += 1
+                break
+            min_gallop = max(1, min_gallop - 1)
+    # Whatever is left of the left run is already in place
+    keys[lo:lo + i + 1] = right[:i + 1]
+    if items is not None:
+        items[lo:lo + i + 1] = right_items[:i + 1]
+    return min_gallop
+
+
+def _merge_adjacent(keys: List[Any], items: Optional[List[T]], lo: int, mid: int, hi: int,
+                    less: Callable[[Any, Any], bool], min_gallop: int) -> int:
+    """
+    Merges the neighbouring sorted runs keys[lo:mid] and keys[mid:hi], taking left items first on ties.
+    Items of the left run not after keys[mid], and of the right run not before keys[mid - 1], are found by
+    galloping and never moved. Returns the updated galloping threshold.
+    """
+    first = keys[mid]
+    lo = _gallop(keys, lo, mid, lambda value: not less(first, value), False)
+    if lo == mid:
+        return min_gallop
+    last = keys[mid - 1]
+    hi = _gallop(keys, mid, hi, lambda value: less(value, last), True)
+    if mid - lo <= hi - mid:
+        return _merge_low(keys, items, lo, mid, hi, less, min_gallop)
+    return _merge_high(keys, items, lo, mid, hi, less, min_gallop)
+
+
+def _adaptive_merge_sort(keys: List[Any], less: Callable[[Any, Any], bool], items: Optional[List[T]]) -> None:
+    """
+    Timsort-style stable merge sort of keys by the strict less ordering, applying every move to items as well
+    if given. Natural runs are found and extended to a minimum length with binary insertion sort, then merged
+    from a stack whose run lengths grow roughly like the Fibonacci numbers, so input made of k runs costs
+    O(n log k) comparisons and sorted or reversed input costs n - 1.
+    """
+    n = len(keys)
+    if n <= 1:
+        return
+    min_run = _min_run(n)
+    min_gallop = MIN_GALLOP
+    runs = []  # (start, length) of the pending runs, left to right
+    lo = 0
+    while lo < n:
+        hi = _count_run(keys, lo, n, less, items)
+        if hi - lo < min_run:
+            forced = min(lo + min_run, n)
+            _binary_insertion_sort(keys, less, items, lo, hi, forced)
+            hi = forced
+        runs.append((lo, hi - lo))
+        lo = hi
+
+        # Restore the stack invariants: each run longer than the next, and than the two after it combined
+        while len(runs) > 1:
+            m = len(runs) - 2
+            if (m > 0 and runs[m - 1][1] <= runs[m][1] + runs[m + 1][1]) or \
+                    (m > 1 and runs[m - 2][1] <= runs[m - 1][1] + runs[m][1]):
+                if runs[m - 1][1] < runs[m + 1][1]:
+                    m -= 1
+            elif runs[m][1] > runs[m + 1][1]:
+                break
+            (start, length), (mid, other) = runs[m], runs[m + 1]
+            runs[m:m + 2] = [(start, length + other)]
+            min_gallop = _merge_adjacent(keys, items, start, mid, mid + other, less, min_gallop)
+
+    while len(runs) > 1:
+        (start, length), (mid, other) = runs[-2], runs[-1]
+        runs[-2:] = [(start, length + other)]
+        min_gallop = _merge_adjacent(keys, items, start, mid, mid + other, less, min_gallop)
+
 
 def hybrid_merge_sort(data: List[T], *, threshold: int = 12,
-                      comparator: Callable[[T, T], bool] = lambda x, y: x < y, descending: bool = False) -> None:
+                      comparator: Callable[[T, T], bool] = operator.lt, descending: bool = False,
+                      key: Optional[Callable[[T], Any]] = None, adaptive: bool = False) -> None:
     """
     Sorts a list of values using a hybrid merge sort algorithm, which utilizes insertion sort for smaller subarrays.
     
@@ -116,28 +690,207 @@ def hybrid_merge_sort(data: List[T], *, threshold: int = 12,
     - comparator: A function which takes two arguments of type T and returns True when the first argument
                   should be treated as less than the second argument. Defaults to less than comparison.
     - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item. The comparator is
+           then applied to these values. Defaults to comparing the items themselves.
+    - adaptive: Whether to sort Timsort-style instead: natural ascending and descending runs are found and merged
+                with galloping, so nearly sorted input costs close to O(n). This mode is stable and ignores
+                threshold. Defaults to False.
     
     Returns:
     None. The list is sorted in-place.
     """
-    if len(data) <= 1:
+    if _numpy_sort(data, comparator, descending, key, adaptive):
         return
+    keys, items = decorate(data, key)
+    if adaptive:
+        _adaptive_merge_sort(keys, make_strict_ordering(comparator, descending), items)
+    else:
+        _hybrid_merge_sort(keys, make_ordering(comparator, descending), threshold, items)
+
+def _numeric_buffer(values: List[Any]) -> Any:
+    """
+    Packs all-float or all-int values into an array so they cross to a worker process as one flat buffer
+    instead of one pickled object per item. Anything else is returned as it is.
+    """
+    if all(type(value) is float for value in values):
+        return array('d', values)
+    if all(type(value) is int for value in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return values
+    return values
+
+
+def _sort_chunk(task: Tuple[Any, int, Callable[[T, T], bool], bool]) -> array:
+    """
+    Worker for parallel_merge_sort: stably sorts one chunk of keys and returns the sorted positions,
+    offset to their place in the whole list, as an array of indices.
+    """
+    values, offset, comparator, descending = task
+    keys = list(values)
+    order = list(range(offset, offset + len(keys)))
+    _adaptive_merge_sort(keys, make_strict_ordering(comparator, descending), order)
+    return array('q', order)
+
+
+def parallel_merge_sort(data: List[T], *, workers: Optional[int] = None,
+                        comparator: Callable[[T, T], bool] = operator.lt, descending: bool = False,
+                        key: Optional[Callable[[T], Any]] = None, serial_threshold: int = 50000) -> None:
+    """
+    Sorts a list of values in-place by sorting chunks of it in a process pool and combining them with a k-way heap merge.
+    Only the compared values are sent to the workers, as flat arrays when they are all ints or all floats, and each
+    worker sends back the order of its chunk as an array of indices. The sort is stable, and the result is exactly
+    that of hybrid_merge_sort(data, adaptive=True) with the same arguments.
+
+    Parameters:
+    - data: List of items to be sorted.
+    - workers: Number of worker processes, and of chunks. Defaults to the number of CPUs.
+    - comparator: A function which takes two arguments of type T and returns True when the first argument
+                  should be treated as less than the second argument. Defaults to less than comparison.
+                  It must be picklable, such as a module-level function, to reach the workers; otherwise
+                  the list is sorted serially.
+    - descending: A boolean indicating whether the list should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item in this process.
+           Defaults to comparing the items themselves.
+    - serial_threshold: Lists shorter than this are sorted serially, where starting processes would cost more
+                        than it saves. Defaults to 50000.
 
-    if len(data) <= threshold:
-        insertion_sort(data, comparator=comparator, descending=descending)
+    Returns:
+    None. The list is sorted in-place.
+    """
+    if _numpy_sort(data, comparator, descending, key, True):
         return
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(data) < max(serial_threshold, 2):
+        hybrid_merge_sort(data, comparator=comparator, descending=descending, key=key, adaptive=True)
+        return
+    if comparator is not operator.lt:
+        try:
+            pickle.dumps(comparator)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            hybrid_merge_sort(data, comparator=comparator, descending=descending, key=key, adaptive=True)
+            return
+
+    keys = data if key is None else [key(item) for item in data]
+    size = -(-len(keys) // workers)
+    tasks = [(_numeric_buffer(keys[lo:lo + size]), lo, comparator, descending)
+             for lo in range(0, len(keys), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        runs = list(pool.map(_sort_chunk, tasks))
+
+    # heapq.merge takes equal items from earlier runs first, which keeps the merge stable
+    if comparator is operator.lt:
+        order = heapq.merge(*runs, key=keys.__getitem__, reverse=descending)
+    else:
+        less = make_strict_ordering(comparator, descending)
+        wrap = functools.cmp_to_key(lambda first, second: -1 if less(first, second) else int(less(second, first)))
+        order = heapq.merge(*runs, key=lambda index: wrap(keys[index]))
+    data[:] = [data[index] for index in order]
+
+
+def _merge_files(paths: List[str], output: Any, comparator: Callable[[str, str], bool], descending: bool,
+                 key: Optional[Callable[[str], Any]], buffer_size: int) -> None:
+    """
+    k-way heap merge of sorted run files, one record per line, written to the open text file output.
+    Equal records are taken from earlier runs first, so merging keeps a stable sort stable.
+    """
+    runs = [open(path, "r", buffering=buffer_size) for path in paths]
+    try:
+        # Runs end every record with a newline, which must not take part in comparisons
+        value = (lambda line: line[:-1]) if key is None else (lambda line: key(line[:-1]))
+        if comparator is operator.lt:
+            merged = heapq.merge(*runs, key=value, reverse=descending)
+        else:
+            less = make_strict_ordering(comparator, descending)
+            wrap = functools.cmp_to_key(lambda first, second: -1 if less(first, second) else int(less(second, first)))
+            merged = heapq.merge(*runs, key=lambda line: wrap(value(line)))
+        output.writelines(merged)
+    finally:
+        for run in runs:
+            run.close()
 
-    mid = len(data) // 2
-    left_half = data[:mid]
-    right_half = data[mid:]
 
-    hybrid_merge_sort(left_half, threshold=threshold, comparator=comparator, descending=descending)
-    hybrid_merge_sort(right_half, threshold=threshold, comparator=comparator, descending=descending)
+def external_sort(input_path: str, output_path: str, *, memory_limit: int = 64 * 2 ** 20,
+                  comparator: Callable[[T, T], bool] = operator.lt, descending: bool = False,
+                  key: Optional[Callable[[str], Any]] = None, fan_in: int = 64, buffer_size: int = 2 ** 20,
+                  temp_dir: Optional[str] = None) -> int:
+    """
+    Sorts a text file too large for memory, one record per line, into output_path.
+    The input is read in chunks of about memory_limit bytes of text; each chunk is sorted in memory with
+    hybrid_merge_sort(adaptive=True), which dispatches to NumPy for numeric keys, and spilled to a temporary run file.
+    The runs are then combined with buffered k-way heap merges, at most fan_in files at a time. The sort is stable.
+
+    Parameters:
+    - input_path: File to sort. Its last line need not end with a newline; every output line does.
+    - output_path: File to write the sorted lines to.
+    - memory_limit: Bytes of input text sorted in memory at a time. Python objects take several times their
+                    text size, so allow for that when choosing it. Defaults to 64 MiB.
+    - comparator: A function which takes two arguments of type T and returns True when the first argument
+                  should be treated as less than the second argument. Defaults to less than comparison.
+    - descending: A boolean indicating whether the file should be sorted in descending order. Defaults to False.
+    - key: A function computing the value each line, without its newline, is compared by, e.g. float for
+           numeric records. Defaults to comparing the lines themselves.
+    - fan_in: Most run files merged at once, bounding open files and read buffers. Defaults to 64.
+    - buffer_size: Read and write buffer of each file in bytes. Defaults to 1 MiB.
+    - temp_dir: Directory for the run files. Defaults to the system temporary directory.
+
+    Returns:
+    - int: The number of runs spilled to disk, 0 if the input fit in a single chunk.
+    """
+    def sort_chunk(lines):
+        hybrid_merge_sort(lines, comparator=comparator, descending=descending, key=key, adaptive=True)
+        return (line + "\n" for line in lines)
+
+    with tempfile.TemporaryDirectory(dir=temp_dir) as workspace:
+        runs = []
+        with open(input_path, "r", buffering=buffer_size) as source:
+            chunk, held = [], 0
+            for line in source:
+                if line.endswith("\n"):
+                    line = line[:-1]
+                chunk.append(line)
+                held += len(line) + 1
+                if held >= memory_limit:
+                    path = os.path.join(workspace, f"run{len(runs)}")
+                    with open(path, "w", buffering=buffer_size) as run:
+                        run.writelines(sort_chunk(chunk))
+                    runs.append(path)
+                    chunk, held = [], 0
+
+            if not runs:
+                # Everything fit in memory, no run files needed
+                with open(output_path, "w", buffering=buffer_size) as output:
+                    output.writelines(sort_chunk(chunk))
+                return 0
+            if chunk:
+                path = os.path.join(workspace, f"run{len(runs)}")
+                with open(path, "w", buffering=buffer_size) as run:
+                    run.writelines(sort_chunk(chunk))
+                runs.append(path)
+            del chunk
+
+        spilled = len(runs)
+        fan_in = max(fan_in, 2)
+        # Merge neighbouring groups until one pass can finish, keeping earlier runs first for stability
+        while len(runs) > fan_in:
+            merged = []
+            for start in range(0, len(runs), fan_in):
+                group = runs[start:start + fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                path = os.path.join(workspace, f"run{spilled + len(merged)}-{len(runs)}")
+                with open(path, "w", buffering=buffer_size) as output:
+                    _merge_files(group, output, comparator, descending, key, buffer_size)
+                for used in group:
+                    os.remove(used)
+                merged.append(path)
+            runs = merged
+        with open(output_path, "w", buffering=buffer_size) as output:
+            _merge_files(runs, output, comparator, descending, key, buffer_size)
+        return spilled
 
-    # Merging the two halves back into the original data list
-    merged = merge(left_half, right_half, comparator=comparator, descending=descending)
-    for i, value in enumerate(merged):
-        data[i] = value
 
 def merge(left: List[T], right: List[T], *, comparator: Callable[[T, T], bool], descending: bool) -> List[T]:
     """
@@ -174,6 +927,98 @@ def merge(left: List[T], right: List[T], *, comparator: Callable[[T, T], bool],
 
     return merged
 
+def _quickselect(keys: List[Any], less: Callable[[Any, Any], bool], items: Optional[List[T]], k: int) -> None:
+    """
+    Rearranges keys, and items in step if given, so their first k positions hold k keys a full sort could put first,
+    in no particular order. Three-way partitions around random pivots, O(n) expected time.
+    """
+    lo, hi = 0, len(keys) - 1
+    while lo < hi:
+        pivot = keys[random.randint(lo, hi)]
+        # keys[lo:smaller] before pivot, keys[smaller:i] tied with it, keys[larger + 1:hi + 1] after it
+        smaller, i, larger = lo, lo, hi
+        while i <= larger:
+            if less(keys[i], pivot):
+                keys[smaller], keys[i] = keys[i], keys[smaller]
+                if items is not None:
+                    items[smaller], items[i] = items[i], items[smaller]
+                smaller += 1
+                i += 1
+            elif less(pivot, keys[i]):
+                keys[i], keys[larger] = keys[larger], keys[i]
+                if items is not None:
+                    items[i], items[larger] = items[larger], items[i]
+                larger -= 1
+            else:
+                i += 1
+        if k <= smaller:
+            hi = smaller - 1
+        elif k > larger + 1:
+            lo = larger + 1
+        else:
+            return
+
+
+def partial_sort(data: Iterable[T], k: int, *, comparator: Callable[[T, T], bool] = operator.lt,
+                 descending: bool = False, key: Optional[Callable[[T], Any]] = None, ordered: bool = True) -> List[T]:
+    """
+    Finds the first k items of the sorted order without sorting everything.
+    By default keeps a bounded heap of the best k items seen, in O(n log k) time and O(k) memory, so data can be
+    any iterable, e.g. a generator too large to hold; the result equals hybrid_merge_sort(adaptive=True) on the
+    whole input cut to k items, ties included. With ordered=False, quickselect finds them in O(n) expected time,
+    returned in no particular order; that needs the whole input in a list.
+
+    Parameters:
+    - data: List or iterable of items. It is not modified.
+    - k: The number of items wanted. Fewer are returned if data has fewer.
+    - comparator: A function which takes two arguments of type T and returns True when the first argument
+                  should be treated as less than the second argument. Defaults to less than comparison.
+    - descending: A boolean indicating whether to find the largest items, largest first. Defaults to False.
+    - key: A function computing the value each item is compared by, called once per item. Defaults to comparing
+           the items themselves.
+    - ordered: Whether the k items must come out sorted. Defaults to True.
+
+    Returns:
+    - List[T]: A new list of the first k items.
+    """
+    if k <= 0:
+        return []
+    if not ordered:
+        items = list(data)
+        if k >= len(items):
+            return items
+        keys, moved = decorate(items, key)
+        if moved is None:
+            keys = items
+        _quickselect(keys, make_strict_ordering(comparator, descending), moved, k)
+        return items[:k]
+
+    if comparator is operator.lt:
+        # heapq breaks ties by arrival order, so equal items keep their input order either way
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(k, data, key=key)
+    less = make_strict_ordering(comparator, descending)
+    wrap = functools.cmp_to_key(lambda first, second: -1 if less(first, second) else int(less(second, first)))
+    value = wrap if key is None else (lambda item: wrap(key(item)))
+    return heapq.nsmallest(k, data, key=value)
+
+
+def nsmallest(data: Iterable[T], k: int, *, comparator: Callable[[T, T], bool] = operator.lt,
+              key: Optional[Callable[[T], Any]] = None) -> List[T]:
+    """
+    Returns the k smallest items of data, smallest first, as partial_sort(data, k) does.
+    """
+    return partial_sort(data, k, comparator=comparator, key=key)
+
+
+def nlargest(data: Iterable[T], k: int, *, comparator: Callable[[T, T], bool] = operator.lt,
+             key: Optional[Callable[[T], Any]] = None) -> List[T]:
+    """
+    Returns the k largest items of data, largest first, as partial_sort(data, k, descending=True) does.
+    """
+    return partial_sort(data, k, comparator=comparator, descending=True, key=key)
+
+
 def maximize_rewards(item_prices: List[int]) -> Tuple[List[Tuple[int, int]], int]:
     """
     Finds pairs of items whose prices sum up to the same value and calculates the total reward.
@@ -215,12 +1060,74 @@ def maximize_rewards(item_prices: List[int]) -> Tuple[List[Tuple[int, int]], int
     return pairs, total
 
 
+def maximize_rewards_linear(item_prices: List[int]) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Finds the same pairs and total reward as maximize_rewards without sorting the prices.
+    After sorting, the two-pointer pairing only succeeds if the i-th cheapest and i-th dearest items always sum to
+    min + max, so it is enough to count each price and check that every price occurs as often as its complement.
+    Prices within 4 * len(item_prices) of each other are counted in a list indexed by price - min, in O(n) time;
+    wider ranges use a dict and sort only the distinct prices. The input list is left unchanged.
+
+    Parameters:
+    - item_prices: A list of integers representing the prices of items.
+
+    Returns:
+    - Tuple[List[Tuple[int, int]], int]: Exactly what maximize_rewards returns for the same prices.
+    """
+    if len(item_prices) % 2 == 1 or not item_prices:
+        return ([], -1)
+    if not all(type(price) is int for price in item_prices):
+        # Equal prices of different types would share one count, the sort-based pairing tells them apart
+        return maximize_rewards(list(item_prices))
+
+    low, high = min(item_prices), max(item_prices)
+    target_sum = low + high
+    if high - low < 4 * len(item_prices):
+        counts = [0] * (high - low + 1)
+        for price in item_prices:
+            counts[price - low] += 1
+        # price and high + low - price sit at mirrored indices
+        middle = len(counts) // 2
+        if counts != counts[::-1] or (len(counts) % 2 == 1 and counts[middle] % 2 == 1):
+            return [], -1
+        smaller = list(chain.from_iterable(map(repeat, range(low, low + middle), counts[:middle])))
+        if len(counts) % 2 == 1:
+            smaller += [low + middle] * (counts[middle] // 2)
+    else:
+        counts = {}
+        for price in item_prices:
+            counts[price] = counts.get(price, 0) + 1
+        smaller = []
+        for price in sorted(counts):
+            partner = target_sum - price
+            if price > partner:
+                break
+            count = counts[price]
+            if price == partner:
+                if count % 2 == 1:
+                    return [], -1
+                count //= 2
+            elif counts.get(partner, 0) != count:
+                return [], -1
+            smaller += [price] * count
+        # Every price up to the midpoint was matched, so the ones above it were all consumed as partners
+        if len(smaller) * 2 != len(item_prices):
+            return [], -1
+
+    larger = list(map(target_sum.__sub__, smaller))
+    pairs = list(zip(smaller, larger))
+    total = sum(map(operator.mul, smaller, larger))
+    return pairs, total
+
+
 
 def quicksort(data) -> None:
     """
     Sorts a list in place using quicksort
     :param data: Data to sort
     """
+    if _numpy_sort(data, operator.lt, False, None, False):
+        return
 
     def quicksort_inner(first, last) -> None:
         """
@@ -276,3 +1183,88 @@ def quicksort(data) -> None:
 
     # Perform sort in the inner function
     quicksort_inner(0, len(data) - 1)
+
+
+def _heapsort(data: List[T], first: int, last: int) -> None:
+    """
+    Sorts data[first..last] in place with heapsort, the O(n log n) fallback of introsort
+    :param data: list to sort
+    :param first: first index of portion of data to sort
+    :param last: last index of portion of data to sort
+    """
+    size = last - first + 1
+
+    def sift_down(root, end):
+        # Move data[first + root] down until the max-heap property holds over data[first:first + end]
+        value = data[first + root]
+        child = 2 * root + 1
+        while child < end:
+            if child + 1 < end and data[first + child] < data[first + child + 1]:
+                child += 1
+            if not value < data[first + child]:
+                break
+            data[first + root] = data[first + child]
+            root, child = child, 2 * child + 1
+        data[first + root] = value
+
+    for root in range(size // 2 - 1, -1, -1):
+        sift_down(root, size)
+    for end in range(size - 1, 0, -1):
+        data[first], data[first + end] = data[first + end], data[first]
+        sift_down(0, end)
+
+
+def introsort(data: List[T], threshold: int = 16) -> None:
+    """
+    Sorts a list in place using introsort, quicksort hardened against its worst cases
+    Partitions around a median of three into <, == and > pivot parts, so runs of equal values are finished in
+    one pass, and switches a part to heapsort once it has been partitioned 2 * log2(n) times, which bounds the
+    sort at O(n log n). Parts of at most threshold items are insertion sorted. An explicit stack replaces recursion,
+    and the smaller part is always sorted first, so the stack never holds more than log2(n) parts.
+    :param data: Data to sort
+    :param threshold: largest part insertion sorted instead of partitioned, defaults to 16
+    """
+    if _numpy_sort(data, operator.lt, False, None, False):
+        return
+
+    stack = [(0, len(data) - 1, 2 * max(len(data), 1).bit_length())]
+    while stack:
+        first, last, depth = stack.pop()
+        while last - first + 1 > max(threshold, 2):
+            if depth == 0:
+                _heapsort(data, first, last)
+                break
+            depth -= 1
+
+            # Median of three, as in quicksort
+            midpoint = (last - first) // 2 + first
+            if data[first] > data[last]:
+                data[first], data[last] = data[last], data[first]
+            if data[first] > data[midpoint]:
+                data[first], data[midpoint] = data[midpoint], data[first]
+            if data[midpoint] > data[last]:
+                data[midpoint], data[last] = data[last], data[midpoint]
+            pivot = data[midpoint]
+
+            # Dutch flag partition: data[first:less] < pivot, data[less:i] == pivot, data[greater + 1:last + 1] > pivot
+            less, i, greater = first, first, last
+            while i <= greater:
+                if data[i] < pivot:
+                    data[less], data[i] = data[i], data[less]
+                    less += 1
+                    i += 1
+                elif data[i] > pivot:
+                    data[i], data[greater] = data[greater], data[i]
+                    greater -= 1
+                else:
+                    i += 1
+
+            # Defer the larger part, keep partitioning the smaller one
+            if less - first < last - greater:
+                stack.append((greater + 1, last, depth))
+                last = less - 1
+            else:
+                stack.append((first, less - 1, depth))
+                first = greater + 1
+        else:
+            _insertion_sort(data, operator.lt, None, first, last + 1)
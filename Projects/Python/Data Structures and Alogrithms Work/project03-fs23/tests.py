@@ -0,0 +1,413 @@
+"""
+Sorting Project - Tests
+CSE 331 Fall 2023
+"""
+
+import contextlib
+import io
+import json
+import math
+import operator
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import benchmark
+import solution
+from solution import (bubble_sort, do_comparison, external_sort, hybrid_merge_sort, insertion_sort, introsort,
+                      make_ordering, maximize_rewards, maximize_rewards_linear, nlargest, np, nsmallest,
+                      numpy_min_size, parallel_merge_sort, partial_sort, pure_python_sorts, quicksort, selection_sort)
+
+KEY_SORTS = {
+    "selection": selection_sort,
+    "bubble": bubble_sort,
+    "insertion": insertion_sort,
+    "hybrid_merge": hybrid_merge_sort,
+    "adaptive_merge": lambda data, **kwargs: hybrid_merge_sort(data, adaptive=True, **kwargs),
+    "parallel_merge": lambda data, **kwargs: parallel_merge_sort(data, workers=1, **kwargs),
+}
+
+
+def reference_insertion_sort(data, comparator=operator.lt, descending=False):
+    """
+    The original insertion sort, comparing through do_comparison
+    """
+    for i in range(1, len(data)):
+        key = data[i]
+        j = i - 1
+        while j >= 0 and do_comparison(key, data[j], comparator, descending):
+            data[j + 1] = data[j]
+            j -= 1
+        data[j + 1] = key
+
+
+def same(first, second):
+    """
+    Element-wise identity, so NaNs in the same places compare equal
+    """
+    return len(first) == len(second) and all(a is b or a == b for a, b in zip(first, second))
+
+
+def typed(data):
+    """
+    The items with their types, so 1, 1.0 and True or 0.0 and -0.0 are told apart
+    """
+    return [(type(item), repr(item)) for item in data]
+
+
+def shapes(rng, size):
+    """
+    Inputs the adaptive and hybrid sorts treat differently: random, sorted, reversed, sawtooth, few unique values
+    """
+    ordered = list(range(size))
+    tooth = max(size // 5, 1)
+    return [rng.sample(ordered, size), ordered, ordered[::-1], [i % tooth for i in range(size)],
+            [rng.randint(0, 2) for _ in range(size)]]
+
+
+def both_paths(sort, data, **kwargs):
+    """
+    Sorts copies of data once with NumPy dispatch forced on and once with it off
+    """
+    dispatched, pure = data[:], data[:]
+    with numpy_min_size(0):
+        sort(dispatched, **kwargs)
+    with pure_python_sorts():
+        sort(pure, **kwargs)
+    return dispatched, pure
+
+
+class OrderingTests(unittest.TestCase):
+
+    def test_make_ordering(self):
+        nan = math.nan
+        values = [nan, -math.inf, -1.0, 0.0, 1.0, 2, math.inf, {1}, {1, 2}, {3}]
+        comparators = (operator.lt, lambda x, y: x < y)
+        for comparator in comparators:
+            for descending in (False, True):
+                before = make_ordering(comparator, descending)
+                for first in values:
+                    for second in values:
+                        if isinstance(first, set) != isinstance(second, set):
+                            continue
+                        self.assertEqual(before(first, second),
+                                         do_comparison(first, second, comparator, descending), (first, second))
+
+        # sets are partially ordered and NaN is unordered, the sorts must still match the original exactly
+        rng = random.Random(331)
+        for _ in range(200):
+            data = [rng.choice([nan, 1.0, 2.0, 3.0, -1.0]) for _ in range(rng.randint(0, 12))]
+            for descending in (False, True):
+                expected, actual = data[:], data[:]
+                reference_insertion_sort(expected, descending=descending)
+                insertion_sort(actual, descending=descending)
+                self.assertTrue(same(actual, expected), (data, actual, expected))
+            sets = [set(rng.sample(range(4), rng.randint(0, 3))) for _ in range(rng.randint(0, 8))]
+            expected, actual = sets[:], sets[:]
+            reference_insertion_sort(expected, descending=True)
+            insertion_sort(actual, descending=True)
+            self.assertEqual(actual, expected)
+
+
+class SortTests(unittest.TestCase):
+    """
+    The Python algorithms themselves, with NumPy dispatch turned off
+    """
+
+    def setUp(self):
+        pure = pure_python_sorts()
+        pure.__enter__()
+        self.addCleanup(pure.__exit__, None, None, None)
+
+    def test_key(self):
+        rng = random.Random(331)
+        for _ in range(40):
+            records = [(f"item{i}", rng.randint(0, 5)) for i in range(rng.randint(0, 40))]
+            for descending in (False, True):
+                for name, sort in KEY_SORTS.items():
+                    # key= must sort exactly like the equivalent comparator, ties included
+                    keyed, compared, calls = records[:], records[:], []
+                    sort(keyed, key=lambda record: calls.append(record) or record[1], descending=descending)
+                    sort(compared, comparator=lambda x, y: x[1] < y[1], descending=descending)
+                    self.assertEqual(keyed, compared, (name, descending))
+                    self.assertEqual(sorted(calls), sorted(records), name)
+                    self.assertEqual(sorted(map(operator.itemgetter(1), keyed), reverse=descending),
+                                     list(map(operator.itemgetter(1), keyed)))
+
+    def test_hybrid_merge_sort(self):
+        rng = random.Random(331)
+        for size in (0, 1, 2, 11, 12, 13, 50, 257):
+            for data in shapes(rng, size):
+                for threshold in (1, 2, 12, 100):
+                    for descending in (False, True):
+                        result = data[:]
+                        hybrid_merge_sort(result, threshold=threshold, descending=descending)
+                        self.assertEqual(result, sorted(data, reverse=descending), (size, threshold))
+                # not stable, as before the rewrite, so only the order of the keys is fixed
+                records = list(enumerate(data))
+                result = records[:]
+                hybrid_merge_sort(result, key=operator.itemgetter(1))
+                self.assertEqual([value for _, value in result], sorted(data), size)
+                self.assertEqual(sorted(result), records)
+
+    def test_adaptive_merge_sort(self):
+        rng = random.Random(331)
+        for size in (0, 1, 2, 31, 32, 33, 64, 500, 2000):
+            for data in shapes(rng, size):
+                records = list(enumerate(data))
+                for descending in (False, True):
+                    result = records[:]
+                    hybrid_merge_sort(result, key=operator.itemgetter(1), descending=descending, adaptive=True)
+                    # stable descending too, equal keys keep their input order
+                    self.assertEqual(result, sorted(records, key=operator.itemgetter(1), reverse=descending))
+
+        # sorted and reversed input are single runs, found with one comparison per neighbouring pair
+        for data in (list(range(1000)), list(range(1000))[::-1]):
+            comparisons = []
+            hybrid_merge_sort(data, comparator=lambda x, y: comparisons.append(1) or x < y, adaptive=True)
+            self.assertEqual(data, list(range(1000)))
+            self.assertEqual(len(comparisons), 999)
+
+    def test_parallel_merge_sort(self):
+        rng = random.Random(331)
+        records = [(i, rng.randint(0, 50)) for i in range(3000)]
+        by_value = operator.itemgetter(1)
+        for descending in (False, True):
+            expected = sorted(records, key=by_value, reverse=descending)
+            for comparator in (operator.lt, lambda x, y: x < y):
+                # the lambda cannot be pickled to the workers, that sorts serially instead
+                result = records[:]
+                parallel_merge_sort(result, workers=2, serial_threshold=0, comparator=comparator,
+                                    descending=descending, key=by_value)
+                self.assertEqual(result, expected)
+        values = [rng.random() for _ in range(3000)]
+        result = values[:]
+        parallel_merge_sort(result, workers=3, serial_threshold=0)
+        self.assertEqual(result, sorted(values))
+
+    def test_introsort(self):
+        rng = random.Random(331)
+        for size in (0, 1, 2, 3, 16, 17, 100, 1000):
+            for data in shapes(rng, size) + [benchmark.median_of_three_killer(size)]:
+                for sort in (quicksort, introsort):
+                    result = data[:]
+                    sort(result)
+                    self.assertEqual(result, sorted(data), (sort.__name__, size))
+                result = data[:]
+                introsort(result, threshold=1)
+                self.assertEqual(result, sorted(data))
+        # deep enough on the killer input that plain quicksort would recurse past its depth limit
+        data = benchmark.median_of_three_killer(2000)
+        result = data[:]
+        introsort(result)
+        self.assertEqual(result, sorted(data))
+
+    def test_maximize_rewards_linear(self):
+        rng = random.Random(331)
+        cases = [[], [1], [1, 2], [3, 3], [2, 3, 4, 1], [1, 1, 2], [5, 5, 5, 5], [1, 2, 2, 3, 3, 3],
+                 [True, 1, 2, 1], [1.0, 2, 1, 2.0], [-3, 3, 0, 0], [10 ** 12, 1, 10 ** 12 - 1, 2]]
+        for _ in range(300):
+            # pairable prices, sometimes with one price changed, over narrow and wide ranges
+            spread = rng.choice([3, 10, 10 ** 9])
+            target = rng.randint(-spread, spread)
+            smaller = [rng.randint(-spread, target // 2) for _ in range(rng.randint(1, 20))]
+            prices = smaller + [target - price for price in smaller]
+            rng.shuffle(prices)
+            if rng.random() < 0.3:
+                prices[rng.randrange(len(prices))] += rng.choice([-1, 1])
+            cases.append(prices)
+        for prices in cases:
+            given = prices[:]
+            self.assertEqual(maximize_rewards_linear(given), maximize_rewards(prices[:]), prices)
+            self.assertEqual(given, prices)
+
+    def test_external_sort(self):
+        rng = random.Random(331)
+        lines = [f"{rng.randint(0, 99)}.{rng.randint(0, 9)} line{i}" for i in range(2000)]
+        number = lambda line: float(line.split()[0])
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = os.path.join(directory, "in.txt"), os.path.join(directory, "out.txt")
+            with open(source, "w") as file:
+                file.write("\n".join(lines))  # no newline after the last line
+
+            def run(**kwargs):
+                spilled = external_sort(source, target, temp_dir=directory, **kwargs)
+                with open(target) as file:
+                    text = file.read()
+                self.assertTrue(text.endswith("\n"))
+                return spilled, text.splitlines()
+
+            self.assertEqual(run(), (0, sorted(lines)))
+            for fan_in in (2, 3, 64):
+                spilled, result = run(memory_limit=1000, fan_in=fan_in)
+                self.assertGreater(spilled, 20)
+                self.assertEqual(result, sorted(lines))
+                # equal keys keep their input order across runs and merge passes
+                for descending in (False, True):
+                    spilled, result = run(memory_limit=1000, fan_in=fan_in, key=number, descending=descending)
+                    self.assertEqual(result, sorted(lines, key=number, reverse=descending))
+                spilled, result = run(memory_limit=1000, fan_in=fan_in, comparator=lambda x, y: len(x) < len(y))
+                self.assertEqual(result, sorted(lines, key=len))
+            # only the output is left behind
+            self.assertEqual(sorted(os.listdir(directory)), ["in.txt", "out.txt"])
+
+    def test_partial_sort(self):
+        rng = random.Random(331)
+        for _ in range(50):
+            records = [(i, rng.randint(0, 9)) for i in range(rng.randint(0, 60))]
+            by_value = operator.itemgetter(1)
+            for descending in (False, True):
+                for comparator in (operator.lt, lambda x, y: x < y):
+                    expected = records[:]
+                    hybrid_merge_sort(expected, comparator=comparator, descending=descending, key=by_value,
+                                      adaptive=True)
+                    for k in (-1, 0, 1, 5, len(records), len(records) + 3):
+                        result = partial_sort(iter(records), k, comparator=comparator, descending=descending,
+                                              key=by_value)
+                        self.assertEqual(result, expected[:max(k, 0)], (k, descending))
+                        unordered = partial_sort(records, k, comparator=comparator, descending=descending,
+                                                 key=by_value, ordered=False)
+                        # any of several equal items may be picked, but they must be the right values
+                        self.assertEqual(sorted(map(by_value, unordered)),
+                                         sorted(map(by_value, expected[:max(k, 0)])), (k, descending))
+            values = [value for _, value in records]
+            self.assertEqual(nsmallest(values, 4), sorted(values)[:4])
+            self.assertEqual(nlargest(values, 4), sorted(values, reverse=True)[:4])
+        self.assertEqual(partial_sort([3, 1, 2], 2), [1, 2])
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+
+
+class NumpyDispatchTests(unittest.TestCase):
+
+    def test_ties(self):
+        rng = random.Random(331)
+        for _ in range(50):
+            size = rng.randint(0, 40)
+            values = [rng.choice([rng.randint(0, 3), rng.randint(-2 ** 40, 2 ** 40)]) for _ in range(size)]
+            floats = [rng.randint(0, 3) / 2 for _ in range(size)]
+            records = [(f"item{i}", rng.randint(0, 3)) for i in range(size)]
+            for descending in (False, True):
+                for name, sort in KEY_SORTS.items():
+                    for data in (values, floats):
+                        dispatched, pure = both_paths(sort, data, descending=descending)
+                        self.assertEqual(typed(dispatched), typed(pure), (name, data, descending))
+                    dispatched, pure = both_paths(sort, records, key=operator.itemgetter(1), descending=descending)
+                    self.assertEqual(dispatched, pure, (name, records, descending))
+            for sort in (quicksort, introsort):
+                dispatched, pure = both_paths(sort, values)
+                self.assertEqual(typed(dispatched), typed(pure))
+
+    def test_descending_stability(self):
+        rng = random.Random(331)
+        for _ in range(50):
+            records = [(f"item{i}", rng.choice([rng.randint(0, 3), rng.random()])) for i in range(rng.randint(0, 40))]
+            by_price = operator.itemgetter(1)
+            for descending in (False, True):
+                expected = sorted(records, key=by_price, reverse=descending)
+                # the sorts that are stable for this ordering, which are the ones that may use argsort with a key
+                stable = ("adaptive_merge", "parallel_merge") + (() if descending else ("bubble", "insertion"))
+                for name in stable:
+                    dispatched, pure = both_paths(KEY_SORTS[name], records, key=by_price, descending=descending)
+                    self.assertEqual(dispatched, expected, (name, descending))
+                    self.assertEqual(pure, expected, (name, descending))
+
+    def test_mixed_types(self):
+        # none of these can go to NumPy as they are, the sorts must fall through with the same result as before
+        pool = [1, 2, 2.0, 1.5, True, False, 0, 0.0, -0.0, math.nan, math.inf, 2 ** 70, -2 ** 70]
+        rng = random.Random(331)
+        for _ in range(100):
+            data = [rng.choice(pool) for _ in range(rng.randint(0, 25))]
+            for descending in (False, True):
+                for name, sort in KEY_SORTS.items():
+                    dispatched, pure = both_paths(sort, data, descending=descending)
+                    self.assertEqual(typed(dispatched), typed(pure), (name, data, descending))
+                    records = list(enumerate(data))
+                    dispatched, pure = both_paths(sort, records, key=operator.itemgetter(1), descending=descending)
+                    self.assertEqual(typed(dispatched), typed(pure), (name, data, descending))
+            if not any(isinstance(value, float) and math.isnan(value) for value in data):
+                for sort in (quicksort, introsort):
+                    dispatched, pure = both_paths(sort, data)
+                    self.assertEqual(typed(dispatched), typed(pure), data)
+
+    def test_custom_comparators(self):
+        comparators = (lambda x, y: x < y, operator.gt, lambda x, y: abs(x) < abs(y), lambda x, y: x % 3 < y % 3)
+        rng = random.Random(331)
+        for _ in range(30):
+            data = [rng.randint(-5, 5) for _ in range(rng.randint(0, 30))]
+            for comparator in comparators:
+                for descending in (False, True):
+                    for name, sort in KEY_SORTS.items():
+                        dispatched, pure = both_paths(sort, data, comparator=comparator, descending=descending)
+                        self.assertEqual(typed(dispatched), typed(pure), (name, data, descending))
+
+    def test_numpy_min_size_is_context_local(self):
+        seen = []
+        with pure_python_sorts():
+            self.assertEqual(solution._numpy_min_size.get(), sys.maxsize)
+            thread = threading.Thread(target=lambda: seen.append(solution._numpy_min_size.get()))
+            thread.start()
+            thread.join()
+            with numpy_min_size(0):
+                self.assertEqual(solution._numpy_min_size.get(), 0)
+            self.assertEqual(solution._numpy_min_size.get(), sys.maxsize)
+        self.assertEqual(seen, [solution.NUMPY_MIN_SIZE])
+        self.assertEqual(solution._numpy_min_size.get(), solution.NUMPY_MIN_SIZE)
+
+
+class BenchmarkCompareTests(unittest.TestCase):
+
+    def test_compare(self):
+        def record(algorithm, size, seconds, comparisons=100, writes=50):
+            return {"algorithm": algorithm, "distribution": "organ_pipe", "size": size, "seconds": seconds,
+                    "comparisons": comparisons, "writes": writes}
+
+        baseline = [record("insertion_sort", 10, 0.00002), record("insertion_sort", 10000, 1.0),
+                    record("hybrid_merge_sort", 10, 0.00002), record("hybrid_merge_sort", 10000, 0.1)]
+        results = [record("insertion_sort", 10, 0.00003),  # 50% slower but far below the floor, noise
+                   record("insertion_sort", 10000, 1.5),  # slower by more than both
+                   record("hybrid_merge_sort", 10, 0.00002, comparisons=101),  # counts are exact, always reported
+                   record("hybrid_merge_sort", 10000, 0.1005)]  # within the tolerance
+        regressions = benchmark.compare(results, baseline, 0.25)
+        self.assertEqual(regressions, ["insertion_sort organ_pipe 10000: 1.00000s -> 1.50000s",
+                                       "hybrid_merge_sort organ_pipe 10: comparisons 100 -> 101"])
+        self.assertEqual(len(benchmark.compare(results, baseline, 0.25, min_seconds=0)), 3)
+        self.assertEqual(len(benchmark.compare(results, baseline, 0.25, min_seconds=1)), 1)
+        self.assertEqual(benchmark.compare(results, results, 0, min_seconds=0), [])
+
+    def test_main(self):
+        arguments = ["--algorithms", "insertion_sort", "--distributions", "organ_pipe", "--sizes", "10",
+                     "--repeat", "1"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(benchmark.main(arguments + ["--output", path]), 0)
+                # with no tolerance only the floor keeps a rerun of a tiny input from counting as a regression
+                self.assertEqual(benchmark.main(arguments + ["--baseline", path, "--tolerance", "0",
+                                                             "--min-seconds", "0.1"]), 0)
+            with open(path) as source:
+                report = json.load(source)
+            report["results"][0]["comparisons"] -= 1
+            with open(path, "w") as output:
+                json.dump(report, output)
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                self.assertEqual(benchmark.main(arguments + ["--baseline", path, "--min-seconds", "10"]), 1)
+            self.assertIn("REGRESSION insertion_sort organ_pipe 10: comparisons", printed.getvalue())
+
+    def test_bench(self):
+        ran = []
+        stubs = {name: (lambda name=name: ran.append(name)) for name in benchmark.BENCHMARKS}
+        with mock.patch.dict(benchmark.BENCHMARKS, stubs), contextlib.redirect_stdout(io.StringIO()) as printed:
+            # only the named benchmarks run, and the suite does not
+            self.assertEqual(benchmark.main(["--bench"] + list(reversed(benchmark.BENCHMARKS))), 0)
+        self.assertEqual(ran, list(reversed(benchmark.BENCHMARKS)))
+        self.assertEqual(printed.getvalue().splitlines(), [f"== {name}" for name in ran])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+"""
+Hash Table Project
+CSE 331 FS23 (Onsay)
+benchmark.py
+
+Benchmarks of the hash tables and plagiarism checks in solution.py, kept out of the graded module:
+
+    python benchmark.py bulk_load probing
+    python benchmark.py            # runs all of them
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from timeit import default_timer
+from typing import List, Optional, Tuple
+
+from solution import (PROBING_STRATEGIES, CompactHashTable, ConcurrentHashTable, HashTable, is_plagiarism,
+                      scan_plagiarism)
+
+
+def bench_bulk_load(sizes: Tuple[int, ...] = (1000, 10000, 100000, 1000000), key_length: int = 24,
+                    trials: int = 3) -> None:
+    """
+    Compares HashTable.from_pairs and get_many against the __setitem__ and __getitem__ loops they replace
+    :param sizes: numbers of pairs to load
+    :param key_length: length of the random keys
+    :param trials: runs averaged per size
+    """
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789"
+    print(f"{'pairs':>10} {'setitem':>10} {'from_pairs':>10} {'speedup':>8} "
+          f"{'getitem':>10} {'get_many':>10} {'speedup':>8}")
+    for size in sizes:
+        keys = ["".join(random.choices(alphabet, k=key_length)) for _ in range(size)]
+        pairs = list(zip(keys, range(size)))
+        loop_load = bulk_load = loop_get = bulk_get = 0
+        for trial in range(trials):
+            gc.collect()
+            start = default_timer()
+            looped = HashTable()
+            for key, value in pairs:
+                looped[key] = value
+            loop_load += (default_timer() - start) / trials
+
+            gc.collect()
+            start = default_timer()
+            bulk = HashTable.from_pairs(pairs)
+            bulk_load += (default_timer() - start) / trials
+
+            start = default_timer()
+            looped_values = [looped[key] for key in keys]
+            loop_get += (default_timer() - start) / trials
+
+            start = default_timer()
+            bulk_values = bulk.get_many(keys)
+            bulk_get += (default_timer() - start) / trials
+
+            assert looped_values == bulk_values
+        print(f"{size:>10} {loop_load:>10.4f} {bulk_load:>10.4f} {loop_load / bulk_load:>7.2f}x "
+              f"{loop_get:>10.4f} {bulk_get:>10.4f} {loop_get / bulk_get:>7.2f}x")
+
+
+def bench_memory(sizes: Tuple[int, ...] = (10000, 100000, 1000000), key_length: int = 24) -> None:
+    """
+    Compares the memory held by a HashTable and a CompactHashTable with the same contents, using tracemalloc
+    Keys and values are allocated before tracing starts so only the table structure is measured
+    :param sizes: numbers of pairs to load
+    :param key_length: length of the random keys
+    """
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789"
+    print(f"{'pairs':>10} {'nodes (MB)':>12} {'compact (MB)':>13} {'nodes B/entry':>14} {'compact B/entry':>16}")
+    for size in sizes:
+        keys = ["".join(random.choices(alphabet, k=key_length)) for _ in range(size)]
+        values = list(range(size))
+        measured = []
+        for table_type in (HashTable, CompactHashTable):
+            gc.collect()
+            tracemalloc.start()
+            table = table_type()
+            for key, value in zip(keys, values):
+                table[key] = value
+            held, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measured.append(held)
+            del table
+        nodes, compact = measured
+        print(f"{size:>10} {nodes / 2 ** 20:>12.1f} {compact / 2 ** 20:>13.1f} "
+              f"{nodes / size:>14.0f} {compact / size:>16.0f}")
+
+
+def bench_parallel_scan(pair_count: int = 2000, melodies: int = 200, max_workers: Optional[int] = None,
+                        chunk_size: int = 64) -> None:
+    """
+    Times scan_plagiarism with 1 to max_workers processes against the serial is_plagiarism loop
+    :param pair_count: number of song pairs to check
+    :param melodies: melodies per song
+    :param max_workers: largest pool to try, defaults to the CPU count
+    :param chunk_size: pairs sent to a worker at a time
+    """
+    def random_song():
+        return [[random.randint(0, 12) for _ in range(4)] for _ in range(melodies)]
+
+    pairs = [(random_song(), random_song()) for _ in range(pair_count)]
+    max_similarity = melodies // 4
+
+    gc.collect()
+    start = default_timer()
+    expected = [is_plagiarism(mine, theirs, max_similarity) for mine, theirs in pairs]
+    serial = default_timer() - start
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial:>10.3f} {1:>7.2f}x")
+
+    for workers in range(1, (max_workers or os.cpu_count() or 1) + 1):
+        gc.collect()
+        start = default_timer()
+        verdicts = scan_plagiarism(pairs, max_similarity, workers=workers, chunk_size=chunk_size)
+        elapsed = default_timer() - start
+        assert verdicts == expected
+        print(f"{workers:>8} {elapsed:>10.3f} {serial / elapsed:>7.2f}x")
+
+
+def make_key_trace(operations: int = 200000, key_space: int = 20000, key_length: int = 16,
+                   seed: int = 331) -> List[Tuple[str, str]]:
+    """
+    Generates a reproducible trace of hash table operations for bench_probing
+    Half the operations are lookups, the rest mostly inserts and some deletes of present keys
+    :param operations: length of the trace
+    :param key_space: number of distinct keys drawn from
+    :param key_length: length of each key
+    :param seed: seed of the random generator
+    :return: list of (operation, key) pairs, operation being "set", "get" or "del"
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789"
+    keys = ["".join(rng.choices(alphabet, k=key_length)) for _ in range(key_space)]
+    present = set()
+    trace = []
+    for _ in range(operations):
+        key = rng.choice(keys)
+        roll = rng.random()
+        if roll < 0.5:
+            trace.append(("get", key))
+        elif roll < 0.85 or key not in present:
+            trace.append(("set", key))
+            present.add(key)
+        else:
+            trace.append(("del", key))
+            present.discard(key)
+    return trace
+
+
+def bench_probing(trace: Optional[List[Tuple[str, str]]] = None, strategies: Tuple[str, ...] = PROBING_STRATEGIES,
+                  trials: int = 3) -> None:
+    """
+    Replays a key trace through a HashTable with each probing strategy, reporting ops/sec and probe lengths
+    :param trace: (operation, key) pairs as produced by make_key_trace, generated if not given
+    :param strategies: probing strategies to compare
+    :param trials: replays per strategy, the fastest is reported
+    """
+    if trace is None:
+        trace = make_key_trace()
+
+    def replay(table):
+        for operation, key in trace:
+            if operation == "get":
+                key in table
+            elif operation == "set":
+                table[key] = key
+            else:
+                del table[key]
+
+    print(f"{'strategy':>10} {'ops/sec':>12} {'avg probe':>10} {'max probe':>10}  histogram (slots: probes)")
+    for strategy in strategies:
+        best = float("inf")
+        for trial in range(trials):
+            gc.collect()
+            table = HashTable(probing=strategy)
+            start = default_timer()
+            replay(table)
+            best = min(best, default_timer() - start)
+        histogram = " ".join(f"{length}:{count}" for length, count in enumerate(table.probe_histogram) if count)
+        print(f"{strategy:>10} {len(trace) / best:>12,.0f} {table.average_probe_length():>10.3f} "
+              f"{table.max_probe_length():>10}  {histogram}")
+
+
+def bench_concurrent(thread_counts: Tuple[int, ...] = (1, 2, 4, 8, 16), operations: int = 20000,
+                     key_space: int = 10000, read_share: float = 0.8) -> None:
+    """
+    Measures throughput of a ConcurrentHashTable against a HashTable behind one lock, over 1 to 16 threads
+    :param thread_counts: thread counts to run
+    :param operations: operations per thread
+    :param key_space: number of distinct keys
+    :param read_share: share of the operations that are lookups, the rest are inserts
+    """
+    keys = [f"key{i}" for i in range(key_space)]
+
+    def run(threads, read, write):
+        def work(thread_id):
+            rng = random.Random(thread_id)
+            for _ in range(operations):
+                key = rng.choice(keys)
+                if rng.random() < read_share:
+                    read(key)
+                else:
+                    write(key, thread_id)
+
+        workers = [threading.Thread(target=work, args=(thread_id,)) for thread_id in range(threads)]
+        gc.collect()
+        start = default_timer()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return threads * operations / (default_timer() - start)
+
+    print(f"{'threads':>8} {'striped ops/sec':>16} {'locked ops/sec':>15}")
+    for threads in thread_counts:
+        striped = ConcurrentHashTable()
+        locked, lock = HashTable(), threading.Lock()
+
+        def locked_read(key):
+            with lock:
+                return locked.get(key)
+
+        def locked_write(key, value):
+            with lock:
+                locked[key] = value
+
+        striped_rate = run(threads, striped.get, striped.__setitem__)
+        locked_rate = run(threads, locked_read, locked_write)
+        print(f"{threads:>8} {striped_rate:>16,.0f} {locked_rate:>15,.0f}")
+
+
+BENCHMARKS = {
+    "bulk_load": bench_bulk_load,
+    "memory": bench_memory,
+    "parallel_scan": bench_parallel_scan,
+    "probing": bench_probing,
+    "concurrent": bench_concurrent,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point, returns the exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # no choices=, argparse would check the empty list itself against them and reject running everything
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"any of {', '.join(BENCHMARKS)}, all of them if none are given")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"== {name}")
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
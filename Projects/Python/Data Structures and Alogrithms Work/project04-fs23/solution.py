@@ -4,20 +4,81 @@ CSE 331 FS23 (Onsay)
 solution.py
 """
 from __future__ import annotations
-from typing import Optional, TypeVar, List, Tuple
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from mmap import mmap as memory_map, ACCESS_READ
+from typing import Optional, TypeVar, List, Tuple, Iterable, Iterator, Union, Dict, Hashable
+import heapq
+import os
+import pickle
+import struct
+import sys
+import threading
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, HashTable.hash_many falls back to pure Python
+    np = None
 T = TypeVar("T")
+_MISSING = object()  # sentinel for get_many when no default is given
+TOMBSTONE = object()  # deleted slot of a ConcurrentHashTable
+
+# slot states of a CompactHashTable
+EMPTY, LIVE, DELETED = 0, 1, 2
+# Mersenne prime the CompactHashTable reduces its hashes by so they fit in an array('q')
+COMPACT_MODULUS = (1 << 61) - 1
+# probe sequences a HashTable can be built with
+PROBING_STRATEGIES = ("linear", "quadratic", "double", "robin_hood")
+
+# HashTable snapshot layout: header, one little-endian int64 per slot, then the slot records.
+# A slot holds EMPTY_SLOT, DELETED_SLOT or the file offset of its record, which is the key and
+# pickled value lengths followed by the UTF-8 key and the pickled value.
+SNAPSHOT_MAGIC = b"HTBL"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHBqqqq")  # magic, version, probing, capacity, size, prime_index, tombstones
+SNAPSHOT_OFFSET = struct.Struct("<q")
+SNAPSHOT_RECORD = struct.Struct("<II")
+EMPTY_SLOT, DELETED_SLOT = -1, -2
+
+
+def poly_hash(key: str) -> int:
+    """
+    Computes the raw 181-multiplier polynomial value shared by _hash_1 and _hash_2.
+    Walking the key once and reducing the result twice gives the same bucket and step
+    as calling both functions, which each walk the whole key.
+    :param key: key to be hashed
+    :return: unreduced polynomial hash of the key
+    """
+    hashed_value = 0
+    for char in key:
+        hashed_value = 181 * hashed_value + ord(char)
+    return hashed_value
+
+
+def check_compact_threshold(compact_threshold: float) -> None:
+    """
+    Checks the tombstone share a table compacts at. The load factor stays below 0.5, so below 0.5 live keys
+    plus tombstones always leave an empty slot, which is where probes for missing keys stop.
+    :param compact_threshold: share of the slots that may hold tombstones
+    :raises ValueError: If compact_threshold is not in [0, 0.5).
+    """
+    if not 0 <= compact_threshold < 0.5:
+        raise ValueError(f"compact_threshold must be in [0, 0.5), got {compact_threshold}")
 
 
 class HashNode:
     """
     DO NOT EDIT
     """
-    __slots__ = ["key", "value", "deleted"]
+    __slots__ = ["key", "value", "deleted", "hash_value"]
 
-    def __init__(self, key: Optional[str], value: Optional[T], deleted: bool = False) -> None:
+    def __init__(self, key: Optional[str], value: Optional[T], deleted: bool = False,
+                 hash_value: Optional[int] = None) -> None:
         self.key: str = key  # type: ignore (assume these will not be accessed if deleted is True)
         self.value: T = value  # type: ignore
         self.deleted = deleted
+        # cached poly_hash(key) so rehashing on _grow never walks the key again
+        self.hash_value = hash_value
 
     def __str__(self) -> str:
         return f"HashNode({self.key}, {self.value})"
@@ -30,11 +91,185 @@ class HashNode:
             else False
 
 
+class HashTableView:
+    """
+    Live, read-only view over the slots of a HashTable or CompactHashTable, like the views of a dict.
+    Iterating streams over the table without copying it.
+    """
+    __slots__ = ['mapping']
+
+    def __init__(self, mapping: Union[HashTable, CompactHashTable]) -> None:
+        """
+        Creates a view of a hash table
+        :param mapping: the table to view
+        """
+        self.mapping = mapping
+
+    def __len__(self) -> int:
+        """
+        :return: the number of elements in the viewed table
+        """
+        return len(self.mapping)
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Compares like the lists keys, values and items returned before they became views
+        :param other: a list, or a view of the same kind
+        :return: True if other holds the same elements in the same (slot) order
+        """
+        if isinstance(other, type(self)):
+            other = list(other)
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(self) == other
+
+    def __str__(self) -> str:
+        """
+        :return: string representation of the view, listing its contents
+        """
+        return f"{type(self).__name__}({list(self)})"
+
+    __repr__ = __str__
+
+
+class KeysView(HashTableView):
+    """
+    View of the keys of a hash table
+    """
+    __slots__ = []
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        :return: iterator over the keys of the table
+        """
+        return iter(self.mapping)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        :param key: key to look for
+        :return: True if the key is in the table, a single probe
+        """
+        return key in self.mapping
+
+
+class ValuesView(HashTableView):
+    """
+    View of the values of a hash table
+    """
+    __slots__ = []
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        :return: iterator over the values of the table
+        """
+        return (value for _, value in self.mapping.iter_items())
+
+    def __contains__(self, value: T) -> bool:
+        """
+        :param value: value to look for
+        :return: True if some key maps to the value, a scan of the table
+        """
+        return any(stored == value for stored in self)
+
+
+class ItemsView(HashTableView):
+    """
+    View of the key-value pairs of a hash table
+    """
+    __slots__ = []
+
+    def __iter__(self) -> Iterator[Tuple[str, T]]:
+        """
+        :return: iterator over the key-value pairs of the table
+        """
+        return self.mapping.iter_items()
+
+    def __contains__(self, item: Tuple[str, T]) -> bool:
+        """
+        :param item: key-value pair to look for
+        :return: True if the key is in the table and maps to the value, a single probe; False for anything
+                 that is not a (key, value) pair
+        """
+        if not isinstance(item, tuple) or len(item) != 2:
+            return False
+        key, value = item
+        stored = self.mapping.get(key, _MISSING)
+        return stored is not _MISSING and stored == value
+
+
+class MappedSlots:
+    """
+    Read-only slot array of a HashTable snapshot, decoding a HashNode from the buffer
+    each time a slot is read, so opening a snapshot never deserializes the whole table.
+    Values are unpickled as they are read, so the snapshot must come from a trusted source.
+    """
+    __slots__ = ['buffer', 'capacity']
+
+    def __init__(self, buffer: Union[memory_map, bytes], capacity: int) -> None:
+        """
+        Wraps the slots of a snapshot
+        :param buffer: the snapshot file contents, usually memory-mapped
+        :param capacity: number of slots in the snapshot
+        """
+        self.buffer = buffer
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        """
+        :return: the number of slots
+        """
+        return self.capacity
+
+    def __getitem__(self, index: int) -> Optional[HashNode]:
+        """
+        Decodes one slot
+        :param index: slot to read
+        :return: the node stored in the slot, a deleted node for a tombstone, or None if the slot is empty
+        :raises IndexError: If index is not a slot of the table.
+        """
+        if not 0 <= index < self.capacity:
+            raise IndexError(f"Slot {index} out of range")
+        offset, = SNAPSHOT_OFFSET.unpack_from(self.buffer, SNAPSHOT_HEADER.size + SNAPSHOT_OFFSET.size * index)
+        if offset == EMPTY_SLOT:
+            return None
+        if offset == DELETED_SLOT:
+            return HashNode(None, None, True)
+        key_length, value_length = SNAPSHOT_RECORD.unpack_from(self.buffer, offset)
+        start = offset + SNAPSHOT_RECORD.size
+        key = self.buffer[start:start + key_length].decode("utf-8", "surrogatepass")
+        value = pickle.loads(self.buffer[start + key_length:start + key_length + value_length])
+        return HashNode(key, value)
+
+    def __setitem__(self, index: int, node: Optional[HashNode]) -> None:
+        """
+        Snapshots are read-only
+        :raises TypeError: always
+        """
+        raise TypeError("HashTable loaded with mmap=True is read-only")
+
+    def __iter__(self) -> Iterator[Optional[HashNode]]:
+        """
+        :return: iterator decoding every slot in order
+        """
+        return (self[index] for index in range(self.capacity))
+
+    def close(self) -> None:
+        """
+        Unmaps the snapshot, if it was memory-mapped. No slot can be read afterwards.
+        """
+        if isinstance(self.buffer, memory_map):
+            self.buffer.close()
+
+
 class HashTable:
     """
     Hash Table Class
     """
-    __slots__ = ['capacity', 'size', 'table', 'prime_index']
+    __slots__ = ['capacity', 'size', 'table', 'prime_index', 'tombstones', 'compact_threshold', 'probing',
+                 'probes', 'lookups', 'probe_histogram']
+
+    # smallest capacity a deleting table will shrink to
+    min_capacity = 8
 
     primes = (
         2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97, 101, 103, 107,
@@ -92,20 +327,40 @@ class HashTable:
         7673, 7681, 7687, 7691, 7699, 7703, 7717, 7723, 7727, 7741, 7753, 7757, 7759, 7789, 7793, 7817, 7823, 7829,
         7841, 7853, 7867, 7873, 7877, 7879, 7883, 7901, 7907, 7919)
 
-    def __init__(self, capacity: int = 8) -> None:
+    def __init__(self, capacity: int = 8, compact_threshold: float = 0.25, probing: str = "double") -> None:
         """
         DO NOT EDIT
         Initializes hash table
+        (the keyword arguments after capacity are additions; with their defaults the table starts out as before)
         :param capacity: capacity of the hash table
+        :param compact_threshold: share of the slots that may hold tombstones before the table is compacted,
+                                  below 0.5 so live keys and tombstones never fill every empty slot, where
+                                  probes stop
+        :param probing: probe sequence, one of PROBING_STRATEGIES. "double" steps by _hash_2, "linear" by 1,
+                        "quadratic" by 1, 2, 3, ... (the capacity is rounded up to a power of two, the only
+                        capacities where this sequence reaches every slot; resizes keep it one), and "robin_hood"
+                        probes linearly but lets new keys displace keys closer to their home slot.
+        :raises ValueError: If probing is not one of PROBING_STRATEGIES or compact_threshold is not in [0, 0.5).
         """
+        if probing not in PROBING_STRATEGIES:
+            raise ValueError(f"Unknown probing strategy {probing}, expected one of {PROBING_STRATEGIES}")
+        check_compact_threshold(compact_threshold)
+        if probing == "quadratic":
+            capacity = 1 << max(capacity - 1, 0).bit_length()
+
         self.capacity = capacity
         self.size = 0
         self.table: List[Optional[HashNode]] = [None] * capacity
+        self.prime_index = self._prime_index_for(capacity)
 
-        i = 0
-        while HashTable.primes[i] < self.capacity:
-            i += 1
-        self.prime_index = i - 1
+        self.tombstones = 0
+        self.compact_threshold = compact_threshold
+        self.probing = probing
+        # probe telemetry of user operations (not of the moves of a rehash): slots inspected over all
+        # probes, number of probes, and how many probes inspected each number of slots
+        self.probes = 0
+        self.lookups = 0
+        self.probe_histogram = [0]
 
     def __eq__(self, other: HashTable) -> bool:
         """
@@ -209,10 +464,8 @@ class HashTable:
         :param key: The key to remove.
         :raises KeyError: If the key is not found in the hash table.
         """
-        node = self._get(key)
-        if node is None:
+        if not self._delete(key):
             raise KeyError(f"Key {key} not found")
-        self._delete(key)
 
     def __contains__(self, key: str) -> bool:
         """
@@ -222,32 +475,149 @@ class HashTable:
         """
         return self._get(key) is not None
 
-    def _hash(self, key: str, inserting: bool = False) -> int:
+    def _step(self, key: str, hashed_value: int) -> int:
+        """
+        Reduces a raw polynomial hash to the probe step, matching _hash_2.
+        :param key: The key the hash belongs to (the empty key always steps by 0).
+        :param hashed_value: poly_hash(key).
+        :return: The probe step.
+        """
+        if key == "":
+            return 0
+        prime = HashTable.primes[self.prime_index]
+        step = prime - (hashed_value % prime)
+        if step % 2 == 0:
+            step += 1
+        return step
+
+    def hash_many(self, keys: List[str]) -> Tuple[List[int], List[int]]:
+        """
+        Computes the start bucket and probe step of many keys at once.
+        Uses NumPy to run Horner's rule over all keys column by column, reducing modulo the
+        capacity and the current prime at every step so the arithmetic stays in int64.
+        :param keys: The keys to hash.
+        :return: A tuple of (buckets, steps), equal to _hash_1 and _hash_2 of each key.
+        """
+        if np is None or not keys:
+            hashes = [poly_hash(key) for key in keys]
+            return [h % self.capacity for h in hashes], [self._step(k, h) for k, h in zip(keys, hashes)]
+
+        prime = HashTable.primes[self.prime_index]
+        count = len(keys)
+        lengths = np.fromiter(map(len, keys), dtype=np.int64, count=count)
+        width = int(lengths.max())
+        buckets = np.zeros(count, dtype=np.int64)
+        residues = np.zeros(count, dtype=np.int64)
+        if width:
+            # trailing "\0" characters are dropped by the U dtype, but they read back as 0 here,
+            # which is exactly what ord() contributes for them
+            codes = np.array(keys, dtype=f"U{width}").view(np.uint32).reshape(count, width).astype(np.int64)
+            for column in range(width):
+                live = lengths > column
+                chars = codes[live, column]
+                buckets[live] = (buckets[live] * 181 + chars) % self.capacity
+                residues[live] = (residues[live] * 181 + chars) % prime
+
+        steps = prime - residues
+        steps[steps % 2 == 0] += 1
+        steps[lengths == 0] = 0
+        return buckets.tolist(), steps.tolist()
+
+    def _hash(self, key: str, inserting: bool = False, hashed_value: Optional[int] = None) -> int:
         """
         Computes the hash index for a given key.
         :param key: The key to hash.
         :param inserting: Whether the hash is for insertion (affects handling of deleted nodes).
+        :param hashed_value: poly_hash(key) if already known, computed here otherwise.
         :return: The computed hash index.
         """
-        index = self._hash_1(key)
-        index2 = self._hash_2(key)
-        while self.table[index] is not None:
-            if not self.table[index].deleted and self.table[index].key == key:
-                return index
-            if inserting and self.table[index].deleted:
+        return self._probe(key, inserting, hashed_value)[0]
+
+    def _probe(self, key: str, inserting: bool = False,
+               hashed_value: Optional[int] = None) -> Tuple[int, Optional[HashNode]]:
+        """
+        Probes for a key like _hash, reading each slot once, which matters for a snapshot opened with
+        mmap=True, where every read decodes the slot.
+        :param key: The key to probe for.
+        :param inserting: Whether the probe is for insertion (affects handling of deleted nodes).
+        :param hashed_value: poly_hash(key) if already known, computed here otherwise.
+        :return: A tuple of (the index _hash returns, the node in that slot).
+        """
+        if hashed_value is None:
+            hashed_value = poly_hash(key)
+        table, capacity = self.table, self.capacity
+        index = hashed_value % capacity
+        quadratic = self.probing == "quadratic"
+        index2 = self._step(key, hashed_value) if self.probing == "double" else 1
+        # First tombstone passed while inserting. The probe has to go on past it, since the key
+        # may still live further along the chain, but a new key is placed there.
+        reusable = None
+        probes = 1
+        node = table[index]
+        while node is not None:
+            if not node.deleted and node.key == key:
+                reusable = None
                 break
-            else:
-                index = (index + index2) % self.capacity
-        return index
+            if inserting and node.deleted and reusable is None:
+                reusable = index, node
+            index = (index + (probes if quadratic else index2)) % capacity
+            probes += 1
+            node = table[index]
+        self._record_probe(probes)
+        return (index, node) if reusable is None else reusable
+
+    def _record_probe(self, probes: int) -> None:
+        """
+        Adds one probe to the probe telemetry.
+        :param probes: The number of slots the probe inspected.
+        """
+        self.probes += probes
+        self.lookups += 1
+        histogram = self.probe_histogram
+        if probes >= len(histogram):
+            histogram.extend([0] * (probes + 1 - len(histogram)))
+        histogram[probes] += 1
+
+    def _robin_hood_place(self, node: HashNode) -> None:
+        """
+        Places a node for a key not yet in the table by Robin Hood linear probing: whenever the node
+        being placed is further from its home slot than the occupant of a slot, they trade places
+        and the occupant is carried on instead.
+        :param node: The node to place.
+        """
+        capacity = self.capacity
+        index = node.hash_value % capacity
+        distance = 0
+        while True:
+            occupant = self.table[index]
+            if occupant is None or occupant.deleted:
+                if occupant is not None:
+                    self.tombstones -= 1
+                self.table[index] = node
+                return
+            if occupant.hash_value is None:
+                occupant.hash_value = poly_hash(occupant.key)
+            occupant_distance = (index - occupant.hash_value) % capacity
+            if occupant_distance < distance:
+                self.table[index], node = node, occupant
+                distance = occupant_distance
+            index = (index + 1) % capacity
+            distance += 1
 
-    def _insert(self, key: str, value: T) -> None:
+    def _insert(self, key: str, value: T, hashed_value: Optional[int] = None) -> None:
         """
         Helper method to insert a new key-value pair into the table.
         :param key: The key to insert.
         :param value: The value associated with the key.
+        :param hashed_value: poly_hash(key) if already known, computed here otherwise.
         """
+        if hashed_value is None:
+            hashed_value = poly_hash(key)
+
+        self._check_writable()
+
         # Get the correct index to insert
-        index = self._hash(key, inserting=True)
+        index = self._hash(key, inserting=True, hashed_value=hashed_value)
 
         # If the index at the table is None or the item at that index was deleted,
         # we are inserting a new item.
@@ -255,7 +625,12 @@ class HashTable:
             self.size += 1
 
             # Insert (or update) the value in the table
-            self.table[index] = HashNode(key, value)
+            if self.probing == "robin_hood":
+                self._robin_hood_place(HashNode(key, value, hash_value=hashed_value))
+            else:
+                if self.table[index] is not None:
+                    self.tombstones -= 1
+                self.table[index] = HashNode(key, value, hash_value=hashed_value)
 
             # If after the insertion, the load factor exceeds 0.5, grow the table.
             if self.size / self.capacity >= 0.5:
@@ -270,29 +645,51 @@ class HashTable:
         :param key: The key to retrieve the node for.
         :return: The HashNode associated with the key, or None if not found.
         """
-        index = self._hash(key)
-        node = self.table[index]
-        return node if node and node.key == key else None
+        # without inserting, the probe ends on the key's node or an empty slot
+        return self._probe(key)[1]
 
-    def _delete(self, key: str) -> None:
+    def _delete(self, key: str) -> bool:
         """
         Deletes a key-value pair from the hash table.
         :param key: The key to delete.
+        :return: True if the key was found and deleted, False if it was not in the table.
         """
+        self._check_writable()
         index = self._hash(key)
-        if self.table[index] and self.table[index].key == key:
-            self.table[index] = HashNode(None, None, True)
-            self.size -= 1
+        if not (self.table[index] and self.table[index].key == key):
+            return False
+        self.table[index] = HashNode(None, None, True)
+        self.size -= 1
+        self.tombstones += 1
 
-    def _grow(self) -> None:
+        # Shrink once the load factor falls to an eighth, so a shrunken table sits at a quarter
+        # and is far from the 0.5 that grows it again. Otherwise clear out the tombstones
+        # once they take up too much of the table.
+        if self.size / self.capacity <= 0.125 and self.capacity // 2 >= HashTable.min_capacity:
+            self._shrink()
+        elif self.tombstones / self.capacity > self.compact_threshold:
+            self._compact()
+        return True
+
+    @staticmethod
+    def _prime_index_for(capacity: int) -> int:
         """
-        Helper method to double the capacity of the table and rehash all items.
+        Finds the index of the largest prime below capacity, clamped to the last prime in the table
+        so capacities past the end of HashTable.primes keep a valid step modulus.
+        :param capacity: The capacity the prime is chosen for.
+        :return: An index into HashTable.primes.
+        """
+        return bisect_left(HashTable.primes, capacity) - 1
+
+    def _rehash(self, capacity: int) -> None:
+        """
+        Helper method to move all live items into a fresh table of the given capacity.
+        :param capacity: The capacity of the new table.
         """
         # Keep a reference to the old table
         old_table = self.table
 
-        # Double the capacity
-        self.capacity *= 2
+        self.capacity = capacity
 
         # Reset the size
         self.size = 0
@@ -301,16 +698,56 @@ class HashTable:
         self.table = [None] * self.capacity
 
         # Update the prime index used for hashing
-        while HashTable.primes[self.prime_index] < self.capacity:
-            self.prime_index += 1
-
-        self.prime_index -=1
+        self.prime_index = self._prime_index_for(self.capacity)
+        self.tombstones = 0
 
-        # Insert all items from the old table into the new table
-        # Note: The items will be rehashed because the capacity has changed.
+        # Move all items from the old table into the new table
+        # Note: The items will be re-bucketed because the capacity has changed,
+        # but the cached polynomial hash means the keys are not walked again.
         for node in old_table:
             if node is not None and not node.deleted:
-                self._insert(node.key, node.value)
+                if node.hash_value is None:
+                    node.hash_value = poly_hash(node.key)
+                self._place(node)
+
+    def _place(self, node: HashNode) -> None:
+        """
+        Helper method for _rehash, placing the node of a key that is not in the table yet in the slot _insert
+        would put it in. The fresh table holds no tombstones and no equal key, so the probe only looks for an
+        empty slot, and it is left out of the probe telemetry, which counts the probes of user operations.
+        :param node: The node to place, with its hash_value set.
+        """
+        self.size += 1
+        if self.probing == "robin_hood":
+            self._robin_hood_place(node)
+            return
+        capacity, table = self.capacity, self.table
+        index = node.hash_value % capacity
+        quadratic = self.probing == "quadratic"
+        step = self._step(node.key, node.hash_value) if self.probing == "double" else 1
+        probes = 1
+        while table[index] is not None:
+            index = (index + (probes if quadratic else step)) % capacity
+            probes += 1
+        table[index] = node
+
+    def _grow(self) -> None:
+        """
+        Helper method to double the capacity of the table and rehash all items.
+        """
+        self._rehash(self.capacity * 2)
+
+    def _shrink(self) -> None:
+        """
+        Helper method to halve the capacity of the table and rehash all items.
+        """
+        self._rehash(self.capacity // 2)
+
+    def _compact(self) -> None:
+        """
+        Helper method to drop all tombstones by rehashing the live items at the same capacity.
+        """
+        self._rehash(self.capacity)
 
     def update(self, pairs: List[Tuple[str, T]] = []) -> None:
         """
@@ -320,36 +757,778 @@ class HashTable:
         for key, value in pairs:
             self._insert(key, value)
 
-    def keys(self) -> List[str]:
+    def bulk_update(self, pairs: Iterable[Tuple[str, T]]) -> None:
+        """
+        Updates the hash table with many key-value pairs at once.
+        The table is grown a single time to the capacity the whole batch needs, so placing the
+        pairs never triggers an intermediate _grow. Keys and values end up the same as with update,
+        though slots may differ since items are not re-placed by the skipped grows.
+        :param pairs: An iterable of key-value pairs to update the table with.
+        """
+        self._check_writable()
+        pairs = list(pairs)
+        if not pairs:
+            return
+
+        # Size for the worst case where every key is new, stopping at the same capacity
+        # the sequence of _grow calls from update would reach
+        capacity = self.capacity
+        while (self.size + len(pairs)) / capacity >= 0.5:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._rehash(capacity)
+
+        # Not batch hashed with hash_many: its residues cannot give back the unreduced poly_hash the nodes
+        # cache, so each key is hashed once by _insert and the hash stored in its node
+        for key, value in pairs:
+            self._insert(key, value)
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[str, T]]) -> HashTable:
+        """
+        Builds a hash table from key-value pairs, sizing it once up front.
+        :param pairs: An iterable of key-value pairs to fill the table with.
+        :return: The new hash table.
+        """
+        table = cls()
+        table.bulk_update(pairs)
+        return table
+
+    def get_many(self, keys: List[str], default: T = _MISSING) -> List[T]:
+        """
+        Retrieves the values of many keys at once, hashing them in a single batch.
+        :param keys: The keys to retrieve the values for.
+        :param default: Value returned for missing keys. If not given, a missing key raises KeyError.
+        :return: The values of the keys, in the same order as keys.
+        :raises KeyError: If a key is not found and no default was given.
+        """
+        if self.probing != "double":
+            nodes = [self._get(key) for key in keys]
+            if default is _MISSING:
+                for key, node in zip(keys, nodes):
+                    if node is None:
+                        raise KeyError(f"Key {key} not found")
+            return [default if node is None else node.value for node in nodes]
+
+        table = self.table
+        capacity = self.capacity
+        buckets, steps = self.hash_many(keys)
+        values = []
+        for key, index, step in zip(keys, buckets, steps):
+            # Same probe as _hash, stepping over deleted nodes
+            node = table[index]
+            probes = 1
+            while node is not None and (node.deleted or node.key != key):
+                index = (index + step) % capacity
+                node = table[index]
+                probes += 1
+            self._record_probe(probes)
+            if node is not None:
+                values.append(node.value)
+            elif default is _MISSING:
+                raise KeyError(f"Key {key} not found")
+            else:
+                values.append(default)
+        return values
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        """
+        Retrieves the value associated with a given key, without raising for a missing key.
+
+        :param key: The key to retrieve the value for.
+        :param default: The value returned if the key is not found.
+        :return: The value associated with the key, or default.
+        """
+        node = self._get(key)
+        return default if node is None else node.value
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over the keys in the hash table.
+
+        :return: An iterator over the keys.
+        """
+        for node in self.table:
+            if node is not None and not node.deleted:
+                yield node.key
+
+    def iter_items(self) -> Iterator[Tuple[str, T]]:
+        """
+        Iterates over the key-value pairs in the hash table, reading each slot once.
+
+        :return: An iterator over the key-value pairs.
+        """
+        for node in self.table:
+            if node is not None and not node.deleted:
+                yield node.key, node.value
+
+    def keys(self) -> KeysView:
         """
-        Returns a list of keys in the hash table.
+        Returns a view of the keys in the hash table.
 
-        :return: A list of keys.
+        :return: A live view of the keys.
         """
-        return [node.key for node in self.table if node and not node.deleted]
+        return KeysView(self)
 
-    def values(self) -> List[T]:
+    def values(self) -> ValuesView:
         """
-        Returns a list of values in the hash table.
+        Returns a view of the values in the hash table.
 
-        :return: A list of values.
+        :return: A live view of the values.
         """
-        return [node.value for node in self.table if node and not node.deleted]
+        return ValuesView(self)
 
-    def items(self) -> List[Tuple[str, T]]:
+    def items(self) -> ItemsView:
         """
-        Returns a list of key-value pairs (items) in the hash table.
+        Returns a view of the key-value pairs (items) in the hash table.
 
-        :return: A list of key-value pairs.
+        :return: A live view of the key-value pairs.
         """
-        return [(node.key, node.value) for node in self.table if node and not node.deleted]
+        return ItemsView(self)
 
     def clear(self) -> None:
         """
         Clears all key-value pairs from the hash table.
         """
+        self._check_writable()
         self.table = [None] * self.capacity
         self.size = 0
+        self.tombstones = 0
+
+    def _check_writable(self) -> None:
+        """
+        Guards the methods that modify the table.
+        :raises TypeError: If the table is a snapshot opened with mmap=True.
+        """
+        if isinstance(self.table, MappedSlots):
+            raise TypeError("HashTable loaded with mmap=True is read-only")
+
+    def save(self, path: str) -> None:
+        """
+        Writes the table to a binary snapshot, slot for slot, so a loaded table has the same placement.
+        Values are stored pickled, so loading a snapshot runs whatever code its pickles ask for: only load
+        snapshots written by a trusted process.
+        :param path: file to write the snapshot to
+        """
+        records = bytearray()
+        offsets = array('q')
+        data_start = SNAPSHOT_HEADER.size + SNAPSHOT_OFFSET.size * self.capacity
+        for node in self.table:
+            if node is None:
+                offsets.append(EMPTY_SLOT)
+            elif node.deleted:
+                offsets.append(DELETED_SLOT)
+            else:
+                key = node.key.encode("utf-8", "surrogatepass")
+                value = pickle.dumps(node.value)
+                offsets.append(data_start + len(records))
+                records += SNAPSHOT_RECORD.pack(len(key), len(value))
+                records += key
+                records += value
+        if sys.byteorder == "big":
+            offsets.byteswap()
+
+        with open(path, "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, PROBING_STRATEGIES.index(self.probing),
+                                            self.capacity, self.size, self.prime_index, self.tombstones))
+            file.write(offsets.tobytes())
+            file.write(records)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> HashTable:
+        """
+        Opens a snapshot written by save.
+        With mmap the file is mapped read-only and slots are decoded on access, so opening takes
+        constant time and lookups read straight from the file; the table cannot be modified.
+        Without mmap every slot is decoded into a regular, writable table.
+        Values are unpickled, which can run arbitrary code: never load a snapshot from an untrusted source.
+        A mapped table holds the mapping open until it is closed, with close() or by using it in a with block.
+        :param path: file to read the snapshot from
+        :param mmap: whether to memory-map the snapshot instead of reading it into memory
+        :return: the loaded table, equal to the table that was saved
+        :raises ValueError: If the file is not a HashTable snapshot.
+        """
+        with open(path, "rb") as file:
+            buffer = memory_map(file.fileno(), 0, access=ACCESS_READ) if mmap else file.read()
+        header = SNAPSHOT_HEADER.unpack_from(buffer) if len(buffer) >= SNAPSHOT_HEADER.size else None
+        if header is None or header[:2] != (SNAPSHOT_MAGIC, SNAPSHOT_VERSION):
+            if mmap:
+                buffer.close()
+            raise ValueError(f"{path} is not a HashTable snapshot")
+        magic, version, probing, capacity, size, prime_index, tombstones = header
+
+        table = cls(probing=PROBING_STRATEGIES[probing])
+        table.capacity = capacity
+        table.size = size
+        table.prime_index = prime_index
+        table.tombstones = tombstones
+        slots = MappedSlots(buffer, capacity)
+        if mmap:
+            table.table = slots
+        else:
+            table.table = list(slots)
+            # the snapshot does not store the unreduced hashes, so the writable table fills its cache once here
+            for node in table.table:
+                if node is not None and not node.deleted:
+                    node.hash_value = poly_hash(node.key)
+        return table
+
+    def close(self) -> None:
+        """
+        Releases the memory-mapped snapshot of a table loaded with mmap=True, after which the table cannot
+        be read. Does nothing for any other table.
+        """
+        if isinstance(self.table, MappedSlots):
+            self.table.close()
+
+    def __enter__(self) -> HashTable:
+        """
+        :return: the table, to be closed at the end of the with block
+        """
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Closes the table, see close
+        """
+        self.close()
+
+    def average_probe_length(self) -> float:
+        """
+        Returns the average number of slots inspected per probe since the table was created.
+
+        :return: The average probe length, or 0.0 if the table was never probed.
+        """
+        return self.probes / self.lookups if self.lookups else 0.0
+
+    def max_probe_length(self) -> int:
+        """
+        Returns the largest number of slots a single probe has inspected since the table was created.
+
+        :return: The longest probe, or 0 if the table was never probed.
+        """
+        return len(self.probe_histogram) - 1
+
+
+def compact_hash(key: str) -> int:
+    """
+    Computes the 181-multiplier polynomial hash reduced modulo COMPACT_MODULUS.
+    :param key: key to be hashed
+    :return: hash of the key, small enough to store in a signed 64-bit slot
+    """
+    hashed_value = 0
+    for char in key:
+        hashed_value = (181 * hashed_value + ord(char)) % COMPACT_MODULUS
+    return hashed_value
+
+
+class CompactHashTable:
+    """
+    Hash Table storing its slots in parallel arrays instead of one HashNode per slot.
+    Offers the same mapping API as HashTable; since hashes are reduced by COMPACT_MODULUS
+    to fit in an array('q'), items are not placed in the same slots as in a HashTable.
+    """
+    __slots__ = ['capacity', 'size', 'prime_index', 'key_slots', 'value_slots', 'states', 'hashes',
+                 'tombstones', 'compact_threshold', 'probes', 'lookups']
+
+    min_capacity = HashTable.min_capacity
+
+    def __init__(self, capacity: int = 8, compact_threshold: float = 0.25) -> None:
+        """
+        Initializes hash table
+        :param capacity: capacity of the hash table
+        :param compact_threshold: share of the slots that may hold tombstones before the table is compacted,
+                                  below 0.5 like for HashTable
+        :raises ValueError: If compact_threshold is not in [0, 0.5).
+        """
+        check_compact_threshold(compact_threshold)
+        self.capacity = capacity
+        self.size = 0
+        self.prime_index = HashTable._prime_index_for(capacity)
+        self._allocate(capacity)
+
+        self.tombstones = 0
+        self.compact_threshold = compact_threshold
+        self.probes = 0
+        self.lookups = 0
+
+    def _allocate(self, capacity: int) -> None:
+        """
+        Replaces the slot arrays with empty ones of the given capacity.
+        :param capacity: number of slots
+        """
+        self.key_slots: List[Optional[str]] = [None] * capacity
+        self.value_slots: List[Optional[T]] = [None] * capacity
+        self.states = bytearray(capacity)
+        self.hashes = array('q', bytes(8 * capacity))
+
+    def __eq__(self, other: CompactHashTable) -> bool:
+        """
+        Equality operator, comparing the stored key-value pairs
+        :param other: other hash table we are comparing with this one
+        :return: bool if equal or not
+        """
+        if not isinstance(other, CompactHashTable) or self.size != other.size:
+            return False
+        for item in self.iter_items():
+            if item not in other.items():
+                return False
+        return True
+
+    def __str__(self) -> str:
+        """
+        Represents the table as a string
+        :return: string representation of the hash table
+        """
+        represent = ""
+        for bin_no, state in enumerate(self.states):
+            if state == LIVE:
+                item = f"({self.key_slots[bin_no]}, {self.value_slots[bin_no]})"
+            else:
+                item = "<deleted>" if state == DELETED else "None"
+            represent += "[" + str(bin_no) + "]: " + item + '\n'
+        return represent
+
+    __repr__ = __str__
+
+    def __len__(self) -> int:
+        """
+        Returns the number of elements in the hash table.
+
+        :return: An integer representing the number of elements in the hash table.
+        """
+        return self.size
+
+    def __setitem__(self, key: str, value: T) -> None:
+        """
+        Inserts or updates a key-value pair in the hash table.
+        :param key: The key to insert or update.
+        :param value: The value associated with the key.
+        """
+        self._insert(key, value)
+
+    def __getitem__(self, key: str) -> T:
+        """
+        Retrieves the value associated with a given key.
+
+        :param key: The key to retrieve the value for.
+        :return: The value associated with the key.
+        :raises KeyError: If the key is not found in the hash table.
+        """
+        index = self._probe(key)
+        if self.states[index] != LIVE:
+            raise KeyError(f"Key {key} not found")
+        return self.value_slots[index]
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Removes a key-value pair from the hash table.
+        :param key: The key to remove.
+        :raises KeyError: If the key is not found in the hash table.
+        """
+        index = self._probe(key)
+        if self.states[index] != LIVE:
+            raise KeyError(f"Key {key} not found")
+
+        self.states[index] = DELETED
+        self.key_slots[index] = self.value_slots[index] = None
+        self.size -= 1
+        self.tombstones += 1
+
+        # Same shrink and compaction policy as HashTable._delete
+        if self.size / self.capacity <= 0.125 and self.capacity // 2 >= self.min_capacity:
+            self._rehash(self.capacity // 2)
+        elif self.tombstones / self.capacity > self.compact_threshold:
+            self._rehash(self.capacity)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks if a key exists in the hash table.
+        :param key: The key to check for existence.
+        :return: True if the key exists, else False.
+        """
+        return self.states[self._probe(key)] == LIVE
+
+    def _probe(self, key: str, inserting: bool = False, hashed_value: Optional[int] = None) -> int:
+        """
+        Finds the slot of a key by double hashing, like HashTable._hash.
+        :param key: The key to probe for.
+        :param inserting: Whether the probe is for insertion (a new key reuses the first tombstone passed).
+        :param hashed_value: compact_hash(key) if already known, computed here otherwise.
+        :return: The slot of the key, or the slot a new key should go to.
+        """
+        if hashed_value is None:
+            hashed_value = compact_hash(key)
+        capacity = self.capacity
+        prime = HashTable.primes[self.prime_index]
+        index = hashed_value % capacity
+        # unlike _hash_2 the empty key gets a real step, the step can never be 0
+        step = prime - (hashed_value % prime)
+        if step % 2 == 0:
+            step += 1
+
+        states, key_slots = self.states, self.key_slots
+        reusable = None
+        probes = 1
+        while states[index] != EMPTY:
+            if states[index] == LIVE and key_slots[index] == key:
+                reusable = None
+                break
+            if inserting and states[index] == DELETED and reusable is None:
+                reusable = index
+            index = (index + step) % capacity
+            probes += 1
+        self.probes += probes
+        self.lookups += 1
+        return index if reusable is None else reusable
+
+    def _insert(self, key: str, value: T, hashed_value: Optional[int] = None) -> None:
+        """
+        Helper method to insert a new key-value pair into the table.
+        :param key: The key to insert.
+        :param value: The value associated with the key.
+        :param hashed_value: compact_hash(key) if already known, computed here otherwise.
+        """
+        if hashed_value is None:
+            hashed_value = compact_hash(key)
+        index = self._probe(key, inserting=True, hashed_value=hashed_value)
+
+        if self.states[index] == LIVE:
+            self.value_slots[index] = value
+            return
+
+        if self.states[index] == DELETED:
+            self.tombstones -= 1
+        self.states[index] = LIVE
+        self.key_slots[index] = key
+        self.value_slots[index] = value
+        self.hashes[index] = hashed_value
+        self.size += 1
+
+        if self.size / self.capacity >= 0.5:
+            self._rehash(self.capacity * 2)
+
+    def _rehash(self, capacity: int) -> None:
+        """
+        Helper method to move all live items into fresh arrays of the given capacity,
+        reusing the cached hashes.
+        :param capacity: The capacity of the new table.
+        """
+        old_items = [(self.key_slots[i], self.value_slots[i], self.hashes[i])
+                     for i, state in enumerate(self.states) if state == LIVE]
+
+        self.capacity = capacity
+        self.size = 0
+        self.tombstones = 0
+        self.prime_index = HashTable._prime_index_for(capacity)
+        self._allocate(capacity)
+
+        for key, value, hashed_value in old_items:
+            self._insert(key, value, hashed_value)
+
+    def update(self, pairs: List[Tuple[str, T]] = []) -> None:
+        """
+        Updates the hash table with key-value pairs from a list of tuples.
+        :param pairs: A list of key-value pairs to update the table with.
+        """
+        for key, value in pairs:
+            self._insert(key, value)
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        """
+        Retrieves the value associated with a given key, without raising for a missing key.
+
+        :param key: The key to retrieve the value for.
+        :param default: The value returned if the key is not found.
+        :return: The value associated with the key, or default.
+        """
+        index = self._probe(key)
+        return self.value_slots[index] if self.states[index] == LIVE else default
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over the keys in the hash table.
+
+        :return: An iterator over the keys.
+        """
+        for key, state in zip(self.key_slots, self.states):
+            if state == LIVE:
+                yield key
+
+    def iter_items(self) -> Iterator[Tuple[str, T]]:
+        """
+        Iterates over the key-value pairs in the hash table, reading each slot once.
+
+        :return: An iterator over the key-value pairs.
+        """
+        for key, value, state in zip(self.key_slots, self.value_slots, self.states):
+            if state == LIVE:
+                yield key, value
+
+    def keys(self) -> KeysView:
+        """
+        Returns a view of the keys in the hash table.
+
+        :return: A live view of the keys.
+        """
+        return KeysView(self)
+
+    def values(self) -> ValuesView:
+        """
+        Returns a view of the values in the hash table.
+
+        :return: A live view of the values.
+        """
+        return ValuesView(self)
+
+    def items(self) -> ItemsView:
+        """
+        Returns a view of the key-value pairs (items) in the hash table.
+
+        :return: A live view of the key-value pairs.
+        """
+        return ItemsView(self)
+
+    def clear(self) -> None:
+        """
+        Clears all key-value pairs from the hash table.
+        """
+        self._allocate(self.capacity)
+        self.size = 0
+        self.tombstones = 0
+
+    def average_probe_length(self) -> float:
+        """
+        Returns the average number of slots inspected per probe since the table was created.
+
+        :return: The average probe length, or 0.0 if the table was never probed.
+        """
+        return self.probes / self.lookups if self.lookups else 0.0
+
+
+class StripeSnapshot:
+    """
+    Slot array of one stripe of a ConcurrentHashTable, published as a unit so readers always see
+    a capacity that matches the slots. Slots hold None, TOMBSTONE or an immutable (key, value) tuple.
+    Writers store single slots in place, holding the stripe's lock; the capacity only changes by
+    publishing a new snapshot.
+    """
+    __slots__ = ['capacity', 'prime', 'slots']
+
+    def __init__(self, capacity: int, slots: Optional[List[Optional[Tuple[str, T]]]] = None) -> None:
+        """
+        Creates a slot array
+        :param capacity: number of slots, a power of two so every odd step visits all of them
+        :param slots: the slots, all empty if not given
+        """
+        self.capacity = capacity
+        self.prime = HashTable.primes[HashTable._prime_index_for(capacity)]
+        self.slots: List[Optional[Tuple[str, T]]] = [None] * capacity if slots is None else slots
+
+    def find(self, key: str, hashed_value: int) -> Tuple[int, Optional[Tuple[str, T]], int]:
+        """
+        Probes for a key by double hashing. Needs no lock: every write is a single slot store, and
+        writers resize before more than half of the slots are used, so the probe always reaches an empty slot.
+        :param key: The key to probe for.
+        :param hashed_value: the stripe-local hash of the key.
+        :return: A tuple of (slot of the key or -1, the entry read there, first tombstone or empty slot passed).
+        """
+        capacity, slots = self.capacity, self.slots
+        index = hashed_value % capacity
+        step = self.prime - (hashed_value % self.prime)
+        if step % 2 == 0:
+            step += 1
+        free = -1
+        while True:
+            entry = slots[index]
+            if entry is None:
+                return -1, None, index if free < 0 else free
+            if entry is TOMBSTONE:
+                if free < 0:
+                    free = index
+            elif entry[0] == key:
+                return index, entry, free
+            index = (index + step) % capacity
+
+
+class ConcurrentHashTable:
+    """
+    Thread-safe hash table for tables shared between threads.
+    Keys are split over stripes by hash, and each stripe has its own lock for writes and its own
+    StripeSnapshot. Reads take no lock: they probe whichever snapshot is current. Under the stripe's
+    lock a writer stores one slot of the current snapshot in place, a single store that a reader sees
+    either before or after, so writes cost amortized constant time like HashTable. Only a resize is
+    copy-on-write: it rehashes into a new snapshot and publishes it with a single assignment, so
+    readers never wait for a grow or shrink, and readers still probing the old snapshot find it intact.
+    """
+    __slots__ = ['stripes', 'locks', 'snapshots', 'sizes', 'tombstones']
+
+    def __init__(self, stripes: int = 16, capacity: int = 8) -> None:
+        """
+        Initializes hash table
+        :param stripes: number of independently locked stripes
+        :param capacity: starting capacity of each stripe, rounded up to a power of two
+        """
+        capacity = max(capacity, 8)
+        capacity = 1 << (capacity - 1).bit_length()
+        self.stripes = stripes
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.snapshots = [StripeSnapshot(capacity) for _ in range(stripes)]
+        self.sizes = [0] * stripes
+        self.tombstones = [0] * stripes
+
+    def _locate(self, key: str) -> Tuple[int, int]:
+        """
+        Splits the polynomial hash of a key into its stripe and the hash used within the stripe.
+        :param key: The key to hash.
+        :return: A tuple of (stripe, stripe-local hash).
+        """
+        hashed_value = poly_hash(key)
+        return hashed_value % self.stripes, hashed_value // self.stripes
+
+    def __len__(self) -> int:
+        """
+        Returns the number of elements in the hash table, as of some moment during the call.
+
+        :return: An integer representing the number of elements in the hash table.
+        """
+        return sum(self.sizes)
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        """
+        Retrieves the value associated with a given key without taking a lock.
+
+        :param key: The key to retrieve the value for.
+        :param default: The value returned if the key is not found.
+        :return: The value associated with the key, or default.
+        """
+        stripe, hashed_value = self._locate(key)
+        index, entry, _ = self.snapshots[stripe].find(key, hashed_value)
+        return default if index < 0 else entry[1]
+
+    def __getitem__(self, key: str) -> T:
+        """
+        Retrieves the value associated with a given key.
+
+        :param key: The key to retrieve the value for.
+        :return: The value associated with the key.
+        :raises KeyError: If the key is not found in the hash table.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(f"Key {key} not found")
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks if a key exists in the hash table.
+        :param key: The key to check for existence.
+        :return: True if the key exists, else False.
+        """
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key: str, value: T) -> None:
+        """
+        Inserts or updates a key-value pair in the hash table.
+        :param key: The key to insert or update.
+        :param value: The value associated with the key.
+        """
+        stripe, hashed_value = self._locate(key)
+        with self.locks[stripe]:
+            snapshot = self.snapshots[stripe]
+            index, _, free = snapshot.find(key, hashed_value)
+            if index >= 0:
+                snapshot.slots[index] = (key, value)
+                return
+
+            if snapshot.slots[free] is TOMBSTONE:
+                self.tombstones[stripe] -= 1
+            snapshot.slots[free] = (key, value)
+            self.sizes[stripe] += 1
+            if (self.sizes[stripe] + self.tombstones[stripe]) / snapshot.capacity >= 0.5:
+                # doubles, unless tombstones make up most of the used slots and only need clearing out
+                grow = self.sizes[stripe] / snapshot.capacity >= 0.25
+                self._resize(stripe, snapshot.capacity * 2 if grow else snapshot.capacity)
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Removes a key-value pair from the hash table.
+        :param key: The key to remove.
+        :raises KeyError: If the key is not found in the hash table.
+        """
+        stripe, hashed_value = self._locate(key)
+        with self.locks[stripe]:
+            snapshot = self.snapshots[stripe]
+            index, _, _ = snapshot.find(key, hashed_value)
+            if index < 0:
+                raise KeyError(f"Key {key} not found")
+            snapshot.slots[index] = TOMBSTONE
+            self.sizes[stripe] -= 1
+            self.tombstones[stripe] += 1
+            if self.sizes[stripe] / snapshot.capacity <= 0.125 and snapshot.capacity // 2 >= HashTable.min_capacity:
+                self._resize(stripe, snapshot.capacity // 2)
+
+    def _resize(self, stripe: int, capacity: int) -> None:
+        """
+        Rehashes the live entries of a stripe into a new snapshot and publishes it, dropping all tombstones.
+        Must be called holding the lock of the stripe.
+        :param stripe: The stripe to resize.
+        :param capacity: The capacity of the new snapshot, a power of two.
+        """
+        old = self.snapshots[stripe]
+        new = StripeSnapshot(capacity)
+        # filled in place, nothing can read it before it is published
+        for entry in old.slots:
+            if entry is not None and entry is not TOMBSTONE:
+                _, _, free = new.find(entry[0], poly_hash(entry[0]) // self.stripes)
+                new.slots[free] = entry
+        self.snapshots[stripe] = new
+        self.tombstones[stripe] = 0
+
+    def iter_items(self) -> Iterator[Tuple[str, T]]:
+        """
+        Iterates over the key-value pairs, stripe by stripe. Weakly consistent: pairs written during
+        the iteration may or may not be seen, but no key is seen twice within a stripe, since each
+        stripe's slots are copied before they are read.
+
+        :return: An iterator over the key-value pairs.
+        """
+        for snapshot in list(self.snapshots):
+            for entry in snapshot.slots[:]:
+                if entry is not None and entry is not TOMBSTONE:
+                    yield entry
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over the keys, with the same consistency as iter_items.
+
+        :return: An iterator over the keys.
+        """
+        return (key for key, _ in self.iter_items())
+
+    def keys(self) -> KeysView:
+        """
+        Returns a view of the keys in the hash table.
+
+        :return: A live view of the keys.
+        """
+        return KeysView(self)
+
+    def values(self) -> ValuesView:
+        """
+        Returns a view of the values in the hash table.
+
+        :return: A live view of the values.
+        """
+        return ValuesView(self)
+
+    def items(self) -> ItemsView:
+        """
+        Returns a view of the key-value pairs (items) in the hash table.
+
+        :return: A live view of the key-value pairs.
+        """
+        return ItemsView(self)
 
 
 def is_plagiarism(my_song: List[List[int]], their_song: List[List[int]], max_similarity: int) -> bool:
@@ -381,20 +1560,250 @@ def is_plagiarism(my_song: List[List[int]], their_song: List[List[int]], max_sim
         """
         melody_dict = HashTable()
         for melody in song:
-            normalized_melody = get_normalized_melody(melody)
-            try:
-                melody_dict[str(normalized_melody)] += 1  # convert tuple to string to use as key
-            except KeyError:
-                melody_dict[str(normalized_melody)] = 1
+            key = str(get_normalized_melody(melody))  # convert tuple to string to use as key
+            melody_dict[key] = melody_dict.get(key, 0) + 1
         return melody_dict
 
     my_melody_dict = build_melody_dict(my_song)
     their_melody_dict = build_melody_dict(their_song)
 
     similar_melodies_count = 0
-    for melody in my_melody_dict.keys():
-        if melody in their_melody_dict:
-            similar_melodies_count += min(my_melody_dict[melody], their_melody_dict[melody])
+    # items() hands over each count directly, so every melody costs one probe of their table only
+    for melody, my_count in my_melody_dict.items():
+        their_count = their_melody_dict.get(melody, 0)
+        if their_count:
+            similar_melodies_count += min(my_count, their_count)
 
     return similar_melodies_count > max_similarity
 
+
+def normalize_melody(melody: List[int]) -> Tuple[int, ...]:
+    """
+    Normalizes a melody by subtracting the first note from all notes, like is_plagiarism.
+
+    :param melody: A list of integers representing a musical melody.
+    :return: A tuple of integers representing the normalized melody; transposed melodies share it.
+    """
+    first_note = melody[0]
+    return tuple(note - first_note for note in melody)
+
+
+def song_melodies(song: List[List[int]]) -> Dict[Tuple[int, ...], int]:
+    """
+    Counts the normalized melodies of a song in a single pass.
+
+    :param song: A list of melodies (each melody represented as a list of integers).
+    :return: A dictionary from normalized melody to the number of times it occurs in the song.
+    """
+    counts = {}
+    for melody in song:
+        normalized = normalize_melody(melody)
+        counts[normalized] = counts.get(normalized, 0) + 1
+    return counts
+
+
+def pack_song(song: List[List[int]]) -> Tuple[array, array]:
+    """
+    Normalizes a song once and flattens it into two int64 arrays, which pickle as plain bytes
+    instead of nested lists when shipped to worker processes.
+
+    :param song: A list of melodies (each melody represented as a list of integers).
+    :return: A tuple of (notes, offsets): the normalized notes of all melodies back to back,
+             and where each melody starts, with the total note count appended.
+    :raises ValueError: If a normalized note does not fit in a signed 64-bit integer.
+    """
+    notes = array('q')
+    offsets = array('q', [0])
+    for number, melody in enumerate(song):
+        first_note = melody[0]
+        try:
+            notes.extend(note - first_note for note in melody)
+        except OverflowError:
+            raise ValueError(f"Melody {number} has a note too far from its first note to pack as int64, "
+                             f"check it with is_plagiarism instead") from None
+        offsets.append(len(notes))
+    return notes, offsets
+
+
+def _packed_counts(packed: Tuple[array, array]) -> Dict[Tuple[int, ...], int]:
+    """
+    Counts the normalized melodies of a packed song.
+
+    :param packed: A song as returned by pack_song.
+    :return: A dictionary from normalized melody to the number of times it occurs in the song.
+    """
+    notes, offsets = packed
+    counts = {}
+    for start, end in zip(offsets, offsets[1:]):
+        melody = tuple(notes[start:end])
+        counts[melody] = counts.get(melody, 0) + 1
+    return counts
+
+
+def _scan_chunk(chunk: List[Tuple[Tuple[array, array], Tuple[array, array]]], max_similarity: int) -> List[bool]:
+    """
+    Runs is_plagiarism over a chunk of packed song pairs, in a worker process.
+
+    :param chunk: (my_song, their_song) pairs, packed by pack_song.
+    :param max_similarity: The maximum allowed similarity between melodies for plagiarism detection.
+    :return: The verdict of each pair, in order.
+    """
+    verdicts = []
+    counted = {}  # songs repeat across a chunk when one song is checked against many
+    for mine, theirs in chunk:
+        for packed in (mine, theirs):
+            if id(packed) not in counted:
+                counted[id(packed)] = _packed_counts(packed)
+        my_counts, their_counts = counted[id(mine)], counted[id(theirs)]
+        similar_melodies_count = 0
+        for melody, my_count in my_counts.items():
+            similar_melodies_count += min(my_count, their_counts.get(melody, 0))
+        verdicts.append(similar_melodies_count > max_similarity)
+    return verdicts
+
+
+def scan_plagiarism(pairs: Iterable[Tuple[List[List[int]], List[List[int]]]], max_similarity: int,
+                    workers: Optional[int] = None, chunk_size: int = 64) -> List[bool]:
+    """
+    Runs is_plagiarism over many (my_song, their_song) pairs, spread over a process pool.
+    Every distinct song object is normalized and packed once, however many pairs it appears in.
+
+    :param pairs: (my_song, their_song) pairs to check, any iterable.
+    :param max_similarity: The maximum allowed similarity between melodies for plagiarism detection.
+    :param workers: number of worker processes, defaults to the CPU count. With 1 the pairs are checked in-process.
+    :param chunk_size: number of pairs sent to a worker at a time.
+    :return: The verdict of each pair, in the order of pairs, equal to is_plagiarism(my_song, their_song, max_similarity).
+    :raises ValueError: If a song has notes pack_song cannot store, raised before any worker starts.
+    """
+    # songs are told apart by id, so every song must stay alive until all are packed: a generator
+    # dropping its songs would let a new song reuse the id of an old one
+    pairs = list(pairs)
+    packed_songs = {}
+    packed_pairs = []
+    for pair in pairs:
+        for song in pair:
+            if id(song) not in packed_songs:
+                packed_songs[id(song)] = pack_song(song)
+        packed_pairs.append((packed_songs[id(pair[0])], packed_songs[id(pair[1])]))
+
+    chunks = [packed_pairs[i:i + chunk_size] for i in range(0, len(packed_pairs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_scan_chunk(chunk, max_similarity) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_scan_chunk, chunks, [max_similarity] * len(chunks)))
+    return [verdict for chunk_verdicts in results for verdict in chunk_verdicts]
+
+
+def scan_candidates(my_song: List[List[int]], candidates: List[List[List[int]]], max_similarity: int,
+                    workers: Optional[int] = None, chunk_size: int = 64) -> List[bool]:
+    """
+    Runs is_plagiarism of one song against many candidate songs, spread over a process pool.
+
+    :param my_song: My song, a list of melodies (each melody represented as a list of integers).
+    :param candidates: Their songs, each a list of melodies.
+    :param max_similarity: The maximum allowed similarity between melodies for plagiarism detection.
+    :param workers: number of worker processes, defaults to the CPU count.
+    :param chunk_size: number of candidates sent to a worker at a time.
+    :return: The verdict for each candidate, in order.
+    """
+    return scan_plagiarism([(my_song, song) for song in candidates], max_similarity,
+                           workers=workers, chunk_size=chunk_size)
+
+
+class MelodyIndex:
+    """
+    Persistent index of a song catalog for plagiarism checks.
+    Each song's normalized melody counts are stored once, along with an inverted index from normalized
+    melody to the songs containing it, so a query only walks the new song and the matching postings.
+    Melodies are keyed by their exact normalized tuples, so similarity is exactly the count is_plagiarism compares.
+    """
+    __slots__ = ['songs', 'postings']
+
+    def __init__(self, catalog: Optional[Iterable[Tuple[Hashable, List[List[int]]]]] = None) -> None:
+        """
+        Creates a melody index
+        :param catalog: optional (song_id, song) pairs to start the index with
+        """
+        self.songs: Dict[Hashable, Dict[Tuple[int, ...], int]] = {}
+        self.postings: Dict[Tuple[int, ...], Dict[Hashable, int]] = {}
+        if catalog is not None:
+            for song_id, song in catalog:
+                self.add_song(song_id, song)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of songs in the index
+        """
+        return len(self.songs)
+
+    def __contains__(self, song_id: Hashable) -> bool:
+        """
+        :param song_id: id of the song to look for
+        :return: True if the song is in the index
+        """
+        return song_id in self.songs
+
+    def add_song(self, song_id: Hashable, song: List[List[int]]) -> None:
+        """
+        Adds a song to the index, replacing any song already stored under the same id.
+        :param song_id: id to store the song under
+        :param song: A list of melodies (each melody represented as a list of integers).
+        """
+        if song_id in self.songs:
+            self.remove_song(song_id)
+        counts = song_melodies(song)
+        self.songs[song_id] = counts
+        for melody, count in counts.items():
+            self.postings.setdefault(melody, {})[song_id] = count
+
+    def remove_song(self, song_id: Hashable) -> None:
+        """
+        Removes a song from the index.
+        :param song_id: id of the song to remove
+        :raises KeyError: If no song is stored under song_id.
+        """
+        if song_id not in self.songs:
+            raise KeyError(f"Song {song_id} not found")
+        for melody in self.songs.pop(song_id):
+            posting = self.postings[melody]
+            del posting[song_id]
+            if not posting:
+                del self.postings[melody]
+
+    def similarities(self, song: List[List[int]]) -> Dict[Hashable, int]:
+        """
+        Counts the similar melodies between a song and every catalog song sharing at least one melody.
+        :param song: A list of melodies (each melody represented as a list of integers).
+        :return: A dictionary from song id to the similar melody count of is_plagiarism.
+        """
+        scores = {}
+        for melody, my_count in song_melodies(song).items():
+            for song_id, their_count in self.postings.get(melody, {}).items():
+                scores[song_id] = scores.get(song_id, 0) + min(my_count, their_count)
+        return scores
+
+    def most_similar(self, song: List[List[int]], k: int = 10) -> List[Tuple[Hashable, int]]:
+        """
+        Finds the catalog songs sharing the most melodies with a song.
+        :param song: A list of melodies (each melody represented as a list of integers).
+        :param k: number of songs to return
+        :return: Up to k (song_id, similar melody count) pairs, most similar first.
+        """
+        return heapq.nlargest(k, self.similarities(song).items(), key=lambda pair: pair[1])
+
+    def is_plagiarism(self, my_song: List[List[int]], song_id: Hashable, max_similarity: int) -> bool:
+        """
+        Determines whether my_song contains plagiarism from a catalog song, like is_plagiarism.
+        :param my_song: My song, a list of melodies (each melody represented as a list of integers).
+        :param song_id: id of the catalog song to check against.
+        :param max_similarity: The maximum allowed similarity between melodies for plagiarism detection.
+        :return: True if plagiarism is detected, else False.
+        :raises KeyError: If no song is stored under song_id.
+        """
+        their_counts = self.songs[song_id]
+        similar_melodies_count = 0
+        for melody, my_count in song_melodies(my_song).items():
+            similar_melodies_count += min(my_count, their_counts.get(melody, 0))
+        return similar_melodies_count > max_similarity
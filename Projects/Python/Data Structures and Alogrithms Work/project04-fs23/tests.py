@@ -0,0 +1,515 @@
+"""
+Hash Table Project
+CSE 331 FS23 (Onsay)
+tests.py
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+import benchmark
+
+from solution import (COMPACT_MODULUS, PROBING_STRATEGIES, CompactHashTable, ConcurrentHashTable, HashTable,
+                      MelodyIndex, compact_hash, is_plagiarism, pack_song, poly_hash, scan_plagiarism)
+
+
+def random_keys(count: int, seed: int = 331, length: int = 12):
+    """
+    Distinct non-empty random keys, the same for the same count and seed
+    (the empty key has a probe step of 0 and only ever probes its home slot)
+    """
+    rng = random.Random(seed)
+    keys = set()
+    while len(keys) < count:
+        keys.add("".join(rng.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=rng.randint(1, length))))
+    return sorted(keys)
+
+
+def live_nodes(table: HashTable):
+    """
+    The nodes of the keys stored in a table
+    """
+    return [node for node in table.table if node is not None and not node.deleted]
+
+
+def similar_melodies(my_song, their_song):
+    """
+    The similar melody count is_plagiarism compares, computed directly
+    """
+    def counts(song):
+        return Counter(tuple(note - melody[0] for note in melody) for melody in song)
+
+    mine, theirs = counts(my_song), counts(their_song)
+    return sum(min(count, theirs[melody]) for melody, count in mine.items())
+
+
+def random_song(rng, melodies=20, notes=3, pitches=5):
+    """
+    A song of random melodies, few pitches so songs share melodies
+    """
+    return [[rng.randint(0, pitches) for _ in range(notes)] for _ in range(melodies)]
+
+
+class HashTableTests(unittest.TestCase):
+
+    def test_hash_cache(self):
+        # the empty key, a trailing NUL (which the U dtype of hash_many drops) and characters beyond Latin-1
+        keys = random_keys(200) + ["", "a\0", "\0", "\0\0b", "ключ", "键值", "\U0001f3b5"]
+        for capacity in (8, 13, 64, 1024):
+            table = HashTable(capacity=capacity)
+            buckets, steps = table.hash_many(keys)
+            self.assertEqual(buckets, [table._hash_1(key) for key in keys])
+            self.assertEqual(steps, [table._hash_2(key) for key in keys])
+
+        table = HashTable()
+        for i, key in enumerate(keys[:200]):
+            table[key] = i
+            node = table._get(key)
+            self.assertEqual(node.hash_value, poly_hash(key))
+        # nodes keep their cached hash through every rehash
+        self.assertGreater(table.capacity, 8)
+        for node in live_nodes(table):
+            self.assertEqual(node.hash_value, poly_hash(node.key))
+            self.assertEqual(table[node.key], node.value)
+
+    def test_bulk_update(self):
+        keys = random_keys(500)
+        pairs = [(key, i) for i, key in enumerate(keys)]
+        # later pairs overwrite earlier ones like with update
+        pairs += [(key, -i) for i, key in enumerate(keys[::7])]
+
+        looped = HashTable()
+        looped.update(pairs)
+        bulk = HashTable.from_pairs(pairs)
+        self.assertEqual(len(bulk), len(looped))
+        self.assertEqual(sorted(bulk.iter_items()), sorted(looped.iter_items()))
+        self.assertLess(len(bulk) / bulk.capacity, 0.5)
+
+        # bulk loaded nodes cache their hash like every other node
+        for node in live_nodes(bulk):
+            self.assertEqual(node.hash_value, poly_hash(node.key))
+
+        self.assertEqual(bulk.get_many(keys), [looped[key] for key in keys])
+        self.assertEqual(bulk.get_many(["missing", keys[0]], default=None), [None, looped[keys[0]]])
+        with self.assertRaises(KeyError):
+            bulk.get_many(["missing"])
+
+    def test_compaction(self):
+        for threshold in (-0.1, 0.5, 0.9):
+            with self.assertRaises(ValueError):
+                HashTable(compact_threshold=threshold)
+            with self.assertRaises(ValueError):
+                CompactHashTable(compact_threshold=threshold)
+
+        # churn at the highest allowed threshold, every probe must still find an empty slot
+        rng = random.Random(331)
+        keys = random_keys(64)
+        for table_type in (HashTable, CompactHashTable):
+            table, model = table_type(compact_threshold=0.49), {}
+            for step in range(5000):
+                key = rng.choice(keys)
+                if key in model and rng.random() < 0.5:
+                    del table[key]
+                    del model[key]
+                else:
+                    table[key] = model[key] = step
+                self.assertLessEqual(table.tombstones, 0.49 * table.capacity)
+            self.assertEqual(sorted(table.iter_items()), sorted(model.items()))
+            for key in keys:
+                self.assertEqual(key in table, key in model)
+
+        # deleting most keys shrinks the table back down
+        table = HashTable()
+        table.update((key, 0) for key in keys)
+        grown = table.capacity
+        for key in keys[:-2]:
+            del table[key]
+        self.assertLess(table.capacity, grown)
+        self.assertEqual(sorted(table), keys[-2:])
+
+    def test_views(self):
+        for table_type in (HashTable, CompactHashTable):
+            table = table_type()
+            table.update([("a", 1), ("b", 2), ("c", 3)])
+            keys, values, items = table.keys(), table.values(), table.items()
+
+            # the views compare equal to the lists these methods used to return, in slot order
+            slots = list(table.iter_items())
+            self.assertEqual(keys, [key for key, _ in slots])
+            self.assertEqual([value for _, value in slots], values)
+            self.assertEqual(items, slots)
+            self.assertNotEqual(keys, ["a", "b"])
+            self.assertNotEqual(keys, set(keys))
+            self.assertEqual(len(keys), 3)
+
+            self.assertIn("a", keys)
+            self.assertIn(2, values)
+            self.assertIn(("c", 3), items)
+            self.assertNotIn(("c", 4), items)
+            for item in (1, "c", ("c",), ("c", 3, 0), ["c", 3]):
+                self.assertNotIn(item, items)
+
+            # the views are live
+            table["d"] = 4
+            del table["a"]
+            self.assertEqual(sorted(keys), ["b", "c", "d"])
+            self.assertEqual(len(items), 3)
+            self.assertNotIn("a", keys)
+
+    def test_probing(self):
+        self.assertEqual(HashTable(capacity=10, probing="quadratic").capacity, 16)
+        self.assertEqual(HashTable(capacity=10).capacity, 10)
+
+        rng = random.Random(331)
+        keys = random_keys(300)
+        for probing in PROBING_STRATEGIES:
+            # double hashing steps are odd, so only power-of-two capacities are sure to reach every slot
+            for capacity in ((8, 64) if probing == "double" else (8, 10, 13)):
+                table, model, operations = HashTable(capacity=capacity, probing=probing), {}, 0
+                for step in range(3000):
+                    key = rng.choice(keys)
+                    if key in model and rng.random() < 0.45:
+                        del table[key]
+                        del model[key]
+                        operations += 1
+                    else:
+                        table[key] = model[key] = step
+                        operations += 1
+                    if rng.random() < 0.2:
+                        self.assertEqual(key in table, key in model)
+                        operations += 1
+                self.assertEqual(sorted(table.iter_items()), sorted(model.items()))
+                # every user operation is one probe, the moves of the rehashes are not counted
+                self.assertEqual(table.lookups, operations)
+                self.assertEqual(sum(table.probe_histogram), operations)
+                self.assertEqual(table.probes, sum(length * count for length, count
+                                                   in enumerate(table.probe_histogram)))
+
+    def test_snapshot(self):
+        keys = random_keys(300)
+        for probing in PROBING_STRATEGIES:
+            table = HashTable(probing=probing)
+            table.update((key, {"index": i}) for i, key in enumerate(keys))
+            for key in keys[::3]:
+                del table[key]
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "table.bin")
+                table.save(path)
+
+                copy = HashTable.load(path, mmap=False)
+                self.assertEqual(copy, table)
+                for node in live_nodes(copy):
+                    self.assertEqual(node.hash_value, poly_hash(node.key))
+                copy["new"] = 1
+                del copy[keys[1]]
+                self.assertNotIn(keys[1], copy)
+
+                with HashTable.load(path) as mapped:
+                    self.assertEqual(mapped, table)
+                    for key in keys:
+                        self.assertEqual(mapped.get(key), table.get(key))
+                    with self.assertRaises(TypeError):
+                        mapped["new"] = 1
+                    with self.assertRaises(TypeError):
+                        del mapped[keys[1]]
+
+                    # a lookup decodes each slot it probes once
+                    decoded, slots = [], mapped.table
+                    mapped.table = CountingSlots(slots, decoded)
+                    probes = mapped.probes
+                    for key in keys:
+                        mapped.get(key)
+                    self.assertEqual(len(decoded), mapped.probes - probes)
+                    mapped.table = slots
+                with self.assertRaises(ValueError):
+                    mapped.get(keys[1])
+
+                with open(path, "wb") as file:
+                    file.write(b"not a snapshot")
+                with self.assertRaises(ValueError):
+                    HashTable.load(path)
+
+
+class CompactHashTableTests(unittest.TestCase):
+
+    def test_model(self):
+        rng = random.Random(331)
+        keys = random_keys(200)
+        table, model = CompactHashTable(), {}
+        for step in range(6000):
+            key = rng.choice(keys)
+            roll = rng.random()
+            if roll < 0.35 and key in model:
+                del table[key]
+                del model[key]
+            elif roll < 0.8:
+                table[key] = model[key] = step
+            else:
+                self.assertEqual(table.get(key), model.get(key))
+            self.assertEqual(len(table), len(model))
+        self.assertEqual(dict(table.iter_items()), model)
+        self.assertEqual(sorted(table), sorted(model))
+        with self.assertRaises(KeyError):
+            table["missing"]
+        with self.assertRaises(KeyError):
+            del table["missing"]
+
+        # a CompactHashTable holds the same pairs as a HashTable given the same updates
+        other = HashTable()
+        other.update(model.items())
+        self.assertEqual(sorted(other.iter_items()), sorted(table.iter_items()))
+        copy = CompactHashTable()
+        copy.update(reversed(list(model.items())))
+        self.assertEqual(copy, table)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertNotIn(keys[0], table)
+
+    def test_compact_hash(self):
+        for key in random_keys(100) + ["", "ключ"]:
+            self.assertEqual(compact_hash(key), poly_hash(key) % COMPACT_MODULUS)
+            self.assertLess(compact_hash(key), 2 ** 63)
+
+
+class CountingSlots:
+    """
+    Slot array recording every slot read from the slots it wraps
+    """
+
+    def __init__(self, slots, reads):
+        self.slots, self.reads = slots, reads
+
+    def __getitem__(self, index):
+        self.reads.append(index)
+        return self.slots[index]
+
+
+class ConcurrentHashTableTests(unittest.TestCase):
+
+    def test_sequential(self):
+        rng = random.Random(331)
+        keys = random_keys(400)
+        table, model = ConcurrentHashTable(stripes=4), {}
+        for step in range(6000):
+            key = rng.choice(keys)
+            if key in model and rng.random() < 0.4:
+                del table[key]
+                del model[key]
+            else:
+                table[key] = model[key] = step
+        self.assertEqual(len(table), len(model))
+        self.assertEqual(dict(table.items()), model)
+        for key in keys:
+            self.assertEqual(table.get(key), model.get(key))
+        with self.assertRaises(KeyError):
+            del table["missing"]
+
+    def test_snapshots(self):
+        table = ConcurrentHashTable(stripes=1)
+        table["a"] = 1
+        snapshot = table.snapshots[0]
+        # writes that do not resize store into the published snapshot
+        table["a"] = 2
+        table["b"] = 3
+        del table["b"]
+        self.assertIs(table.snapshots[0], snapshot)
+        self.assertEqual(snapshot.find("a", poly_hash("a"))[1], ("a", 2))
+
+        # a resize publishes a new snapshot, later writes leave the old one as readers last saw it
+        keys = [key for key in random_keys(200) if key != "a"]
+        for count, key in enumerate(keys):
+            table[key] = key
+            if table.snapshots[0] is not snapshot:
+                break
+        slots = list(snapshot.slots)
+        for key in keys[count + 1:]:
+            table[key] = key
+        del table[keys[0]]
+        table[keys[0]] = keys[0]
+        self.assertEqual(snapshot.slots, slots)
+        self.assertEqual(dict(table.items()), {"a": 2, **{key: key for key in keys}})
+
+        # deleting most keys shrinks the stripe back down, as HashTable does
+        grown = table.snapshots[0].capacity
+        for key in keys:
+            del table[key]
+        self.assertLessEqual(table.snapshots[0].capacity, grown // 8)
+        self.assertEqual(dict(table.items()), {"a": 2})
+
+    def test_write_cost(self):
+        """
+        Writes store into the stripe in place, so the cost per insert stays flat as the table grows,
+        where copying the stripe on every write made it grow with the stripe's capacity.
+        """
+        def seconds_per_insert(count):
+            keys = random_keys(count, seed=count)
+            best = float("inf")
+            for _ in range(3):
+                table = ConcurrentHashTable(stripes=4)
+                start = time.perf_counter()
+                for key in keys:
+                    table[key] = key
+                best = min(best, time.perf_counter() - start)
+            self.assertEqual(len(table), count)
+            return best / count
+
+        small, large = seconds_per_insert(2000), seconds_per_insert(32000)
+        self.assertLess(large / small, 3)
+
+    def test_stress(self):
+        """
+        Each thread is the only writer of its own keys and writes them with increasing versions, so
+        - reading an own key must return exactly the last value the thread wrote or deleted
+        - reading another thread's key must never return a lower version than seen before
+        - once all threads are done the table must hold the last write of every key, which is what
+          the same operations applied to a dict one thread after the other leave
+        Few stripes and a short switch interval make the threads contend for locks and resizes.
+        """
+        threads, keys_per_thread, operations = 8, 100, 4000
+        table = ConcurrentHashTable(stripes=2)
+        errors, models = [], [None] * threads
+
+        def work(thread_id):
+            rng = random.Random(331 + thread_id)
+            own = [f"{thread_id}:{i}" for i in range(keys_per_thread)]
+            model, versions, observed = {}, {}, {}
+            for _ in range(operations):
+                roll = rng.random()
+                key = rng.choice(own)
+                if roll < 0.4:
+                    versions[key] = versions.get(key, 0) + 1
+                    table[key] = model[key] = versions[key]
+                elif roll < 0.5:
+                    if key in model:
+                        del table[key]
+                        del model[key]
+                elif roll < 0.75:
+                    if table.get(key) != model.get(key):
+                        errors.append(f"thread {thread_id} read {table.get(key)} for {key}, wrote {model.get(key)}")
+                else:
+                    key = f"{rng.randrange(threads)}:{rng.randrange(keys_per_thread)}"
+                    seen = table.get(key)
+                    if seen is not None:
+                        if seen < observed.get(key, 0):
+                            errors.append(f"thread {thread_id} saw {key} go back from {observed[key]} to {seen}")
+                        observed[key] = seen
+            models[thread_id] = model
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            workers = [threading.Thread(target=work, args=(thread_id,)) for thread_id in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        final = {key: value for model in models for key, value in model.items()}
+        self.assertEqual(len(table), len(final))
+        self.assertEqual(dict(table.items()), final)
+        for key in final:
+            self.assertEqual(table[key], final[key])
+
+
+class PlagiarismTests(unittest.TestCase):
+
+    def test_scan_plagiarism(self):
+        rng = random.Random(331)
+        songs = [[[rng.randint(0, 12) for _ in range(4)] for _ in range(30)] for _ in range(12)]
+        pairs = [(songs[i], songs[j]) for i in range(len(songs)) for j in range(len(songs))]
+        expected = [is_plagiarism(mine, theirs, 3) for mine, theirs in pairs]
+        self.assertEqual(scan_plagiarism(pairs, 3, workers=1, chunk_size=7), expected)
+        self.assertEqual(scan_plagiarism(pairs, 3, workers=2, chunk_size=50), expected)
+
+    def test_melody_index(self):
+        rng = random.Random(331)
+        catalog = {f"song{i}": random_song(rng) for i in range(30)}
+        index = MelodyIndex(catalog.items())
+        self.assertEqual(len(index), 30)
+        self.assertIn("song3", index)
+
+        for _ in range(10):
+            song = random_song(rng)
+            # transposing every melody does not change which melodies are similar
+            shifted = [[note + 12 for note in melody] for melody in song]
+            expected = {song_id: similar_melodies(song, other) for song_id, other in catalog.items()}
+            scores = index.similarities(shifted)
+            self.assertEqual(scores, {song_id: count for song_id, count in expected.items() if count})
+            for song_id, other in catalog.items():
+                for max_similarity in (0, 2, 5):
+                    self.assertEqual(index.is_plagiarism(song, song_id, max_similarity),
+                                     is_plagiarism(song, other, max_similarity))
+            top = index.most_similar(song, k=5)
+            self.assertEqual([count for _, count in top], sorted(filter(None, expected.values()), reverse=True)[:5])
+            for song_id, count in top:
+                self.assertEqual(expected[song_id], count)
+
+        # replacing and removing songs keep the postings in step with the songs
+        index.add_song("song0", catalog["song1"])
+        self.assertEqual(len(index), 30)
+        self.assertEqual(index.similarities(catalog["song1"])["song0"], len(catalog["song1"]))
+        for song_id in list(catalog):
+            index.remove_song(song_id)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.postings, {})
+        with self.assertRaises(KeyError):
+            index.remove_song("song0")
+        with self.assertRaises(KeyError):
+            index.is_plagiarism(catalog["song1"], "song0", 0)
+
+        # melodies are compared exactly, these two shared a rolling hash
+        index = MelodyIndex([("song0", [[0, 0, 1000003]])])
+        self.assertEqual(index.similarities([[0, 1, 0]]), {})
+        self.assertFalse(index.is_plagiarism([[0, 1, 0]], "song0", 0))
+        self.assertEqual(index.similarities([[7, 7, 1000010]]), {"song0": 1})
+
+    def test_scan_plagiarism_generator(self):
+        rng = random.Random(331)
+        pairs = [(random_song(rng), random_song(rng)) for _ in range(40)]
+        expected = [is_plagiarism(mine, theirs, 2) for mine, theirs in pairs]
+        self.assertTrue(any(expected) and not all(expected))
+        # songs built on the fly are freed as soon as the next pair is made, unless the scan keeps them
+        fresh = (([melody[:] for melody in mine], [melody[:] for melody in theirs]) for mine, theirs in pairs)
+        self.assertEqual(scan_plagiarism(fresh, 2, workers=1), expected)
+
+    def test_pack_song_range(self):
+        notes, offsets = pack_song([[5, 7, 3], [2 ** 62, 2 ** 62 + 1]])
+        self.assertEqual(list(notes), [0, 2, -2, 0, 1])
+        self.assertEqual(list(offsets), [0, 3, 5])
+        for song in ([[0, 2 ** 63]], [[1, 2], [-2 ** 63, 1]]):
+            with self.assertRaises(ValueError):
+                pack_song(song)
+            with self.assertRaises(ValueError):
+                scan_plagiarism([(song, song)], 0, workers=2)
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_main(self):
+        ran = []
+        stubs = {name: (lambda name=name: ran.append(name)) for name in benchmark.BENCHMARKS}
+        with mock.patch.dict(benchmark.BENCHMARKS, stubs), contextlib.redirect_stdout(io.StringIO()):
+            # no names runs every benchmark, in order
+            self.assertEqual(benchmark.main([]), 0)
+            self.assertEqual(ran, list(benchmark.BENCHMARKS))
+            ran.clear()
+            self.assertEqual(benchmark.main(["probing", "memory"]), 0)
+            self.assertEqual(ran, ["probing", "memory"])
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            benchmark.main(["missing"])
+
+
+if __name__ == '__main__':
+    unittest.main()
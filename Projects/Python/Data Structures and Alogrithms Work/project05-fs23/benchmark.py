@@ -0,0 +1,562 @@
+"""
+Project 5: Deque
+CSE 331 FS23
+benchmark.py
+
+Headless, reproducible version of plot_speed. Times the grow, grow/shrink, random operations and sliding window
+workloads on CircularDeque, CDLLCD and collections.deque and saves the timings as JSON; plotting is a separate step
+that only reads saved results, so runs work without a display and can be compared between commits:
+
+    python benchmark.py run --output results.json
+    python benchmark.py plot results.json --output-dir imgs
+    python benchmark.py compare before.json after.json --tolerance 0.25 --min-seconds 0.001
+    python benchmark.py node-pool --size 20000
+    python benchmark.py bulk-ops --sizes 1000 10000
+    python benchmark.py capacity-policies --size 1024
+    python benchmark.py typed-deque --length 100000
+
+compare exits with status 1 if any median got slower by more than the tolerance and the floor.
+"""
+
+import argparse
+import collections
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+from itertools import groupby
+from timeit import default_timer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from solution import POINTER_SIZE, CDLLCD, CapacityPolicy, CircularDeque, NodePool, max_len_subarray
+
+
+class DequeAdapter:
+    """
+    collections.deque behind the enqueue/dequeue interface of CircularDeque and CDLLCD
+    """
+
+    __slots__ = ['deque']
+
+    def __init__(self) -> None:
+        """
+        Creates an empty deque
+        """
+        self.deque = collections.deque()
+
+    def enqueue(self, value: Any, front: bool = True) -> None:
+        """
+        Adds value to the front or the back
+        """
+        if front:
+            self.deque.appendleft(value)
+        else:
+            self.deque.append(value)
+
+    def dequeue(self, front: bool = True) -> Any:
+        """
+        Removes and returns the front or back value, None if empty like the project's deques
+        """
+        if not self.deque:
+            return None
+        return self.deque.popleft() if front else self.deque.pop()
+
+
+STRUCTURES: Dict[str, Callable[[], Any]] = {
+    "CircularDeque": CircularDeque,
+    "CDLLCD": CDLLCD,
+    "collections.deque": DequeAdapter,
+    # Variants from the typed mode and node pool, not run unless asked for
+    "CircularDeque[q]": lambda: CircularDeque(typecode='q'),
+    "CDLLCD+pool": lambda: CDLLCD(NodePool()),
+}
+DEFAULT_STRUCTURES = ("CircularDeque", "CDLLCD", "collections.deque")
+WORKLOADS = ("grow", "grow/shrink", "random", "sliding window")
+SIZES = tuple(100 * i for i in range(0, 200, 20))
+WINDOW_LENGTHS = tuple(range(0, 200, 20))
+
+
+def make_operations(workload: str, size: int, rng: random.Random) -> List[Tuple[bool, bool, int]]:
+    """
+    Generates the operations plot_speed performs for a workload, from a seeded generator
+    :param workload: grow, grow/shrink or random
+    :param size: number of items
+    :param rng: random generator
+    :return: (enqueue?, front?, item) for every operation
+    """
+    data = list(range(size))
+    rng.shuffle(data)
+    grow = [(True, bool(item % 2), item) for item in data]
+    if workload == "grow":
+        return grow
+    if workload == "grow/shrink":
+        return grow + [(False, not item % 2, item) for item in data]
+    if workload == "random":
+        return [(rng.randint(0, 3) <= 2, bool(item % 2), item) for item in data]
+    raise ValueError(f"unknown workload {workload!r}")
+
+
+def run_operations(operations: List[Tuple[bool, bool, int]], structure: Any) -> None:
+    """
+    Applies operations to a deque
+    :param operations: (enqueue?, front?, item) tuples
+    :param structure: any deque with enqueue and dequeue
+    """
+    for enqueue, front, item in operations:
+        if enqueue:
+            structure.enqueue(item, front)
+        else:
+            structure.dequeue(front)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile, so the result is always one of the measured values
+    :param values: measurements
+    :param fraction: e.g. 0.95 for the 95th percentile
+    :return: the percentile
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def run_benchmarks(workloads: Tuple[str, ...] = WORKLOADS, structures: Tuple[str, ...] = DEFAULT_STRUCTURES,
+                   sizes: Tuple[int, ...] = SIZES, window_lengths: Tuple[int, ...] = WINDOW_LENGTHS,
+                   window_data: int = 5000, repeat: int = 7, warmup: int = 1, seed: int = 331) -> Dict[str, Any]:
+    """
+    Times every structure on every workload and size
+    Each measurement runs the same pre-generated operations warmup times untimed, then repeat times timed, each on a
+    fresh structure after a garbage collection, so only the deque operations are measured
+    :param workloads: names in WORKLOADS
+    :param structures: names in STRUCTURES
+    :param sizes: item counts for grow, grow/shrink and random
+    :param window_lengths: bounds passed to max_len_subarray for the sliding window
+    :param window_data: length of the 0/1 data the sliding window runs over
+    :param repeat: timed runs per measurement
+    :param warmup: untimed runs before them
+    :param seed: seed of every random choice, so reruns perform identical operations
+    :return: the machine, the settings and one result per workload, structure and size
+    """
+    results = []
+    for workload in workloads:
+        rng = random.Random(f"{seed}-{workload}")
+        if workload == "sliding window":
+            data = [rng.randint(0, 1) for _ in range(window_data)]
+            cases = [(length, lambda structure, bound=length: max_len_subarray(data, bound, structure))
+                     for length in window_lengths]
+        else:
+            cases = [(size, lambda structure, operations=make_operations(workload, size, rng):
+                      run_operations(operations, structure)) for size in sizes]
+        for size, case in cases:
+            for name in structures:
+                factory = STRUCTURES[name]
+                for _ in range(warmup):
+                    case(factory())
+                times = []
+                for _ in range(repeat):
+                    structure = factory()
+                    gc.collect()
+                    start = default_timer()
+                    case(structure)
+                    times.append(default_timer() - start)
+                results.append({"workload": workload, "structure": name, "size": size, "times": times,
+                                "median": statistics.median(times), "p95": percentile(times, 0.95)})
+                print(f"{workload:>15} {name:>18} {size:>6} median {results[-1]['median']:.6f}s "
+                      f"p95 {results[-1]['p95']:.6f}s", flush=True)
+    return {
+        "machine": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                    "platform": platform.platform(), "processor": platform.processor()},
+        "seed": seed,
+        "repeat": repeat,
+        "warmup": warmup,
+        "window_data": window_data,
+        "results": results,
+    }
+
+
+def plot_results(path: str, output_dir: Optional[str] = None) -> None:
+    """
+    Plots saved results like plot_speed did, one figure per workload with the median and a band up to p95
+    matplotlib is only needed here
+    :param path: JSON file written by run_benchmarks
+    :param output_dir: directory to save PNGs in, shows the figures instead if None
+    """
+    import os
+    from matplotlib import pyplot as plt
+
+    with open(path) as source:
+        results = json.load(source)["results"]
+    titles = {"grow": "Enqueue and Grow", "grow/shrink": "Enqueue, Grow, Dequeue, Shrink",
+              "random": "Operations in Random Order", "sliding window": "Sliding Window Application"}
+    for workload in dict.fromkeys(result["workload"] for result in results):
+        figure = plt.figure()
+        for name in dict.fromkeys(result["structure"] for result in results):
+            series = sorted((result["size"], result["median"], result["p95"]) for result in results
+                            if result["workload"] == workload and result["structure"] == name)
+            if not series:
+                continue
+            sizes, medians, p95s = zip(*series)
+            line, = plt.plot(sizes, medians, label=name)
+            plt.fill_between(sizes, medians, p95s, color=line.get_color(), alpha=0.2)
+        plt.title(titles.get(workload, workload))
+        plt.xlabel("window length" if workload == "sliding window" else "items")
+        plt.ylabel("seconds")
+        plt.legend(loc='best')
+        if output_dir is None:
+            plt.show()
+        else:
+            figure.savefig(os.path.join(output_dir, workload.replace("/", "_").replace(" ", "_") + ".png"))
+        plt.close(figure)
+
+
+class CountingNodePool(NodePool):
+    """
+    NodePool that counts the calls made to it, for an untimed run that finds the node operations a workload makes
+    """
+
+    __slots__ = ['acquires', 'releases']
+
+    def __init__(self, max_size: int = 4096) -> None:
+        """
+        Creates an empty node pool with zeroed call counts
+        :param max_size: most nodes kept for reuse
+        """
+        super().__init__(max_size)
+        self.acquires = 0
+        self.releases = 0
+
+    def acquire(self, val: Any) -> Any:
+        """
+        Counts the call and returns a node holding val, see NodePool.acquire
+        """
+        self.acquires += 1
+        return super().acquire(val)
+
+    def release(self, node: Any) -> None:
+        """
+        Counts the call and takes back node, see NodePool.release
+        """
+        self.releases += 1
+        super().release(node)
+
+
+def bench_node_pool(size: int = 20000, trials: int = 3, seed: int = 331) -> List[Dict[str, Any]]:
+    """
+    Runs the four workloads on CDLLCDs without a node pool, with one, and with one prewarmed to size nodes
+    The node operations of a workload are the acquire and release calls a CountingNodePool receives in an untimed run
+    of the same operations; the timed runs use a plain NodePool, so counting does not slow them down
+    :param size: items per workload, also the sliding window data length and the prewarm count
+    :param trials: runs averaged per workload and pool
+    :param seed: seed of every random choice
+    :return: per workload and pool the seconds, node operations per second, the calls counted, and the nodes the
+             pool allocated and reused (allocations avoided), None without a pool
+    """
+    results = []
+    print(f"{'workload':>15} {'pool':>10} {'node ops/s':>11} {'acquires':>9} {'releases':>9} {'allocated':>10} "
+          f"{'avoided':>8} {'speedup':>8}")
+    for workload in WORKLOADS:
+        rng = random.Random(f"{seed}-{workload}")
+        if workload == "sliding window":
+            data = [rng.randint(0, 1) for _ in range(size)]
+
+            def case(structure):
+                max_len_subarray(data, 100, structure)
+        else:
+            operations = make_operations(workload, size, rng)
+
+            def case(structure):
+                run_operations(operations, structure)
+
+        counter = CountingNodePool(max_size=size)
+        case(CDLLCD(counter))
+        node_operations = counter.acquires + counter.releases
+
+        baseline = None
+        for mode in ("none", "pool", "prewarmed"):
+            elapsed, pool = 0, None
+            for _ in range(trials):
+                pool = None if mode == "none" else NodePool(max_size=size)
+                if mode == "prewarmed":
+                    pool.prewarm(size)
+                structure = CDLLCD(pool)
+                gc.collect()
+                start = default_timer()
+                case(structure)
+                elapsed += (default_timer() - start) / trials
+            baseline = baseline or elapsed
+            results.append({"workload": workload, "pool": mode, "seconds": elapsed,
+                            "acquires": counter.acquires, "releases": counter.releases,
+                            "allocated": pool.allocated if pool is not None else None,
+                            "reused": pool.reused if pool is not None else None})
+            print(f"{workload:>15} {mode:>10} {node_operations / elapsed:>11.0f} {counter.acquires:>9} "
+                  f"{counter.releases:>9} {'-' if pool is None else pool.allocated:>10} "
+                  f"{'-' if pool is None else pool.reused:>8} {baseline / elapsed:>7.2f}x", flush=True)
+    return results
+
+
+def bench_bulk_ops(sizes: List[int] = (1000, 10000, 100000), trials: int = 3) -> None:
+    """
+    Measures CircularDeque throughput in operations per second on the plot_speed scenarios,
+    calling enqueue/dequeue once per item against extend/dequeue_many once per run of operations on the same side
+    :param sizes: number of items per scenario
+    :param trials: runs averaged per scenario and size
+    """
+    print(f"{'scenario':>19} {'size':>8} {'single ops/s':>13} {'bulk ops/s':>12} {'calls':>8} {'speedup':>8}")
+    for size in sizes:
+        data = list(range(size))
+        random.shuffle(data)
+        # (enqueue?, front?, item) in the order plot_speed performs them
+        grow = [(True, bool(item % 2), item) for item in data]
+        scenarios = {
+            "grow": grow,
+            "grow/shrink": grow + [(False, not item % 2, None) for item in data],
+            "random": [(random.randint(0, 3) <= 2, bool(item % 2), item) for item in data],
+        }
+        # plot_speed picks a side per item, so its runs are short; the same scenarios on one side give long runs
+        for name in list(scenarios):
+            scenarios[f"{name} 1-side"] = [(enqueue, enqueue, item) for enqueue, _, item in scenarios[name]]
+        for name, ops in scenarios.items():
+            batches = [(enqueue, front, [item for _, _, item in run])
+                       for (enqueue, front), run in groupby(ops, key=lambda op: op[:2])]
+            single = bulk = 0
+            for trial in range(trials):
+                gc.collect()
+                one_by_one = CircularDeque()
+                start = default_timer()
+                for enqueue, front, item in ops:
+                    if enqueue:
+                        one_by_one.enqueue(item, front)
+                    else:
+                        one_by_one.dequeue(front)
+                single += (default_timer() - start) / trials
+
+                gc.collect()
+                batched = CircularDeque()
+                start = default_timer()
+                for enqueue, front, items in batches:
+                    if enqueue:
+                        batched.extend(items, front)
+                    else:
+                        batched.dequeue_many(len(items), front)
+                bulk += (default_timer() - start) / trials
+                assert batched.queue == one_by_one.queue and batched.front == one_by_one.front
+            print(f"{name:>19} {size:>8} {len(ops) / single:>13.0f} {len(ops) / bulk:>12.0f} {len(batches):>8} "
+                  f"{single / bulk:>7.2f}x")
+
+
+def bench_capacity_policies(size: int = 1024, cycles: int = 500) -> None:
+    """
+    Runs oscillating workloads on CircularDeques under several capacity policies, reporting resizes,
+    bytes copied by them and time
+    :param size: a power of two; the boundary workload swings between size // 2 and size items
+    :param cycles: swings per workload
+    """
+    policies = {
+        "default": CapacityPolicy(),
+        "shrink at 1/8": CapacityPolicy(shrink_threshold=0.125),
+        "high water": CapacityPolicy(keep_high_water=True),
+        "growth 1.5": CapacityPolicy(growth_factor=1.5),
+        f"min {size}": CapacityPolicy(min_capacity=size),
+    }
+
+    def boundary(deque):
+        # Filling to size doubles the buffer; draining to size // 2 halves it again
+        deque.extend(range(size), False)
+        for _ in range(cycles):
+            for _ in range(size // 2):
+                deque.dequeue()
+            for item in range(size // 2):
+                deque.enqueue(item, False)
+
+    def small_swing(deque):
+        for item in range(size * 3 // 8):
+            deque.enqueue(item, False)
+        for _ in range(cycles):
+            for item in range(size // 8 + 1):
+                deque.enqueue(item, False)
+            for _ in range(size // 8 + 1):
+                deque.dequeue()
+
+    window_data = [random.randint(0, 1) for _ in range(cycles * 20)]
+    workloads = {
+        "boundary": boundary,
+        "small swing": small_swing,
+        "sliding window": lambda deque: max_len_subarray(window_data, size // 4, deque),
+    }
+    print(f"{'workload':>15} {'policy':>14} {'resizes':>8} {'KB copied':>10} {'seconds':>8} {'capacity':>9}")
+    for workload_name, workload in workloads.items():
+        for policy_name, policy in policies.items():
+            gc.collect()
+            deque = CircularDeque(policy=policy)
+            start = default_timer()
+            workload(deque)
+            elapsed = default_timer() - start
+            print(f"{workload_name:>15} {policy_name:>14} {deque.resizes:>8} {deque.bytes_copied / 1024:>10.1f} "
+                  f"{elapsed:>8.4f} {deque.capacity:>9}")
+
+
+def bench_typed_deque(length: int = 100000, bounds: List[int] = (10, 100, 1000), trials: int = 3) -> None:
+    """
+    Compares the list-backed CircularDeque with typed ones running max_len_subarray, and the window statistics
+    of a full deque, reporting seconds and bytes per stored element
+    :param length: number of values in the data, ints for typecode 'q' and floats for 'd'
+    :param bounds: bound values passed to max_len_subarray
+    :param trials: runs averaged per measurement
+    """
+    def element_bytes(deque):
+        # Typed slots hold the value itself; list slots hold a pointer to a separate object
+        if deque.typecode is not None:
+            return deque.queue.itemsize
+        values = deque._segment(0, deque.size)
+        return POINTER_SIZE + sum(map(sys.getsizeof, values)) / len(values)
+
+    datasets = {"q": [random.randint(0, 1) for _ in range(length)],
+                "d": [random.randint(0, 100) / 100 for _ in range(length)]}
+    print(f"{'data':>5} {'bound':>6} {'list s':>9} {'typed s':>9} {'list B/elem':>12} {'typed B/elem':>13}")
+    for typecode, data in datasets.items():
+        for bound in bounds:
+            times = {}
+            for mode in (None, typecode):
+                times[mode] = 0
+                for trial in range(trials):
+                    gc.collect()
+                    deque = CircularDeque(typecode=mode)
+                    start = default_timer()
+                    result = max_len_subarray(data, bound, deque)
+                    times[mode] += (default_timer() - start) / trials
+            boxed, typed = CircularDeque(typecode=None), CircularDeque(typecode=typecode)
+            boxed.extend(data, False)
+            typed.extend(data, False)
+            print(f"{typecode:>5} {bound:>6} {times[None]:>9.4f} {times[typecode]:>9.4f} "
+                  f"{element_bytes(boxed):>12.1f} {element_bytes(typed):>13}")
+
+    print(f"{'data':>5} {'statistic':>10} {'list s':>9} {'typed s':>9}")
+    for typecode, data in datasets.items():
+        boxed, typed = CircularDeque(typecode=None), CircularDeque(typecode=typecode)
+        for deque in (boxed, typed):
+            deque.extend(data[:length // 2], False)
+            deque.extend(data[length // 2:], True)
+        for name in ("window_sum", "window_min", "window_max"):
+            times = []
+            for deque in (boxed, typed):
+                start = default_timer()
+                for trial in range(trials):
+                    result = getattr(deque, name)()
+                times.append((default_timer() - start) / trials)
+            print(f"{typecode:>5} {name:>10} {times[0]:>9.5f} {times[1]:>9.5f}")
+
+
+def compare_results(before_path: str, after_path: str) -> List[Tuple[str, str, int, float, float]]:
+    """
+    Pairs the medians of two saved runs
+    :param before_path: JSON file of the earlier run
+    :param after_path: JSON file of the later run
+    :return: (workload, structure, size, before median, after median) for every measurement in both
+    """
+    with open(before_path) as source:
+        before = {(result["workload"], result["structure"], result["size"]): result["median"]
+                  for result in json.load(source)["results"]}
+    with open(after_path) as source:
+        after = json.load(source)["results"]
+    ratios = []
+    for result in after:
+        key = (result["workload"], result["structure"], result["size"])
+        if before.get(key):
+            ratios.append(key + (before[key], result["median"]))
+    return ratios
+
+
+def find_regressions(pairs: List[Tuple[str, str, int, float, float]], tolerance: float,
+                     min_seconds: float = 0.001) -> List[str]:
+    """
+    Lists the paired medians that got slower by more than tolerance and by more than min_seconds
+    Timings of tiny inputs are mostly timer noise, e.g. 0.00002s -> 0.00003s is 50% slower, hence the absolute floor
+    :param pairs: medians paired by compare_results
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+    :param min_seconds: smallest slowdown in seconds that is reported
+    :return: one message per regression
+    """
+    return [f"{workload} {structure} {size}: {before:.6f}s -> {after:.6f}s"
+            for workload, structure, size, before, after in pairs
+            if after > before * (1 + tolerance) and after - before > min_seconds]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point, returns the exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time the workloads and save JSON")
+    run.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    run.add_argument("--structures", nargs="+", choices=tuple(STRUCTURES), default=DEFAULT_STRUCTURES)
+    run.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    run.add_argument("--window-lengths", nargs="+", type=int, default=WINDOW_LENGTHS)
+    run.add_argument("--window-data", type=int, default=5000)
+    run.add_argument("--repeat", type=int, default=7)
+    run.add_argument("--warmup", type=int, default=1)
+    run.add_argument("--seed", type=int, default=331)
+    run.add_argument("--output", default="results.json")
+
+    plot = commands.add_parser("plot", help="plot saved results, needs matplotlib")
+    plot.add_argument("results")
+    plot.add_argument("--output-dir", help="save PNGs here instead of showing them")
+
+    compare = commands.add_parser("compare", help="print median ratios of two saved runs, exit 1 on a regression")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--tolerance", type=float, default=0.25)
+    compare.add_argument("--min-seconds", type=float, default=0.001,
+                         help="ignore slowdowns smaller than this many seconds")
+
+    node_pool = commands.add_parser("node-pool", help="time CDLLCD with and without a NodePool")
+    node_pool.add_argument("--size", type=int, default=20000)
+    node_pool.add_argument("--trials", type=int, default=3)
+    node_pool.add_argument("--seed", type=int, default=331)
+
+    bulk_ops = commands.add_parser("bulk-ops", help="time extend and dequeue_many against single operations")
+    bulk_ops.add_argument("--sizes", nargs="+", type=int, default=(1000, 10000, 100000))
+    bulk_ops.add_argument("--trials", type=int, default=3)
+
+    capacity = commands.add_parser("capacity-policies", help="count resizes of oscillating workloads per policy")
+    capacity.add_argument("--size", type=int, default=1024)
+    capacity.add_argument("--cycles", type=int, default=500)
+
+    typed = commands.add_parser("typed-deque", help="time typed against list-backed CircularDeques")
+    typed.add_argument("--length", type=int, default=100000)
+    typed.add_argument("--bounds", nargs="+", type=int, default=(10, 100, 1000))
+    typed.add_argument("--trials", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        report = run_benchmarks(tuple(args.workloads), tuple(args.structures), tuple(args.sizes),
+                                tuple(args.window_lengths), args.window_data, args.repeat, args.warmup, args.seed)
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    elif args.command == "plot":
+        plot_results(args.results, args.output_dir)
+    elif args.command == "node-pool":
+        bench_node_pool(args.size, args.trials, args.seed)
+    elif args.command == "bulk-ops":
+        bench_bulk_ops(tuple(args.sizes), args.trials)
+    elif args.command == "capacity-policies":
+        bench_capacity_policies(args.size, args.cycles)
+    elif args.command == "typed-deque":
+        bench_typed_deque(args.length, tuple(args.bounds), args.trials)
+    else:
+        pairs = compare_results(args.before, args.after)
+        for workload, structure, size, before, after in pairs:
+            print(f"{workload:>15} {structure:>18} {size:>6} {after / before:>6.2f}x")
+        regressions = find_regressions(pairs, args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
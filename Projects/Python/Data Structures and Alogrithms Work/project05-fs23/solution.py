@@ -5,45 +5,123 @@ Authored by Gabriel Sotelo
 starter.py
 """
 
-import gc
-from typing import TypeVar, List
-from random import randint, shuffle
-from timeit import default_timer
-# COMMENT OUT THIS LINE (and `plot_speed`) if you don't want matplotlib
-# from matplotlib import pyplot as plt
+import struct
+from array import array
+from typing import TypeVar, List, Iterable, Optional, Tuple
+# matplotlib is only imported by benchmark.plot_results, which `plot_speed` calls
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, typed CircularDeque statistics fall back to builtins
+    np = None
 
 T = TypeVar('T')
 CDLLNode = type('CDLLNode')
+POINTER_SIZE = struct.calcsize('P')  # bytes moved per element when a list buffer is copied
+NUMERIC_TYPECODES = 'bBhHiIlLqQfd'  # array typecodes a typed CircularDeque accepts
+
+
+class CapacityPolicy:
+    """
+    Decides when a CircularDeque resizes its buffer; the defaults are the original doubling and quarter-full halving
+    """
+
+    __slots__ = ['growth_factor', 'shrink_threshold', 'min_capacity', 'keep_high_water']
+
+    def __init__(self, growth_factor: float = 2, shrink_threshold: float = 0.25, min_capacity: int = 4,
+                 keep_high_water: bool = False):
+        """
+        Creates a capacity policy
+        :param growth_factor: a full buffer grows to capacity * growth_factor slots, must be more than 1
+        :param shrink_threshold: the buffer is halved once at most capacity * shrink_threshold slots are used,
+                                 must be below 0.5 so the halved buffer is never full
+        :param min_capacity: the buffer is never halved below this many slots
+        :param keep_high_water: if True, the buffer is never halved below what the largest size seen so far needs,
+                                so a workload that keeps coming back to the same size stops paying for resizes
+        """
+        if growth_factor <= 1:
+            raise ValueError("growth_factor must be more than 1")
+        if not 0 <= shrink_threshold < 0.5:
+            raise ValueError("shrink_threshold must be in [0, 0.5)")
+        if min_capacity < 1:
+            raise ValueError("min_capacity must be at least 1")
+        self.growth_factor = growth_factor
+        self.shrink_threshold = shrink_threshold
+        self.min_capacity = min_capacity
+        self.keep_high_water = keep_high_water
+
+    def __repr__(self) -> str:
+        """
+        :return: the policy's settings as a string
+        """
+        return (f"CapacityPolicy(growth_factor={self.growth_factor}, shrink_threshold={self.shrink_threshold}, "
+                f"min_capacity={self.min_capacity}, keep_high_water={self.keep_high_water})")
+
+    def grown(self, capacity: int) -> int:
+        """
+        :param capacity: current number of slots
+        :return: number of slots after growing, at least one more
+        """
+        return max(int(capacity * self.growth_factor), capacity + 1)
+
+    def shrink_size(self, capacity: int) -> int:
+        """
+        :param capacity: current number of slots
+        :return: the largest size at which a buffer of this capacity is halved
+        """
+        return int(capacity * self.shrink_threshold)
+
+    def can_shrink(self, capacity: int, high_water: int) -> bool:
+        """
+        :param capacity: current number of slots
+        :param high_water: largest size the deque has had
+        :return: True if halving the capacity is allowed
+        """
+        halved = capacity // 2
+        return halved >= self.min_capacity and not (self.keep_high_water and halved <= high_water)
+
 
 class CircularDeque:
     """
     Representation of a Circular Deque using an underlying python list
     """
 
-    __slots__ = ['capacity', 'size', 'queue', 'front', 'back']
+    __slots__ = ['capacity', 'size', 'queue', 'front', 'back', 'policy', 'resizes', 'bytes_copied', 'high_water',
+                 'typecode']
 
-    def __init__(self, data: List[T] = None, front: int = 0, capacity: int = 4):
+    def __init__(self, data: List[T] = None, front: int = 0, capacity: int = 4, policy: CapacityPolicy = None,
+                 typecode: Optional[str] = None):
         """
         Initializes an instance of a CircularDeque
         :param data: starting data to add to the deque, for testing purposes
         :param front: where to begin the insertions, for testing purposes
         :param capacity: number of slots in the Deque
+        :param policy: when to grow and shrink the buffer, defaults to CapacityPolicy()
+        :param typecode: an array typecode such as 'd' or 'q' to store unboxed numbers in an array.array,
+                         e.g. 8 bytes per float instead of a pointer plus a float object; defaults to a list of objects
         """
+        if typecode is not None and (len(typecode) != 1 or typecode not in NUMERIC_TYPECODES):
+            raise ValueError(f"typecode must be one of {NUMERIC_TYPECODES!r}")
+        self.typecode: Optional[str] = typecode
         if data is None and front != 0:
             # front will get set to 0 by front_enqueue if the initial data is empty
-            data = ['Start']
+            data = ['Start'] if typecode is None else [0]
         elif data is None:
             data = []
 
         self.capacity: int = capacity
         self.size: int = len(data)
-        self.queue: List[T] = [None] * capacity
+        self.queue: List[T] = self._new_buffer(capacity)
         self.back: int = None if not data else self.size + front - 1
         self.front: int = front if data else None
 
         for index, value in enumerate(data):
             self.queue[index + front] = value
 
+        self.policy: CapacityPolicy = policy if policy is not None else CapacityPolicy()
+        self.resizes: int = 0  # number of times the buffer was reallocated
+        self.bytes_copied: int = 0  # element references moved by those reallocations, in bytes
+        self.high_water: int = self.size  # largest size so far
+
     def __str__(self) -> str:
         """
         Provides a string representation of a CircularDeque
@@ -106,41 +184,79 @@ class CircularDeque:
             return None
         return self.queue[self.back]
 
-    def grow(self) -> None:
+    def _new_buffer(self, capacity: int) -> List[T]:
         """
-        Increases the capacity of the CircularQueue by doubling it.
-        Does not return anything
+        Creates an empty buffer: a list of None, or a zero-filled array in typed mode.
+        :param capacity: number of slots
+        :return: the buffer
         """
-        new_capacity = self.capacity * 2
-        new_queue = [None] * new_capacity
+        if self.typecode is None:
+            return [None] * capacity
+        return array(self.typecode, bytes(struct.calcsize(self.typecode) * capacity))
 
-        for i in range(self.size):
-            new_queue[i] = self.queue[(self.front + i) % self.capacity]
+    def _element_size(self) -> int:
+        """
+        :return: bytes moved per element when the buffer is copied
+        """
+        return POINTER_SIZE if self.typecode is None else self.queue.itemsize
+
+    def _copy_into(self, target: List[T], offset: int = 0) -> None:
+        """
+        Copies the elements, front to back, into target starting at offset,
+        using at most two slice assignments: up to the end of the buffer, then from its start.
+        :param target: list to copy into, with room for size elements after offset
+        :param offset: index in target of the front element
+        """
+        if not self.size:
+            return
+        first = min(self.size, self.capacity - self.front)
+        target[offset:offset + first] = self.queue[self.front:self.front + first]
+        if self.size > first:
+            target[offset + first:offset + self.size] = self.queue[:self.size - first]
+
+    def _segment(self, offset: int, count: int) -> List[T]:
+        """
+        Returns count elements starting offset places behind the front, read with at most two slices.
+        :param offset: position of the first element, 0 being the front
+        :param count: number of elements, at most size - offset
+        :return: the elements, front to back
+        """
+        start = (self.front + offset) % self.capacity
+        first = min(count, self.capacity - start)
+        return self.queue[start:start + first] + self.queue[:count - first]
+
+    def _resize(self, new_capacity: int) -> None:
+        """
+        Moves the elements to the start of a new buffer of new_capacity slots.
+        :param new_capacity: number of slots in the new buffer
+        """
+        new_queue = self._new_buffer(new_capacity)
+        self._copy_into(new_queue)
+        self.resizes += 1
+        self.bytes_copied += self.size * self._element_size()
 
         self.front = 0
         self.back = self.size - 1
         self.queue = new_queue
         self.capacity = new_capacity
 
+    def grow(self) -> None:
+        """
+        Increases the capacity of the CircularQueue by the policy's growth factor, doubling it by default.
+        Does not return anything
+        """
+        self._resize(self.policy.grown(self.capacity))
+
     def shrink(self) -> None:
         """
-        Decreases the capacity of the CircularQueue by half if possible.
+        Decreases the capacity of the CircularQueue by half if it stays at least the policy's minimum capacity.
         Returns nothing
         """
         new_capacity = self.capacity // 2
-        if new_capacity < 4:
+        if new_capacity < self.policy.min_capacity:
             return
 
-
-        new_queue = [None] * new_capacity
-
-        for i in range(self.size):
-            new_queue[i] = self.queue[(self.front + i) % self.capacity]
-
-        self.front = 0
-        self.back = self.size - 1
-        self.queue = new_queue
-        self.capacity = new_capacity
+        self._resize(new_capacity)
 
     def enqueue(self, value: T, front: bool = True) -> None:
         """
@@ -172,9 +288,83 @@ class CircularDeque:
 
 
         self.size += 1
+        if self.size > self.high_water:
+            self.high_water = self.size
         if self.size == self.capacity:
             self.grow()
 
+    def _place(self, values: List[T], front: bool) -> None:
+        """
+        Writes values next to the front or back of a non-empty deque with room for them,
+        in at most two slice assignments, leaving the state len(values) enqueue calls would.
+        :param values: values in the order they are enqueued
+        :param front: If True, each value goes before the front; if False, after the back.
+        """
+        count = len(values)
+        if self.typecode is not None:
+            values = array(self.typecode, values)
+        if front:
+            values = values[::-1]
+            start = (self.front - count) % self.capacity
+            self.front = start
+        else:
+            start = (self.back + 1) % self.capacity
+            self.back = (self.back + count) % self.capacity
+        first = min(count, self.capacity - start)
+        self.queue[start:start + first] = values[:first]
+        if count > first:
+            # Skipped when empty: a typed buffer with live memoryviews rejects even empty slice assignments
+            self.queue[:count - first] = values[first:]
+        self.size += count
+
+    def extend(self, values: Iterable[T], front: bool = True) -> None:
+        """
+        Adds every value to the CircularQueue, leaving the same state as calling enqueue on each in order,
+        but growing the buffer at most once and moving elements with slice assignments.
+        :param values: The values to be added.
+        :param front: If True, adds each value to the front; if False, adds it to the back.
+        Returns: Nothing
+        """
+        values = list(values) if self.typecode is None else array(self.typecode, values)
+        if len(values) <= 1:
+            for value in values:
+                self.enqueue(value, front)
+            return
+        if self.is_empty():
+            # enqueue restarts an empty deque at index 0
+            self.front = self.back = 0
+            self.queue[0] = values[0]
+            self.size = 1
+            if self.size == self.capacity:
+                self.grow()
+            values = values[1:]
+
+        capacity = previous = self.capacity
+        while self.size + len(values) >= capacity:
+            previous, capacity = capacity, self.policy.grown(capacity)
+        if capacity != self.capacity:
+            # Item by item, the last grow would happen when size reaches the capacity before it,
+            # leaving everything enqueued so far at the start of the buffer
+            early = previous - self.size
+            new_queue = self._new_buffer(capacity)
+            if front:
+                self._copy_into(new_queue, early)
+                new_queue[:early] = values[early - 1::-1] if early else values[:0]
+            else:
+                self._copy_into(new_queue)
+                new_queue[self.size:previous] = values[:early]
+            self.resizes += 1
+            self.bytes_copied += self.size * self._element_size()
+            self.queue = new_queue
+            self.capacity = capacity
+            self.front = 0
+            self.back = previous - 1
+            self.size = previous
+            values = values[early:]
+        if values:
+            self._place(values, front)
+        self.high_water = max(self.high_water, self.size)
+
     def dequeue(self, front: bool = True) -> T:
         """
         Removes and returns an element from the CircularQueue.
@@ -195,11 +385,135 @@ class CircularDeque:
 
         self.size -= 1
 
-        if self.size <= self.capacity // 4 and self.capacity // 2 >= 4:
+        if self.size <= self.policy.shrink_size(self.capacity) and \
+                self.policy.can_shrink(self.capacity, self.high_water):
             self.shrink()
 
         return removed_item
 
+    def dequeue_many(self, count: int, front: bool = True) -> List[T]:
+        """
+        Removes and returns up to count elements from the CircularQueue, leaving the same state as calling
+        dequeue that many times, but shrinking the buffer at most once and moving elements with slice assignments.
+        :param count: The number of elements to remove.
+        :param front: If True, removes elements from the front; if False, removes them from the back.
+        :return: The removed elements in the order dequeue would return them, fewer than count if the queue runs out.
+        """
+        count = min(count, self.size)
+        if count <= 0:
+            return []
+        if count == 1:
+            return [self.dequeue(front)]
+        end = self.size - count
+        if front:
+            removed = self._segment(0, count)
+        else:
+            removed = self._segment(end, count)[::-1]
+        if self.typecode is not None:
+            removed = removed.tolist()
+
+        # dequeue halves the capacity at most once per call, whenever the policy allows it
+        capacity, size, last_shrink = self.capacity, self.size, None
+        while self.policy.can_shrink(capacity, self.high_water):
+            size = min(size - 1, self.policy.shrink_size(capacity))
+            if size < end:
+                break
+            capacity //= 2
+            last_shrink = size
+
+        if last_shrink is None:
+            if front:
+                self.front = (self.front + count) % self.capacity
+            else:
+                self.back = (self.back - count) % self.capacity
+        else:
+            # The last shrink packed the remaining elements at the start of the buffer; the dequeues
+            # after it only moved an index, so the slots they emptied still hold their old values
+            later = last_shrink - end
+            new_queue = self._new_buffer(capacity)
+            if front:
+                new_queue[:last_shrink] = self._segment(count - later, last_shrink)
+                self.front, self.back = later % capacity, last_shrink - 1
+            else:
+                new_queue[:last_shrink] = self._segment(0, last_shrink)
+                self.front, self.back = 0, last_shrink - 1
+                if later:
+                    self.back = (self.back - later) % capacity
+            self.resizes += 1
+            self.bytes_copied += last_shrink * self._element_size()
+            self.queue = new_queue
+            self.capacity = capacity
+        self.size = end
+        return removed
+
+    def segments(self) -> Tuple[memoryview, ...]:
+        """
+        Returns the elements of a typed CircularQueue as memoryviews of its buffer, without copying:
+        the part up to the end of the buffer, then the part wrapped around to its start, if any.
+        The views show the buffer as it was, so take new ones after modifying the queue.
+        :return: zero, one or two memoryviews, front to back
+        """
+        if self.typecode is None:
+            raise TypeError("segments needs a typed CircularDeque, e.g. CircularDeque(typecode='d')")
+        if not self.size:
+            return ()
+        view = memoryview(self.queue)
+        first = min(self.size, self.capacity - self.front)
+        if first == self.size:
+            return (view[self.front:self.front + first],)
+        return view[self.front:self.front + first], view[:self.size - first]
+
+    def _reduce(self, numpy_reduce, builtin_reduce):
+        """
+        Applies a reduction to every segment of the contents, then to the partial results.
+        Typed queues are reduced in NumPy straight from the buffer when it is installed.
+        :param numpy_reduce: NumPy function reducing an array to a number, None to use the builtin
+        :param builtin_reduce: builtin reducing an iterable to a number
+        :return: the reduction over all elements
+        """
+        if self.typecode is not None and numpy_reduce is not None:
+            return builtin_reduce(numpy_reduce(np.frombuffer(part, dtype=part.format)).item()
+                                  for part in self.segments())
+        if self.typecode is not None:
+            return builtin_reduce(builtin_reduce(part) for part in self.segments())
+        return builtin_reduce(self._segment(0, self.size))
+
+    def window_sum(self) -> T:
+        """
+        Returns the sum of the elements in the CircularQueue.
+        :return: The sum, 0 if the queue is empty.
+        """
+        if self.is_empty():
+            return 0
+        if np is None or self.typecode is None:
+            return self._reduce(None, sum)
+        if self.typecode in ('f', 'd'):
+            # float32 values are summed in float64, like the Python floats the builtin sum adds up
+            return self._reduce(lambda values: np.sum(values, dtype=np.float64), sum)
+        if self.queue.itemsize < 8:
+            # int64 holds the sum of up to 2 ** 31 values of 32 bits, far more than fit in memory
+            return self._reduce(lambda values: np.sum(values, dtype=np.int64), sum)
+        # a sum of 64 bit values may overflow every NumPy integer, Python ints add them exactly
+        return self._reduce(None, sum)
+
+    def window_min(self) -> T:
+        """
+        Returns the smallest element in the CircularQueue.
+        :return: The smallest element, or None if the queue is empty.
+        """
+        if self.is_empty():
+            return None
+        return self._reduce(np.min if np is not None else None, min)
+
+    def window_max(self) -> T:
+        """
+        Returns the largest element in the CircularQueue.
+        :return: The largest element, or None if the queue is empty.
+        """
+        if self.is_empty():
+            return None
+        return self._reduce(np.max if np is not None else None, max)
+
 class CDLLNode:
     """
     Node for the CDLL
@@ -236,20 +550,83 @@ class CDLLNode:
 
     __repr__ = __str__
 
+class NodePool:
+    """
+    Free list of CDLLNodes, so lists sharing it reuse removed nodes instead of allocating new ones
+    """
+
+    __slots__ = ['free', 'max_size', 'allocated', 'reused']
+
+    def __init__(self, max_size: int = 4096) -> None:
+        """
+        Creates an empty node pool
+        :param max_size: most nodes kept for reuse, further released nodes are left to the garbage collector
+        :return: None
+        """
+        self.free: List[CDLLNode] = []
+        self.max_size = max_size
+        self.allocated = 0  # nodes created by the pool
+        self.reused = 0  # nodes handed out again instead of created, i.e. allocations avoided
+
+    def __len__(self) -> int:
+        """
+        :return: the number of nodes waiting to be reused
+        """
+        return len(self.free)
+
+    def acquire(self, val: T) -> CDLLNode:
+        """
+        Returns a node holding val, reusing a released one when available
+        :param val: value to store in the node
+        :return: the node, its next and prev unset
+        """
+        if self.free:
+            node = self.free.pop()
+            node.val = val
+            self.reused += 1
+            return node
+        self.allocated += 1
+        return CDLLNode(val)
+
+    def release(self, node: CDLLNode) -> None:
+        """
+        Takes back a node removed from a list; it must not be used by the caller afterwards
+        :param node: the removed node
+        :return: None
+        """
+        if len(self.free) < self.max_size:
+            # Drop the references so a pooled node keeps neither its value nor old neighbours alive
+            node.val = node.next = node.prev = None
+            self.free.append(node)
+
+    def prewarm(self, count: int) -> None:
+        """
+        Allocates nodes up front until count of them, capped at max_size, wait in the pool
+        :param count: number of free nodes wanted
+        :return: None
+        """
+        missing = min(count, self.max_size) - len(self.free)
+        if missing > 0:
+            self.free.extend(CDLLNode(None) for _ in range(missing))
+            self.allocated += missing
+
+
 class CDLL:
     """
     A (C)ircular (D)oubly (L)inked (L)ist
     """
 
-    __slots__ = ['head', 'size']
+    __slots__ = ['head', 'size', 'pool']
 
-    def __init__(self) -> None:
+    def __init__(self, pool: NodePool = None) -> None:
         """
         Creates a CDLL
+        :param pool: node pool to take nodes from and return removed nodes to, none by default
         :return: None
         """
         self.size = 0
         self.head = None
+        self.pool = pool
 
     def __len__(self) -> int:
         """
@@ -293,7 +670,7 @@ class CDLL:
         :param front: If True, inserts the new node at the front of the list; if False, inserts it at the back.
         Returns: nothing
         """
-        new_node = CDLLNode(val)
+        new_node = CDLLNode(val) if self.pool is None else self.pool.acquire(val)
 
         if not self.head:
             new_node.next = new_node.prev = new_node
@@ -322,18 +699,21 @@ class CDLL:
         """
         if not self.head:
             return
-        if self.head.next == self.head:
+        removed = self.head if front else self.head.prev
+        if self.head.next is self.head:  # nodes compare by value, a one-node list is told by identity
             self.head = None
             self.size = 0
-            return
-        if front:
-            self.head.prev.next = self.head.next
-            self.head.next.prev = self.head.prev
-            self.head = self.head.next
         else:
-            self.head.prev.prev.next = self.head
-            self.head.prev = self.head.prev.prev
-        self.size -= 1
+            if front:
+                self.head.prev.next = self.head.next
+                self.head.next.prev = self.head.prev
+                self.head = self.head.next
+            else:
+                self.head.prev.prev.next = self.head
+                self.head.prev = self.head.prev.prev
+            self.size -= 1
+        if self.pool is not None:
+            self.pool.release(removed)
 
 class CDLLCD:
     """
@@ -341,12 +721,13 @@ class CDLLCD:
     This is essentially just an interface for the above
     """
 
-    def __init__(self) -> None:
+    def __init__(self, pool: NodePool = None) -> None:
         """
         Initializes the CDLLCD to an empty CDLL
+        :param pool: node pool for the CDLL to reuse nodes from, none by default
         :return: None
         """
-        self.CDLL: CDLL = CDLL()
+        self.CDLL: CDLL = CDLL(pool)
 
     def __eq__(self, other: 'CDLLCD') -> bool:
         """
@@ -421,178 +802,41 @@ class CDLLCD:
         return value
 
 
-def plot_speed():
+def max_len_subarray(data, bound, structure):
     """
-    Compares performance of the CDLLCD and the standard array based deque
+    returns the length of the largest subarray of `data` with sum less or eq to than `bound`
+    :param data: list of integers to operate on
+    :param bound: largest allowable sum
+    :param structure: either a CircularDeque or a CDLLCD
+    :return: the length
     """
+    index, max_len, subarray_sum = 0, 0, 0
+    while index < len(data):
 
-    # First we'll test sequences of basic operations
-
-    sizes = [100*i for i in range(0, 200, 5)]
+        while subarray_sum <= bound and index < len(data):
+            structure.enqueue(data[index])
+            subarray_sum += data[index]
+            index += 1
+        max_len = max(max_len, subarray_sum)
 
-    # (1) Grow large
-    grow_avgs_array = []
-    grow_avgs_CDLL = []
-
-    for size in sizes:
-        grow_avgs_array.append(0)
-        grow_avgs_CDLL.append(0)
-        data = list(range(size))
-        for trial in range(3):
-
-            gc.collect()  # What happens if you remove this? Hint: memory fragmention
-            cd_array = CircularDeque()
-            cd_DLL = CDLLCD()
+        while subarray_sum > bound:
+            subarray_sum -= structure.dequeue(False)
 
-            # randomize data
-            shuffle(data)
-
-            start = default_timer()
-            for item in data:
-                cd_array.enqueue(item, item % 2)
-            grow_avgs_array[-1] += (default_timer() - start)/3
-
-            start = default_timer()
-            for item in data:
-                cd_DLL.enqueue(item, item % 2)
-            grow_avgs_CDLL[-1] += (default_timer() - start)/3
-
-    plt.plot(sizes, grow_avgs_array, color='blue', label='Array')
-    plt.plot(sizes, grow_avgs_CDLL, color='red', label='CDLL')
-    plt.title("Enqueue and Grow")
-    plt.legend(loc='best')
-    plt.show()
-
-    # (2) Grow Large then Shrink to zero
-
-    shrink_avgs_array = []
-    shrink_avgs_CDLL = []
+    return max_len
 
-    for size in sizes:
-        shrink_avgs_array.append(0)
-        shrink_avgs_CDLL.append(0)
-        data = list(range(size))
 
-        for trial in range(3):
-
-            gc.collect()
-            cd_array = CircularDeque()
-            cd_DLL = CDLLCD()
-
-            # randomize data
-            shuffle(data)
-
-            start = default_timer()
-            for item in data:
-                cd_array.enqueue(item, item % 2)
-            for item in data:
-                cd_array.dequeue(not item % 2)
-            shrink_avgs_array[-1] += (default_timer() - start)/3
-
-            start = default_timer()
-            for item in data:
-                cd_DLL.enqueue(item, item % 2)
-            for item in data:
-                cd_DLL.dequeue(not item % 2)
-            shrink_avgs_CDLL[-1] += (default_timer() - start)/3
-
-    plt.plot(sizes, shrink_avgs_array, color='blue', label='Array')
-    plt.plot(sizes, shrink_avgs_CDLL, color='red', label='CDLL')
-    plt.title("Enqueue, Grow, Dequeue, Shrink")
-    plt.legend(loc='best')
-    plt.show()
-
-    # (3) Test with random operations
-
-    random_avgs_array = []
-    random_avgs_CDLL = []
-
-    for size in sizes:
-        random_avgs_array.append(0)
-        random_avgs_CDLL.append(0)
-        data = list(range(size))
-
-        for trial in range(3):
-
-            gc.collect()
-            cd_array = CircularDeque()
-            cd_DLL = CDLLCD()
-
-            shuffle(data)
-
-            start = default_timer()
-            for item in data:
-                if randint(0, 3) <= 2:
-                    cd_array.enqueue(item, item % 2)
-                else:
-                    cd_array.dequeue(item % 2)
-            random_avgs_array[-1] += (default_timer() - start)/3
-
-            start = default_timer()
-            for item in data:
-                if randint(0, 3) <= 2:
-                    cd_DLL.enqueue(item, item % 2)
-                else:
-                    cd_DLL.dequeue(item % 2)
-            random_avgs_CDLL[-1] += (default_timer() - start)/3
-
-    plt.plot(sizes, random_avgs_array, color='blue', label='Array')
-    plt.plot(sizes, random_avgs_CDLL, color='red', label='CDLL')
-    plt.title("Operations in Random Order")
-    plt.legend(loc='best')
-    plt.show()
-
-    def max_len_subarray(data, bound, structure):
-        """
-        returns the length of the largest subarray of `data` with sum less or eq to than `bound`
-        :param data: list of integers to operate on
-        :param bound: largest allowable sum
-        :param structure: either a CircularDeque or a CDLLCD
-        :return: the length
-        """
-        index, max_len, subarray_sum = 0, 0, 0
-        while index < len(data):
-
-            while subarray_sum <= bound and index < len(data):
-                structure.enqueue(data[index])
-                subarray_sum += data[index]
-                index += 1
-            max_len = max(max_len, subarray_sum)
-
-            while subarray_sum > bound:
-                subarray_sum -= structure.dequeue(False)
-
-        return max_len
-
-    # (4) A common application
-
-    application_avgs_array = []
-    application_avgs_CDLL = []
-
-    data = [randint(0, 1) for i in range(5000)]
-    window_lengths = list(range(0, 200, 5))
-
-    for length in window_lengths:
-        application_avgs_array.append(0)
-        application_avgs_CDLL.append(0)
-
-        for trial in range(3):
-
-            gc.collect()
-            cd_array = CircularDeque()
-            cd_DLL = CDLLCD()
-
-            start = default_timer()
-            max_len_subarray(data, length, cd_array)
-            application_avgs_array[-1] += (default_timer() - start)/3
-
-            start = default_timer()
-            max_len_subarray(data, length, cd_DLL)
-            application_avgs_CDLL[-1] += (default_timer() - start)/3
-
-    plt.plot(window_lengths, application_avgs_array,
-             color='blue', label='Array')
-    plt.plot(window_lengths, application_avgs_CDLL, color='red', label='CDLL')
-    plt.title("Sliding Window Application")
-    plt.legend(loc='best')
-    plt.show()
+def plot_speed(path: str = "results.json") -> None:
+    """
+    Compares performance of the CDLLCD and the standard array based deque
+    Timing lives in benchmark.py, which runs headless and saves JSON; this runs it on the sizes used here before
+    and plots the saved results, so it is the only part that needs matplotlib
+    :param path: JSON file the results are saved to
+    """
+    import json
+    from benchmark import plot_results, run_benchmarks
+
+    report = run_benchmarks(sizes=tuple(100*i for i in range(0, 200, 5)), window_lengths=tuple(range(0, 200, 5)),
+                            repeat=3)
+    with open(path, "w") as output:
+        json.dump(report, output, indent=2)
+    plot_results(path)
@@ -0,0 +1,311 @@
+"""
+Project 5: Deque
+CSE 331 FS23
+tests.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from array import array
+
+import benchmark
+import solution
+from solution import CDLLCD, NUMERIC_TYPECODES, CapacityPolicy, CircularDeque, NodePool, max_len_subarray
+
+POLICIES = (CapacityPolicy(), CapacityPolicy(growth_factor=1.5, shrink_threshold=0.1, min_capacity=2),
+            CapacityPolicy(growth_factor=3, shrink_threshold=0.4, min_capacity=1, keep_high_water=True))
+
+
+def without_numpy(function, *args):
+    """
+    Calls function with solution.np hidden, so the builtin fallbacks run
+    """
+    saved, solution.np = solution.np, None
+    try:
+        return function(*args)
+    finally:
+        solution.np = saved
+
+
+def contents(deque):
+    """
+    The elements of a CircularDeque, front to back
+    """
+    return [deque.queue[(deque.front + i) % deque.capacity] for i in range(deque.size)]
+
+
+def state(deque):
+    """
+    Where a CircularDeque holds its elements, slots that hold no element aside
+    """
+    return contents(deque), deque.size, deque.capacity, deque.front, deque.back, deque.high_water
+
+
+class CircularDequeTests(unittest.TestCase):
+
+    def test_bulk_operations(self):
+        rng = random.Random(331)
+        for policy in POLICIES:
+            for typecode in (None, 'q'):
+                bulk = CircularDeque(policy=policy, typecode=typecode)
+                single = CircularDeque(policy=policy, typecode=typecode)
+                for step in range(400):
+                    front, count = rng.random() < 0.5, rng.choice([0, 1, 2, 3, 7, 20, 60])
+                    if rng.random() < 0.55:
+                        values = [rng.randint(-99, 99) for _ in range(count)]
+                        bulk.extend(iter(values), front)
+                        for value in values:
+                            single.enqueue(value, front)
+                    else:
+                        removed = [single.dequeue(front) for _ in range(min(count, len(single)))]
+                        self.assertEqual(bulk.dequeue_many(count, front), removed)
+                    # the same layout as the one element at a time calls, with at most as many reallocations
+                    self.assertEqual(state(bulk), state(single), (policy, typecode, step))
+                    self.assertLessEqual(bulk.resizes, single.resizes)
+                    self.assertLessEqual(bulk.bytes_copied, single.bytes_copied)
+                self.assertLess(bulk.resizes, single.resizes)
+
+    def test_capacity_policy(self):
+        for arguments in ({"growth_factor": 1}, {"shrink_threshold": 0.5}, {"shrink_threshold": -0.1},
+                          {"min_capacity": 0}):
+            with self.assertRaises(ValueError):
+                CapacityPolicy(**arguments)
+
+        # the default policy doubles when full and halves at a quarter, as the deque always did
+        deque = CircularDeque()
+        capacities = []
+        for value in range(64):
+            deque.enqueue(value)
+            capacities.append(deque.capacity)
+        self.assertEqual(sorted(set(capacities)), [4, 8, 16, 32, 64, 128])
+        for _ in range(48):
+            deque.dequeue()
+        self.assertEqual(deque.capacity, 32)
+
+        # swinging around a resize boundary reallocates every time, unless the high water mark is kept
+        for keep_high_water, expected in ((False, 40), (True, 0)):
+            deque = CircularDeque(policy=CapacityPolicy(keep_high_water=keep_high_water))
+            deque.extend(range(33))
+            for _ in range(25):
+                deque.dequeue()
+            resizes = deque.resizes
+            for _ in range(20):
+                deque.extend(range(25), front=False)
+                deque.dequeue_many(25)
+            self.assertEqual(deque.resizes - resizes, expected, keep_high_water)
+            self.assertEqual(deque.high_water, 33)
+
+    def test_window_statistics(self):
+        rng = random.Random(331)
+        for typecode in NUMERIC_TYPECODES:
+            limit = 2 ** (8 * array(typecode).itemsize - 1) - 1
+            for _ in range(20):
+                if typecode in 'fd':
+                    values = [rng.uniform(-1e6, 1e6) for _ in range(rng.randint(1, 40))]
+                else:
+                    # small enough that no sum of them overflows the type
+                    values = [rng.randint(0 if typecode.isupper() else -100, min(limit // 64, 1000))
+                              for _ in range(rng.randint(1, 40))]
+                deque = CircularDeque(typecode=typecode)
+                # enqueue at both ends so the contents wrap around the buffer
+                for value in values:
+                    deque.enqueue(value, front=rng.random() < 0.5)
+                stored = list(array(typecode, values))
+                for name, builtin in (("window_sum", sum), ("window_min", min), ("window_max", max)):
+                    result, fallback = getattr(deque, name)(), without_numpy(getattr(deque, name))
+                    if name == "window_sum" and typecode in 'fd':
+                        # NumPy adds pairwise and the builtin one by one, which may differ in the last bits of a
+                        # float64 but not by the error of adding in float32
+                        delta = 1e-12 * sum(map(abs, stored))
+                        self.assertAlmostEqual(result, fallback, delta=delta, msg=typecode)
+                        self.assertAlmostEqual(result, builtin(stored), delta=delta, msg=typecode)
+                    else:
+                        self.assertEqual(result, fallback, (typecode, name))
+                        self.assertEqual(result, builtin(stored), (typecode, name))
+
+        # float32 rounds 2 ** 24 + 1 down to 2 ** 24, the sum must not be taken in float32
+        deque = CircularDeque(typecode='f')
+        for value in [2.0 ** 24] + [1.0] * 10:
+            deque.enqueue(value, front=False)
+        self.assertEqual(deque.window_sum(), 2.0 ** 24 + 10)
+        self.assertEqual(without_numpy(deque.window_sum), 2.0 ** 24 + 10)
+        self.assertEqual(CircularDeque(typecode='f').window_sum(), 0)
+
+        # a list-backed deque sums its Python objects, whatever they are
+        deque = CircularDeque()
+        deque.extend([2 ** 70, 0.5, -3], front=False)
+        self.assertEqual(deque.window_sum(), 2 ** 70 + 0.5 - 3)
+        self.assertEqual(CircularDeque().window_sum(), 0)
+
+        # integer sums are exact, however far past the range of the typecode they go
+        for typecode in NUMERIC_TYPECODES.strip('fd'):
+            bits = 8 * array(typecode).itemsize
+            low, high = (0, 2 ** bits - 1) if typecode.isupper() else (-2 ** (bits - 1), 2 ** (bits - 1) - 1)
+            for values in ([high, high], [high, 5], [low, low, -1 if low else 0], [high, low, high] * 3):
+                deque = CircularDeque(typecode=typecode)
+                deque.extend(values, front=False)
+                self.assertEqual(deque.window_sum(), sum(values), (typecode, values))
+                self.assertEqual(without_numpy(deque.window_sum), sum(values), (typecode, values))
+
+
+class CountingDeque:
+    """
+    CDLLCD counting its non-empty dequeues, which are the ones that remove a node
+    """
+
+    def __init__(self):
+        self.deque, self.enqueues, self.dequeues = CDLLCD(), 0, 0
+
+    def enqueue(self, value, front=True):
+        self.enqueues += 1
+        self.deque.enqueue(value, front)
+
+    def dequeue(self, front=True):
+        self.dequeues += not self.deque.is_empty()
+        return self.deque.dequeue(front)
+
+
+class NodePoolTests(unittest.TestCase):
+
+    def test_equal_values(self):
+        # nodes compare equal by value, removing must still only empty a list holding one node
+        for pool in (None, NodePool()):
+            deque = CDLLCD(pool)
+            for value in (1, 1, 1, 0, 0):
+                deque.enqueue(value)
+            self.assertEqual([deque.dequeue(False) for _ in range(6)], [1, 1, 1, 0, 0, None])
+            self.assertTrue(deque.is_empty())
+
+    def test_pooled_deque(self):
+        rng = random.Random(331)
+        pool = benchmark.CountingNodePool(max_size=8)
+        deque, model, removed = CDLLCD(pool), [], 0
+        for _ in range(2000):
+            front = rng.random() < 0.5
+            if rng.random() < 0.55:
+                value = rng.randint(0, 3)
+                deque.enqueue(value, front)
+                if front:
+                    model.insert(0, value)
+                else:
+                    model.append(value)
+            else:
+                removed += bool(model)
+                self.assertEqual(deque.dequeue(front), (model.pop(0) if front else model.pop()) if model else None)
+            self.assertEqual(len(deque), len(model))
+            self.assertLessEqual(len(pool), 8)
+        # every node handed out was either created or reused, and every removed node went back to the pool
+        self.assertEqual(pool.allocated + pool.reused, pool.acquires)
+        self.assertEqual(pool.acquires, len(model) + removed)
+        self.assertEqual(pool.releases, removed)
+        self.assertGreater(pool.reused, 0)
+
+    def test_bench_node_pool(self):
+        size = 300
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = benchmark.bench_node_pool(size=size, trials=1)
+        self.assertEqual([(result["workload"], result["pool"]) for result in results],
+                         [(workload, mode) for workload in benchmark.WORKLOADS
+                          for mode in ("none", "pool", "prewarmed")])
+
+        # the counted node operations are the enqueues and the dequeues that removed something
+        for workload in benchmark.WORKLOADS:
+            rng = random.Random(f"331-{workload}")
+            counted = CountingDeque()
+            if workload == "sliding window":
+                max_len_subarray([rng.randint(0, 1) for _ in range(size)], 100, counted)
+            else:
+                benchmark.run_operations(benchmark.make_operations(workload, size, rng), counted)
+            for result in results:
+                if result["workload"] != workload:
+                    continue
+                self.assertEqual((result["acquires"], result["releases"]), (counted.enqueues, counted.dequeues))
+                if result["pool"] == "none":
+                    self.assertIsNone(result["allocated"])
+                    self.assertIsNone(result["reused"])
+                else:
+                    self.assertEqual(result["allocated"] - (size if result["pool"] == "prewarmed" else 0)
+                                     + result["reused"], result["acquires"])
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_workloads(self):
+        for workload in ("grow", "grow/shrink", "random"):
+            first = benchmark.make_operations(workload, 200, random.Random(331))
+            self.assertEqual(first, benchmark.make_operations(workload, 200, random.Random(331)))
+        with self.assertRaises(ValueError):
+            benchmark.make_operations("sliding window", 10, random.Random(331))
+
+        # the same operations leave every structure holding the same values
+        for workload in ("grow", "grow/shrink", "random"):
+            operations = benchmark.make_operations(workload, 300, random.Random(331))
+            structures = {name: benchmark.STRUCTURES[name]() for name in benchmark.STRUCTURES}
+            for structure in structures.values():
+                benchmark.run_operations(operations, structure)
+            drained = {name: [structure.dequeue() for _ in range(301)] for name, structure in structures.items()}
+            self.assertEqual(len({tuple(values) for values in drained.values()}), 1, workload)
+
+        self.assertEqual(benchmark.percentile([3, 1, 2, 5, 4], 0.95), 5)
+        self.assertEqual(benchmark.percentile([3, 1, 2, 5, 4], 0.5), 3)
+        self.assertEqual(benchmark.percentile([7], 0.95), 7)
+
+    def test_run_and_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            before, after = os.path.join(directory, "before.json"), os.path.join(directory, "after.json")
+            arguments = ["--sizes", "100", "200", "--window-lengths", "10", "--window-data", "300", "--repeat", "2",
+                         "--warmup", "0"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(benchmark.main(["run", "--output", before] + arguments), 0)
+                self.assertEqual(benchmark.main(["run", "--output", after, "--structures", "CDLLCD+pool",
+                                                 "CDLLCD"] + arguments), 0)
+            with open(before) as source:
+                report = json.load(source)
+            self.assertEqual(report["seed"], 331)
+            self.assertEqual(len(report["results"]), (3 * 2 + 1) * len(benchmark.DEFAULT_STRUCTURES))
+            for result in report["results"]:
+                self.assertEqual(len(result["times"]), 2)
+                self.assertEqual(result["median"], sorted(result["times"])[0] / 2 + sorted(result["times"])[1] / 2)
+                self.assertEqual(result["p95"], max(result["times"]))
+
+            pairs = benchmark.compare_results(before, after)
+            # only measurements in both runs are paired
+            self.assertEqual({structure for _, structure, _, _, _ in pairs}, {"CDLLCD"})
+            self.assertEqual(len(pairs), 3 * 2 + 1)
+            # these runs take far less than the floor, so noise is never reported
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                self.assertEqual(benchmark.main(["compare", before, after]), 0)
+            self.assertEqual(len(printed.getvalue().splitlines()), len(pairs))
+
+            # a median slower by more than both the tolerance and the floor fails the comparison
+            with open(after) as source:
+                report = json.load(source)
+            workload, structure, size, median, _ = pairs[0]
+            for result in report["results"]:
+                if (result["workload"], result["structure"], result["size"]) == (workload, structure, size):
+                    result["median"] = median * 1.5 + 0.01
+            with open(after, "w") as output:
+                json.dump(report, output)
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                self.assertEqual(benchmark.main(["compare", before, after]), 1)
+                self.assertEqual(benchmark.main(["compare", before, after, "--min-seconds", "1"]), 0)
+            self.assertIn(f"REGRESSION {workload} {structure} {size}:", printed.getvalue())
+
+    def test_find_regressions(self):
+        pairs = [("grow", "CDLLCD", 10, 0.00002, 0.00003),  # 50% slower but far below the floor, noise
+                 ("grow", "CDLLCD", 10000, 1.0, 1.5),  # slower by more than both
+                 ("random", "CDLLCD", 10000, 0.1, 0.1005),  # within the tolerance
+                 ("random", "CircularDeque", 10000, 0.1, 0.05)]  # faster
+        self.assertEqual(benchmark.find_regressions(pairs, 0.25), ["grow CDLLCD 10000: 1.000000s -> 1.500000s"])
+        self.assertEqual(len(benchmark.find_regressions(pairs, 0.25, min_seconds=0)), 2)
+        self.assertEqual(len(benchmark.find_regressions(pairs, 0, min_seconds=0)), 3)
+        self.assertEqual(benchmark.find_regressions(pairs, 0.25, min_seconds=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()